@@ -5,6 +5,14 @@ Python Commander - A desktop app for managing and running Python scripts.
 __version__ = "0.1.0"
 __author__ = "Mark McGookin"
 
-from .main import main
-
 __all__ = ["main"]
+
+
+def __getattr__(name):
+    # The GUI (and with it Qt) is only imported when actually asked for, so
+    # headless entry points like the CLI stay light
+    if name == "main":
+        from .main import main
+        globals()["main"] = main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,13 @@
-from .main import main
+import sys
+
+# Imported first so the startup timeline starts as early as possible
+from . import startup
+from .cli import COMMANDS
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        from .cli import main as cli_main
+        sys.exit(cli_main())
+
+    from .main import main
+    main()
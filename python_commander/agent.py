@@ -0,0 +1,415 @@
+"""
+Worker agent for Python Commander
+A small process that runs scripts for controllers on other machines. It
+listens on TCP, keeps each script it is sent under its content hash so it
+is only transferred once, runs them in its own execution engine and
+streams their output back. Controllers place runs on the agent with the
+most headroom using the status it reports.
+
+Agent -> controller: {"hello": {"nonce": ..., "version": n}} on connect,
+                     {"ready": status} or {"error": "..."} after the hello,
+                     {"status": {...}} every STATUS_INTERVAL seconds,
+                     {"need": run_id, "hash": ...} for scripts it lacks,
+                     {"started": run_id, "pid": ...},
+                     {"output": run_id, "stream": ..., "text": ...},
+                     {"exit": run_id, "returncode": ..., "rusage": {...}, "error": ...}
+Controller -> agent: {"op": "hello", "proof": hmac(token, nonce)},
+                     {"op": "run", "id": n, "hash": ..., "name": ..., "arguments": {...},
+                      "limits": {...}},
+                     {"op": "file", "hash": ..., "data": base64},
+                     {"op": "signal", "id": n, "signal": "TERM" | "KILL"}
+The frames are those of protocol.py.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import queue
+import secrets
+import signal
+import socket
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .execution import EVENT_FINISHED, EVENT_OUTPUT, EVENT_STARTED, ExecutionEngine, Run
+from .protocol import read_frame, send_frame
+
+PROTOCOL_VERSION = 1
+
+DEFAULT_PORT = 7345
+
+# Seconds between status reports to each controller
+STATUS_INTERVAL = 2.0
+
+# Seconds a controller gets to complete the hello
+HELLO_TIMEOUT = 10.0
+
+# Messages waiting to be sent to one controller, each holding at most one
+# output read; a controller this far behind is disconnected
+MAX_QUEUED_MESSAGES = 256
+
+
+def content_hash(data: bytes) -> str:
+    """Key a script is stored and requested under"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hello_proof(token: str, nonce: str) -> str:
+    """Answer to an agent's hello, proving the controller knows the shared token"""
+    return hmac.new(token.encode("utf-8"), nonce.encode("ascii"), hashlib.sha256).hexdigest()
+
+
+def _memory_mb() -> Tuple[Optional[float], Optional[float]]:
+    """Available and total memory in MB, or None where unknown"""
+    try:
+        values = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                values[key] = int(value.split()[0]) / 1024
+        return values.get("MemAvailable"), values.get("MemTotal")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        page = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        return os.sysconf("SC_AVPHYS_PAGES") * page, os.sysconf("SC_PHYS_PAGES") * page
+    except (AttributeError, OSError, ValueError):
+        return None, None
+
+
+class _Controller:
+    """One controller connection; a writer thread keeps the engine's I/O thread off the network
+
+    The engine's I/O thread serves every run, so it never waits on a slow
+    controller: one whose queue fills up is disconnected instead, which
+    cancels its runs.
+    """
+
+    def __init__(self, sock: socket.socket, address: str):
+        self.sock = sock
+        self.address = address
+        self.closed = False
+        # Runs started for this controller: engine run id -> controller run id
+        self.runs: Dict[int, int] = {}
+        # Runs waiting for their script: hash -> [message]
+        self.waiting: Dict[str, List[Dict[str, Any]]] = {}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=MAX_QUEUED_MESSAGES)
+        self._writer = threading.Thread(target=self._write_loop, name="AgentWriter", daemon=True)
+        self._writer.start()
+
+    def send(self, message: Dict[str, Any]):
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            print(f"Controller {self.address} is not keeping up; disconnecting", flush=True)
+            self._abort()
+
+    def _write_loop(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            try:
+                send_frame(self.sock, message)
+            except OSError:
+                break
+        self._abort()
+
+    def _abort(self):
+        """Stop sending and end the connection, which also ends its reader"""
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        self.closed = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            # The writer is stuck behind a full queue; failing its sends stops it
+            self._abort()
+
+
+class Agent:
+    """Runs scripts sent by controllers over TCP
+
+    Scripts are stored under directory/scripts/<hash>/ and run from there,
+    so a script's relative paths resolve on the agent's machine. Runs of
+    a controller that disconnects are cancelled, as nobody is left to
+    receive their output.
+    """
+
+    def __init__(self, engine: ExecutionEngine, directory, host: str = "127.0.0.1",
+                 port: int = DEFAULT_PORT, token: str = ""):
+        self.engine = engine
+        self.scripts_path = os.path.join(str(directory), "scripts")
+        os.makedirs(self.scripts_path, exist_ok=True)
+        self.host = host
+        self.port = port
+        self.token = token
+
+        self._controllers: List[_Controller] = []
+        # Engine run id -> the controller that asked for it
+        self._owners: Dict[int, _Controller] = {}
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._server: Optional[socket.socket] = None
+
+    @classmethod
+    def from_config(cls, config, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                    slots: int = 0, token: Optional[str] = None) -> "Agent":
+        """Create an agent whose engine uses this machine's execution settings"""
+        from .environments import EnvironmentManager
+        from .worker_pool import WorkerPool
+        worker_pool = WorkerPool.from_config(config)
+        if worker_pool is not None:
+            worker_pool.start()
+        # Limits arrive with each run; results are cached by the controller
+        engine = ExecutionEngine(max_concurrency=slots or os.cpu_count() or 1,
+                                 worker_pool=worker_pool,
+                                 environments=EnvironmentManager.from_config(config))
+        if token is None:
+            token = config.get("settings.agent_token", "")
+        return cls(engine, config.app_support_path / "agent", host, port, token)
+
+    # Lifecycle
+
+    def serve(self):
+        """Accept controllers until stop() or a termination signal
+
+        Raises ValueError without a token: anyone who could connect, remote
+        hosts or other local users, could otherwise run code as this user.
+        """
+        if not self.token:
+            raise ValueError("No agent token is set; pass --token or set agent_token")
+        self._server = socket.create_server((self.host, self.port))
+        self.port = self._server.getsockname()[1]
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(sig, lambda signum, frame: self.stop())
+
+        self.engine.add_listener(self._on_run_event)
+        threading.Thread(target=self._accept_loop, name="AgentAccept", daemon=True).start()
+        print(f"Agent {os.getpid()} listening on {self.host}:{self.port} with "
+              f"{self.engine.max_concurrency} slots", flush=True)
+
+        while not self._stopped.wait(STATUS_INTERVAL):
+            status = self.status()
+            with self._lock:
+                for controller in self._controllers:
+                    controller.send({"status": status})
+        self._shutdown()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _shutdown(self):
+        print("Agent shutting down", flush=True)
+        try:
+            self._server.close()
+        except OSError:
+            pass
+        with self._lock:
+            controllers, self._controllers = self._controllers, []
+        for controller in controllers:
+            self._drop(controller)
+            controller.close()
+        self.engine.shutdown(wait=True)
+
+    def status(self) -> Dict[str, Any]:
+        """Load and headroom, as reported to controllers"""
+        available, total = _memory_mb()
+        try:
+            load = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            load = None
+        runs = [run for run in self.engine.runs() if not run.done.is_set()]
+        return {
+            "slots": self.engine.max_concurrency,
+            "active": len(runs),
+            "cpus": os.cpu_count() or 1,
+            "load": load,
+            "memory_available_mb": available,
+            "memory_total_mb": total,
+        }
+
+    # Connections
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve_controller, args=(sock, f"{address[0]}:{address[1]}"),
+                             name="AgentController", daemon=True).start()
+
+    def _serve_controller(self, sock: socket.socket, address: str):
+        """Check a controller's hello, then handle its requests in order"""
+        stream = sock.makefile("rb")
+        controller = _Controller(sock, address)
+        nonce = secrets.token_hex(16)
+        try:
+            controller.send({"hello": {"nonce": nonce, "version": PROTOCOL_VERSION}})
+            sock.settimeout(HELLO_TIMEOUT)
+            try:
+                message = read_frame(stream)
+            except (OSError, ValueError):
+                return
+            if (message is None or message.get("op") != "hello"
+                    or not hmac.compare_digest(str(message.get("proof", "")),
+                                               hello_proof(self.token, nonce))):
+                controller.send({"error": "Agent token does not match"})
+                print(f"Rejected controller {address}", flush=True)
+                return
+            sock.settimeout(None)
+            controller.send({"ready": self.status()})
+            with self._lock:
+                self._controllers.append(controller)
+            print(f"Controller {address} connected", flush=True)
+
+            while True:
+                try:
+                    message = read_frame(stream)
+                except (OSError, ValueError):
+                    break
+                if message is None:
+                    break
+                try:
+                    self._handle(controller, message)
+                except Exception as e:
+                    print(f"Error handling {message.get('op')} from {address}: {e}", flush=True)
+                    if message.get("op") == "run":
+                        controller.send({"exit": message.get("id"), "returncode": None,
+                                         "rusage": None, "error": str(e)})
+        finally:
+            with self._lock:
+                if controller in self._controllers:
+                    self._controllers.remove(controller)
+                    print(f"Controller {address} disconnected", flush=True)
+            self._drop(controller)
+            controller.close()
+            stream.close()
+
+    def _drop(self, controller: _Controller):
+        """Cancel what a departed controller was running"""
+        with self._lock:
+            run_ids = list(controller.runs)
+            controller.waiting.clear()
+        for run_id in run_ids:
+            self.engine.cancel(run_id)
+
+    def _handle(self, controller: _Controller, message: Dict[str, Any]):
+        op = message.get("op")
+        if op == "run":
+            path = self._script_path(message["hash"], message["name"])
+            if os.path.exists(path):
+                self._submit(controller, message, path)
+                return
+            with self._lock:
+                waiting = controller.waiting.setdefault(message["hash"], [])
+                waiting.append(message)
+            if len(waiting) == 1:
+                controller.send({"need": message["id"], "hash": message["hash"]})
+        elif op == "file":
+            data = base64.b64decode(message["data"])
+            with self._lock:
+                waiting = controller.waiting.pop(message["hash"], [])
+            if content_hash(data) != message["hash"]:
+                for run in waiting:
+                    controller.send({"exit": run["id"], "returncode": None, "rusage": None,
+                                     "error": "Script was damaged in transfer"})
+                return
+            for run in waiting:
+                path = self._script_path(message["hash"], run["name"])
+                if not os.path.exists(path):
+                    self._store(path, data)
+                self._submit(controller, run, path)
+        elif op == "signal":
+            with self._lock:
+                run_id = next((run_id for run_id, remote_id in controller.runs.items()
+                               if remote_id == message["id"]), None)
+            if run_id is None:
+                return
+            if message.get("signal") == "KILL":
+                self.engine.kill_run(run_id, "Killed by the controller")
+            else:
+                self.engine.cancel(run_id)
+        else:
+            raise ValueError(f"Unknown operation '{op}'")
+
+    def _script_path(self, digest: str, name: str) -> str:
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid script hash '{digest}'")
+        return os.path.join(self.scripts_path, digest, os.path.basename(name) or "script.py")
+
+    def _store(self, path: str, data: bytes):
+        """Write a received script atomically, so a half-written one is never run"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".script-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _submit(self, controller: _Controller, message: Dict[str, Any], path: str):
+        # Hold the lock so the run's events find their owner
+        with self._lock:
+            if controller.closed:
+                return
+            try:
+                run = self.engine.submit(path, message.get("arguments"), limits=message.get("limits"))
+            except RuntimeError as e:
+                controller.send({"exit": message["id"], "returncode": None, "rusage": None,
+                                 "error": str(e)})
+                return
+            self._owners[run.id] = controller
+            controller.runs[run.id] = message["id"]
+            if run.done.is_set():
+                # Finished before it was owned, e.g. its environment failed to build
+                self._on_run_event(run, EVENT_FINISHED, run.returncode)
+
+    # Events
+
+    def _on_run_event(self, run: Run, event: str, data):
+        with self._lock:
+            controller = self._owners.get(run.id)
+            remote_id = controller.runs.get(run.id) if controller is not None else None
+            if remote_id is None:
+                return
+            if event == EVENT_FINISHED:
+                self._owners.pop(run.id, None)
+                controller.runs.pop(run.id, None)
+        if event == EVENT_STARTED:
+            controller.send({"started": remote_id, "pid": run.pid})
+        elif event == EVENT_OUTPUT:
+            stream, text = data
+            controller.send({"output": remote_id, "stream": stream, "text": text})
+        elif event == EVENT_FINISHED:
+            controller.send({"exit": remote_id, "returncode": run.returncode,
+                             "rusage": run.rusage, "error": run.error})
+
+
+def run_agent(config, host: str = "127.0.0.1", port: int = DEFAULT_PORT, slots: int = 0,
+              token: Optional[str] = None) -> int:
+    """Run an agent in this process until it is stopped"""
+    agent = Agent.from_config(config, host, port, slots, token)
+    try:
+        agent.serve()
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", flush=True)
+        agent.engine.shutdown()
+        return 1
+    return 0
@@ -0,0 +1,214 @@
+"""
+Batch runs for Python Commander
+Runs a script once per combination of argument values (a parameter sweep)
+across the execution engine, tracking progress and collecting a result table
+"""
+
+import glob
+import itertools
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .execution import (CANCELLED, EVENT_FINISHED, EVENT_OUTPUT, EVENT_QUEUED, FINISHED,
+                        build_arguments)
+
+# How swept values are combined
+PRODUCT = "product"
+ZIP = "zip"
+
+_GLOB_CHARS = set("*?[")
+
+# Keep at most this much of a run's last stdout line for the result table
+MAX_SUMMARY_LENGTH = 200
+
+
+def parse_sweep_value(text: str, base_dir: Optional[str] = None) -> List[str]:
+    """Turn a sweep value into a list of values
+
+    Text containing glob characters expands to the matching paths (relative
+    to base_dir); anything else is split on commas.
+    """
+    text = text.strip()
+    if _GLOB_CHARS & set(text):
+        pattern = os.path.expanduser(text)
+        if base_dir and not os.path.isabs(pattern):
+            pattern = os.path.join(base_dir, pattern)
+        return sorted(glob.glob(pattern))
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+def combinations(sweep: Dict[str, List[Any]], mode: str = PRODUCT) -> List[Dict[str, Any]]:
+    """Combine swept values: every combination (product) or position by position (zip)"""
+    if not sweep:
+        return [{}]
+    names = list(sweep)
+    if mode == ZIP:
+        lengths = {len(values) for values in sweep.values()}
+        if len(lengths) > 1:
+            raise ValueError("Zipped sweeps need the same number of values for every argument")
+        rows = zip(*(sweep[name] for name in names))
+    elif mode == PRODUCT:
+        rows = itertools.product(*(sweep[name] for name in names))
+    else:
+        raise ValueError(f"Unknown sweep mode: {mode}")
+    return [dict(zip(names, row)) for row in rows]
+
+
+def build_batch(schema: List[Dict[str, Any]], fixed: Dict[str, Any], sweep: Dict[str, List[Any]],
+                mode: str = PRODUCT) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Validate every combination up front; returns (swept values, arguments) pairs"""
+    for name, values in sweep.items():
+        if not values:
+            raise ValueError(f"No values to sweep for argument '{name}'")
+
+    items = []
+    for values in combinations(sweep, mode):
+        try:
+            arguments = build_arguments(schema, dict(fixed, **values))
+        except ValueError as e:
+            raise ValueError(f"{e} (in combination {values})") from None
+        items.append((values, arguments))
+    return items
+
+
+class BatchItem:
+    """One run of a batch"""
+
+    __slots__ = ("index", "values", "arguments", "run", "summary")
+
+    def __init__(self, index: int, values: Dict[str, Any], arguments: Dict[str, Any]):
+        self.index = index
+        self.values = values
+        self.arguments = arguments
+        self.run = None
+        # Last line the run printed to stdout
+        self.summary = ""
+
+
+class BatchRun:
+    """A parameter sweep submitted to an ExecutionEngine
+
+    The engine's concurrency limit decides how many combinations run at
+    once. Progress is tracked from engine events, so it is updated from
+    the engine's I/O thread.
+    """
+
+    def __init__(self, engine, script_path: str,
+                 items: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]],
+                 memoize: bool = False, cache_inputs: Iterable[str] = (),
+                 limits: Optional[Dict[str, Any]] = None):
+        self.engine = engine
+        self.script_path = script_path
+        self.items = [BatchItem(index, values, arguments)
+                      for index, (values, arguments) in enumerate(items)]
+        self.memoize = memoize
+        self.cache_inputs = tuple(cache_inputs)
+        self.limits = limits
+
+        self.submitted = 0
+        self.finished = 0
+        self.failed = 0
+        self.done = threading.Event()
+        self._by_run: Dict[int, BatchItem] = {}
+        self._partial: Dict[int, str] = {}
+        self._submitting: Optional[BatchItem] = None
+        self._submit_thread: Optional[int] = None
+        self._cancelled = False
+        self._lock = threading.RLock()
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    def start(self):
+        """Submit every combination to the engine"""
+        self.engine.add_listener(self._on_event)
+        self._submit_thread = threading.get_ident()
+        try:
+            for item in self.items:
+                if self._cancelled:
+                    break
+                self._submitting = item
+                item.run = self.engine.submit(self.script_path, item.arguments, memoize=self.memoize,
+                                              cache_inputs=self.cache_inputs, limits=self.limits)
+        finally:
+            self._submitting = None
+            self._submit_thread = None
+        self._check_done()
+
+    def item_for(self, run) -> Optional[BatchItem]:
+        """Return the batch item a run belongs to, if any"""
+        with self._lock:
+            return self._by_run.get(run.id)
+
+    def _on_event(self, run, event, data):
+        with self._lock:
+            item = self._by_run.get(run.id)
+            if item is None:
+                # A run's queued event is emitted inside submit(), on the submitting thread
+                if (event != EVENT_QUEUED or self._submitting is None
+                        or threading.get_ident() != self._submit_thread):
+                    return
+                item = self._submitting
+                item.run = run
+                self._by_run[run.id] = item
+                self.submitted += 1
+
+            if event == EVENT_OUTPUT:
+                stream, text = data
+                if stream == "stdout":
+                    self._track_summary(item, text)
+            elif event == EVENT_FINISHED:
+                partial = self._partial.pop(run.id, "").strip()
+                if partial:
+                    item.summary = partial[:MAX_SUMMARY_LENGTH]
+                self.finished += 1
+                if run.status != FINISHED or run.returncode != 0:
+                    self.failed += 1
+        if event == EVENT_FINISHED:
+            self._check_done()
+
+    def _track_summary(self, item: BatchItem, text: str):
+        text = self._partial.pop(item.run.id, "") + text
+        lines = text.split("\n")
+        last = lines.pop()
+        for line in reversed(lines):
+            if line.strip():
+                item.summary = line.strip()[:MAX_SUMMARY_LENGTH]
+                break
+        if last:
+            self._partial[item.run.id] = last[-MAX_SUMMARY_LENGTH:]
+
+    def _check_done(self):
+        with self._lock:
+            if (self.done.is_set() or self._submit_thread is not None
+                    or self.finished < self.submitted):
+                return
+            self.done.set()
+        self.engine.remove_listener(self._on_event)
+
+    def cancel(self):
+        """Cancel every run that has not finished yet"""
+        self._cancelled = True
+        # Queued runs first, so finishing runs don't free slots for them
+        for item in reversed(self.items):
+            if item.run is not None and not item.run.done.is_set():
+                self.engine.cancel(item.run.id)
+        self._check_done()
+
+    def results(self) -> List[Dict[str, Any]]:
+        """One row per combination: swept values, status, exit code, duration and summary"""
+        rows = []
+        for item in self.items:
+            run = item.run
+            rows.append({
+                "values": item.values,
+                "status": run.status if run is not None else CANCELLED,
+                "returncode": run.returncode if run is not None else None,
+                "duration": run.duration if run is not None else None,
+                "cached": bool(run is not None and run.cached),
+                "summary": item.summary,
+                "run_id": run.id if run is not None else None,
+            })
+        return rows
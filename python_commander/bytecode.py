@@ -0,0 +1,160 @@
+"""
+Bytecode cache for Python Commander
+Compiles catalog scripts in the background into one central directory of
+.pyc files, so runs skip compiling scripts that live where Python cannot
+write __pycache__, such as read-only synced shares
+"""
+
+import os
+import queue
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .runner import bytecode_file, read_cached_code, source_hash
+from .scanner import ChangeSet
+
+# Hash-based .pyc flags (PEP 552); the runner checks the hash itself
+_HASH_BASED = (1).to_bytes(4, "little")
+
+
+class BytecodeCache:
+    """One .pyc per script path, validated against the source hash
+
+    The file layout and checks are shared with runner.load_script, which
+    reads from the cache at launch.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config) -> Optional["BytecodeCache"]:
+        """Create the cache from settings, or None if it is disabled"""
+        if not config.get("settings.bytecode_cache", True):
+            return None
+        return cls(config.app_support_path / "bytecode")
+
+    def path_for(self, script_path: str) -> str:
+        return bytecode_file(str(self.directory), script_path)
+
+    def compile(self, script_path: str) -> bool:
+        """Compile a script unless its current source is cached; returns True if it wrote a file
+
+        Scripts that fail to compile are left to report their error at launch.
+        """
+        with open(script_path, 'rb') as f:
+            source = f.read()
+        if read_cached_code(str(self.directory), script_path, source) is not None:
+            return False
+        try:
+            code = compile(source, script_path, 'exec', dont_inherit=True)
+        except (SyntaxError, ValueError):
+            self.remove(script_path)
+            return False
+
+        import importlib.util
+        import marshal
+        data = importlib.util.MAGIC_NUMBER + _HASH_BASED + source_hash(source) + marshal.dumps(code)
+        fd, tmp_path = tempfile.mkstemp(prefix=".pyc-", suffix=".tmp", dir=str(self.directory))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path_for(script_path))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return True
+
+    def remove(self, script_path: str):
+        try:
+            os.remove(self.path_for(script_path))
+        except OSError:
+            pass
+
+    def prune(self, script_paths: Iterable[str]) -> int:
+        """Delete cached files for scripts other than these; returns how many"""
+        keep = {os.path.basename(self.path_for(path)) for path in script_paths}
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".pyc") and entry.name not in keep:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+
+class BytecodeCompiler:
+    """Keeps a BytecodeCache current with a ScriptCatalog
+
+    Scripts are compiled on a low-priority background thread as the catalog
+    discovers or changes them, off the launch path.
+    """
+
+    def __init__(self, cache: BytecodeCache, catalog):
+        self.cache = cache
+        self.catalog = catalog
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._pruned = False
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config, catalog) -> Optional["BytecodeCompiler"]:
+        cache = BytecodeCache.from_config(config)
+        return cls(cache, catalog) if cache is not None else None
+
+    def start(self):
+        """Start compiling; call before the catalog loads so every script is seen"""
+        if self._thread is not None:
+            return
+        self.catalog.add_listener(self._on_changes)
+        self._thread = threading.Thread(target=self._loop, name="BytecodeCompiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.catalog.remove_listener(self._on_changes)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _on_changes(self, changes: ChangeSet):
+        for path in changes.removed:
+            self._queue.put(("remove", path))
+        for path in changes.added | changes.updated:
+            self._queue.put(("compile", path))
+
+    def _loop(self):
+        try:
+            # Yield to runs and the GUI; only this thread is reniced on Linux
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        compiled = 0
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            action, path = item
+            try:
+                if action == "remove":
+                    self.cache.remove(path)
+                elif self.cache.compile(path):
+                    compiled += 1
+            except OSError as e:
+                print(f"Could not precompile {path}: {e}")
+
+            if self._queue.empty():
+                if compiled:
+                    print(f"Precompiled {compiled} script(s)")
+                    compiled = 0
+                if not self._pruned and self.catalog.loaded.is_set():
+                    # Scripts removed while nothing was watching
+                    self._pruned = True
+                    self.cache.prune(record.path for record in self.catalog.scripts())
@@ -0,0 +1,165 @@
+"""
+Script catalog for Python Commander
+Ties together the index, parser, search index and monitor into a single
+view of every script under the monitored paths
+"""
+
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .index import ScriptIndex
+from .parser import ScriptParser
+from .records import ScriptRecord
+from .scanner import ChangeSet, PatternMatcher
+from .search import SearchIndex
+
+
+class ScriptCatalog:
+    """All known scripts with their metadata, kept current incrementally"""
+
+    def __init__(self, config):
+        self.config = config
+        self.matcher = PatternMatcher.from_config(config)
+        self.parser = ScriptParser(config.script_cache_path)
+        self.search_index = SearchIndex()
+        self.monitor = None
+
+        self._index: Optional[ScriptIndex] = None
+        self._scripts: Dict[str, ScriptRecord] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[ChangeSet], None]] = []
+        self.loaded = threading.Event()
+
+    @property
+    def index(self) -> ScriptIndex:
+        if self._index is None:
+            self._index = ScriptIndex(self.config.index_path, self.matcher)
+        return self._index
+
+    def add_listener(self, callback: Callable[[ChangeSet], None]):
+        """Register a callback for script-level ChangeSets (called off the GUI thread)"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[ChangeSet], None]):
+        """Unregister a change callback"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, changes: ChangeSet):
+        for callback in list(self._listeners):
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"Error in catalog listener: {e}")
+
+    def roots(self) -> List[str]:
+        """Monitored paths, expanded"""
+        return [os.path.abspath(os.path.expanduser(path))
+                for path in self.config.get_monitored_paths()]
+
+    def load(self):
+        """Reconcile the index with disk and load metadata for every script"""
+        self.index.reconcile(self.roots())
+
+        changes = ChangeSet()
+        with self._lock:
+            for root, path in self.index.scripts():
+                if self._update(root, path):
+                    changes.added.add(path)
+
+        self.parser.save()
+        self.loaded.set()
+        self._notify(changes)
+
+    def refresh_paths(self):
+        """Re-read monitored paths from the config after they changed"""
+        roots = self.roots()
+        changes = self.index.reconcile(roots)
+
+        with self._lock:
+            # Scripts under roots that were removed
+            for path, entry in list(self._scripts.items()):
+                if entry.root not in roots:
+                    changes.removed.add(path)
+            for root, path in self.index.scripts():
+                if path not in self._scripts:
+                    changes.added.add(path)
+            self._apply(changes)
+
+        if self.monitor is not None:
+            self.monitor.set_paths(roots)
+        self.parser.save()
+        self._notify(changes)
+
+    def start_monitoring(self):
+        """Start watching the monitored paths for changes"""
+        if self.monitor is not None:
+            return
+
+        from .monitor import ScriptMonitor
+        self.monitor = ScriptMonitor(self.roots(), self._on_file_changes,
+                                     accept=self.matcher.accept)
+        self.monitor.start()
+
+    def stop(self):
+        """Stop monitoring and persist caches"""
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+        self.parser.save()
+
+    def _on_file_changes(self, changes: ChangeSet):
+        """Handle a debounced ChangeSet from the monitor"""
+        changes = self.index.apply_changes(changes, self.roots())
+        with self._lock:
+            self._apply(changes)
+        self.parser.save()
+        if changes:
+            self._notify(changes)
+
+    def _apply(self, changes: ChangeSet):
+        """Update in-memory entries and the search index for a ChangeSet"""
+        roots = self.roots()
+        for path in changes.removed:
+            self._scripts.pop(path, None)
+            self.search_index.remove(path)
+            self.parser.forget(path)
+
+        for path in list(changes.added | changes.updated):
+            matches = [root for root in roots
+                       if path == root or path.startswith(root + os.sep)]
+            if not matches or not self._update(max(matches, key=len), path):
+                changes.added.discard(path)
+                changes.updated.discard(path)
+
+    def _update(self, root: str, path: str) -> bool:
+        """(Re)parse one script; returns False if it could not be read"""
+        try:
+            record = self.parser.parse(path)
+        except OSError:
+            return False
+
+        record.set_root(root)
+        self._scripts[path] = record
+        self.search_index.add(path, record)
+        return True
+
+    def get(self, path: str) -> Optional[ScriptRecord]:
+        """Return the catalog entry for a script"""
+        with self._lock:
+            return self._scripts.get(path)
+
+    def scripts(self) -> List[ScriptRecord]:
+        """Return every catalog entry"""
+        with self._lock:
+            return list(self._scripts.values())
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[ScriptRecord, float]]:
+        """Search scripts, returning (entry, score) pairs best first"""
+        results = []
+        for path, score in self.search_index.search(query, limit):
+            entry = self.get(path)
+            if entry is not None:
+                results.append((entry, score))
+        return results
@@ -0,0 +1,704 @@
+"""
+Command line interface for Python Commander
+Lists, searches and runs catalog scripts without importing Qt, for use
+from cron jobs, CI and terminals without a display
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional
+
+# Subcommands handled here; anything else starts the GUI
+COMMANDS = ("run", "list", "search", "batch", "pipeline", "history", "schedule", "daemon", "agent")
+
+
+def _load_config():
+    """Load the shared config, keeping its diagnostics off stdout"""
+    with redirect_stdout(sys.stderr):
+        from .config import config
+        config.load()
+    return config
+
+
+def _load_catalog(config):
+    """The catalog of a running daemon if there is one, which is already warm, else a fresh one"""
+    from .catalog import ScriptCatalog
+    from .daemon_client import DaemonError, RemoteCatalog, connect
+
+    client = connect(config) if config.get("settings.use_daemon", True) else None
+    if client is not None:
+        catalog = RemoteCatalog(client, config)
+        try:
+            catalog.load()
+            return catalog
+        except DaemonError as e:
+            print(f"Daemon unavailable, scanning scripts here: {e}", file=sys.stderr)
+
+    catalog = ScriptCatalog(config)
+    with redirect_stdout(sys.stderr):
+        catalog.load()
+    return catalog
+
+
+def _parse_assignments(pairs: List[str]) -> Dict[str, str]:
+    """Turn ["k=v", ...] into a dict"""
+    values = {}
+    for pair in pairs:
+        if "=" not in pair:
+            raise ValueError(f"Expected key=value, got '{pair}'")
+        key, value = pair.split("=", 1)
+        values[key.strip()] = value
+    return values
+
+
+def _entry_summary(entry) -> Dict[str, object]:
+    return {
+        "title": entry.title,
+        "path": entry.path,
+        "root": entry.root,
+        "description": entry.description,
+        "arguments": [spec["name"] for spec in entry.arguments],
+    }
+
+
+def cmd_list(args) -> int:
+    """Print every script in the catalog"""
+    catalog = _load_catalog(_load_config())
+    entries = sorted(catalog.scripts(), key=lambda entry: entry.path)
+
+    if args.json:
+        json.dump([_entry_summary(entry) for entry in entries], sys.stdout, indent=2)
+        print()
+    else:
+        for entry in entries:
+            print(f"{entry.title}\t{entry.path}")
+    return 0
+
+
+def cmd_search(args) -> int:
+    """Print scripts matching a query, best first"""
+    catalog = _load_catalog(_load_config())
+    results = catalog.search(" ".join(args.query), args.limit)
+
+    if args.json:
+        json.dump([dict(_entry_summary(entry), score=score) for entry, score in results],
+                  sys.stdout, indent=2)
+        print()
+    else:
+        for entry, score in results:
+            print(f"{entry.title}\t{entry.path}")
+    return 0 if results else 1
+
+
+def _resolve_script(script: str, config) -> Optional[str]:
+    """Accept a script path, or a title / file name from the catalog"""
+    path = os.path.abspath(os.path.expanduser(script))
+    if os.path.isfile(path):
+        return path
+
+    catalog = _load_catalog(config)
+    matches = [entry.path for entry in catalog.scripts()
+               if script in (entry.title, entry.name, os.path.splitext(entry.name)[0])]
+    if len(matches) > 1:
+        print(f"'{script}' is ambiguous:", file=sys.stderr)
+        for match in sorted(matches):
+            print(f"  {match}", file=sys.stderr)
+        return None
+    return matches[0] if matches else None
+
+
+def _limits(args, record) -> dict:
+    """Limits for a run: the script's own, overridden by command line options"""
+    from .execution import normalize_limits
+    return normalize_limits(record.limits, {"memory_mb": args.memory_mb,
+                                            "cpu_seconds": args.cpu_seconds,
+                                            "timeout": args.timeout})
+
+
+def _add_limit_arguments(parser):
+    parser.add_argument("--memory-mb", type=float, metavar="MB",
+                        help="Stop a run whose processes use more memory than this")
+    parser.add_argument("--cpu-seconds", type=float, metavar="SECONDS",
+                        help="CPU time limit per run")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                        help="Wall clock time limit per run")
+
+
+def _bytecode_dir(config) -> Optional[str]:
+    """Where runs find scripts precompiled by the daemon or GUI, if enabled"""
+    from .bytecode import BytecodeCache
+    cache = BytecodeCache.from_config(config)
+    return str(cache.directory) if cache is not None else None
+
+
+def _environments(config):
+    """Builds environments for scripts needing packages this interpreter lacks, if enabled"""
+    from .environments import EnvironmentManager
+    return EnvironmentManager.from_config(config)
+
+
+def _agents(config, local: bool = False):
+    """The configured worker agents, once each has had a first chance to connect"""
+    from .remote import CONNECT_TIMEOUT, AgentPool
+    pool = None if local else AgentPool.from_config(config)
+    if pool is None:
+        return None
+    with redirect_stdout(sys.stderr):
+        pool.start()
+        pool.ready.wait(CONNECT_TIMEOUT * len(pool.agents) + 1)
+    return pool
+
+
+def _start_sampler(config, engine, limits):
+    """Sample runs only when a memory limit needs enforcing across the process tree"""
+    from .sampler import ResourceSampler
+
+    if not (limits.get("memory_mb") or engine.default_limits.get("memory_mb")):
+        return None
+    sampler = ResourceSampler.from_config(config)
+    sampler.attach(engine)
+    sampler.start()
+    return sampler
+
+
+def cmd_run(args) -> int:
+    """Run a script and stream its output to this terminal"""
+    from .execution import EVENT_OUTPUT, ExecutionEngine, build_arguments
+    from .history import RunHistory
+    from .parser import ScriptParser
+    from .result_cache import ResultCache
+
+    config = _load_config()
+    path = _resolve_script(args.script, config)
+    if path is None:
+        print(f"Script not found: {args.script}", file=sys.stderr)
+        return 2
+
+    record = ScriptParser(config.script_cache_path).parse(path)
+    try:
+        arguments = build_arguments(record.arguments, _parse_assignments(args.arg))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    def on_event(run, event, data):
+        if event == EVENT_OUTPUT:
+            stream, text = data
+            target = sys.stdout if stream == "stdout" else sys.stderr
+            target.write(text)
+            target.flush()
+
+    result_cache = None if args.no_cache else ResultCache.from_config(config)
+    limits = _limits(args, record)
+    engine = ExecutionEngine(max_concurrency=1, result_cache=result_cache,
+                             default_limits=config.get("settings.run_limits", {}),
+                             bytecode_dir=_bytecode_dir(config),
+                             environments=_environments(config),
+                             agents=_agents(config, args.local))
+    engine.add_listener(on_event)
+    RunHistory.from_config(config).attach(engine)
+    sampler = _start_sampler(config, engine, limits)
+    profile = None
+    if args.profile or args.trace_memory:
+        from .profiling import ProfileStore
+        profile = ProfileStore.from_config(config).allocate(path, memory=args.trace_memory)
+    run = engine.submit(path, arguments, memoize=record.cache, cache_inputs=record.cache_inputs,
+                        limits=limits, profile=profile)
+    try:
+        run.done.wait()
+    except KeyboardInterrupt:
+        engine.cancel(run.id)
+        run.done.wait()
+        return 130
+    # Let a result being written to the cache finish
+    engine.shutdown(wait=True)
+    if sampler is not None:
+        sampler.stop()
+    if profile is not None:
+        _print_profile(profile)
+
+    if run.error:
+        print(f"Error: {run.error}", file=sys.stderr)
+        return 1
+    return run.returncode if run.returncode is not None else 1
+
+
+def _print_profile(profile, limit: int = 15):
+    """Summarize a profiled run's hotspots on stderr"""
+    from .profiling import load_allocations, load_hotspots
+
+    try:
+        hotspots = load_hotspots(profile["stats"])
+    except (OSError, ValueError, EOFError) as e:
+        print(f"No profile was saved: {e}", file=sys.stderr)
+        return
+    print(f"\nTop functions by own time (profile saved to {profile['stats']}):", file=sys.stderr)
+    print(f"{'own s':>9} {'total s':>9} {'calls':>9}  function", file=sys.stderr)
+    for hotspot in hotspots[:limit]:
+        location = f" {hotspot.location}" if hotspot.location else ""
+        print(f"{hotspot.own_time:9.4f} {hotspot.total_time:9.4f} {hotspot.calls:9d}  "
+              f"{hotspot.name}{location}", file=sys.stderr)
+
+    allocations = load_allocations(profile["memory"]) if profile.get("memory") else None
+    if allocations is not None:
+        when = "near the peak" if allocations.get("at_peak") else "when main() returned"
+        print(f"\nPeak traced memory {allocations['peak'] / (1024 * 1024):.1f} MB; "
+              f"largest allocation sites {when}:", file=sys.stderr)
+        for site in allocations["sites"][:limit // 3]:
+            file, line = site["frames"][0] if site["frames"] else ("?", 0)
+            print(f"{site['size'] / 1024:9.1f} KB {site['count']:9d}  {file}:{line}",
+                  file=sys.stderr)
+
+
+def cmd_batch(args) -> int:
+    """Run a script once per combination of swept argument values"""
+    from .batch import PRODUCT, ZIP, BatchRun, build_batch, parse_sweep_value
+    from .execution import ExecutionEngine
+    from .history import RunHistory
+    from .parser import ScriptParser
+    from .result_cache import ResultCache
+
+    config = _load_config()
+    path = _resolve_script(args.script, config)
+    if path is None:
+        print(f"Script not found: {args.script}", file=sys.stderr)
+        return 2
+
+    record = ScriptParser(config.script_cache_path).parse(path)
+    try:
+        sweep = {name: parse_sweep_value(text, os.getcwd())
+                 for name, text in _parse_assignments(args.sweep).items()}
+        items = build_batch(record.arguments, _parse_assignments(args.arg), sweep,
+                            ZIP if args.zip else PRODUCT)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    jobs = args.jobs or os.cpu_count() or 1
+    result_cache = None if args.no_cache else ResultCache.from_config(config)
+    limits = _limits(args, record)
+    agents = _agents(config, args.local)
+    engine = ExecutionEngine(max_concurrency=jobs, result_cache=result_cache,
+                             default_limits=config.get("settings.run_limits", {}),
+                             bytecode_dir=_bytecode_dir(config),
+                             environments=_environments(config), agents=agents)
+    RunHistory.from_config(config).attach(engine)
+    sampler = _start_sampler(config, engine, limits)
+    batch = BatchRun(engine, path, items, memoize=record.cache, cache_inputs=record.cache_inputs,
+                     limits=limits)
+    remote = sum(agent.status.get("slots", 0) for agent in agents.agents if agent.connected) \
+        if agents is not None else 0
+    print(f"Running {batch.total} combinations, {jobs} at a time"
+          f"{f' plus {remote} on agents' if remote else ''}", file=sys.stderr)
+
+    threading.Thread(target=batch.start, name="BatchSubmit", daemon=True).start()
+    try:
+        while not batch.done.wait(0.5):
+            print(f"\r{batch.finished}/{batch.total} done, {batch.failed} failed",
+                  end="", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        batch.cancel()
+        batch.done.wait()
+    print(f"\r{batch.finished}/{batch.total} done, {batch.failed} failed", file=sys.stderr)
+    engine.shutdown(wait=True)
+    if sampler is not None:
+        sampler.stop()
+
+    rows = batch.results()
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        names = list(sweep)
+        print("\t".join(names + ["status", "exit", "seconds", "output"]))
+        for row in rows:
+            duration = "" if row["duration"] is None else f"{row['duration']:.2f}"
+            returncode = "" if row["returncode"] is None else str(row["returncode"])
+            status = row["status"] + (" (cached)" if row["cached"] else "")
+            print("\t".join([str(row["values"][name]) for name in names]
+                            + [status, returncode, duration, row["summary"]]))
+    return 0 if batch.failed == 0 else 1
+
+
+def _format_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def cmd_pipeline(args) -> int:
+    """Run scripts chained stdout to stdin, streaming the last one's output here"""
+    from .execution import EVENT_OUTPUT, ExecutionEngine, build_arguments
+    from .history import RunHistory
+    from .parser import ScriptParser
+    from .pipeline import Pipeline, parse_stage, stages_from_config, stages_to_config
+
+    config = _load_config()
+    parser = ScriptParser(config.script_cache_path)
+    stages = []
+    if args.saved:
+        saved = config.get_pipelines().get(args.saved)
+        if saved is None:
+            print(f"No saved pipeline named '{args.saved}'", file=sys.stderr)
+            return 2
+        stages = stages_from_config(saved)
+    try:
+        for text in args.stage:
+            script, values = parse_stage(text)
+            path = _resolve_script(script, config)
+            if path is None:
+                print(f"Script not found: {script}", file=sys.stderr)
+                return 2
+            stages.append((path, build_arguments(parser.parse(path).arguments, values)))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if not stages:
+        print("Error: give at least one stage, or --saved NAME", file=sys.stderr)
+        return 2
+    if args.save:
+        config.save_pipeline(args.save, stages_to_config(stages))
+        config.flush()
+
+    stdin = stdout = None
+    try:
+        if args.input:
+            stdin = os.open(args.input, os.O_RDONLY)
+        # The last stage writes straight to this terminal, file or pipe
+        stdout = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644) \
+            if args.output else sys.stdout.fileno()
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    def on_event(run, event, data):
+        # Only stderr is captured; stdout flows between the stages
+        if event == EVENT_OUTPUT:
+            sys.stderr.write(data[1])
+            sys.stderr.flush()
+
+    engine = ExecutionEngine(max_concurrency=1, default_limits=config.get("settings.run_limits", {}),
+                             bytecode_dir=_bytecode_dir(config),
+                             environments=_environments(config))
+    engine.add_listener(on_event)
+    RunHistory.from_config(config).attach(engine)
+    sys.stdout.flush()
+    pipeline = Pipeline(engine, stages, stdin=stdin, stdout=stdout)
+    pipeline.start()
+    try:
+        pipeline.done.wait()
+    except KeyboardInterrupt:
+        pipeline.cancel()
+        pipeline.done.wait()
+        return 130
+    finally:
+        if stdin is not None:
+            os.close(stdin)
+        if args.output:
+            os.close(stdout)
+    engine.shutdown(wait=True)
+
+    failed = pipeline.failed_stage
+    if failed is not None:
+        stage = pipeline.runs.index(failed) + 1
+        reason = failed.error or f"exit code {failed.returncode}"
+        print(f"Stage {stage} ({os.path.basename(failed.script_path)}) failed: {reason}",
+              file=sys.stderr)
+        return failed.returncode if failed.returncode and failed.returncode > 0 else 1
+    return 0
+
+
+def cmd_history(args) -> int:
+    """Report on past runs from the run history"""
+    from .history import RunHistory
+
+    config = _load_config()
+    history = RunHistory.from_config(config)
+    if args.report == "slowest":
+        rows = history.slowest(days=args.days, limit=args.limit)
+    elif args.report == "regressions":
+        rows = history.regressions(days=args.days, min_ratio=args.min_ratio, limit=args.limit)
+    elif args.report == "failures":
+        rows = history.failure_rates(days=args.days, limit=args.limit)
+    else:
+        rows = history.runs(script=_resolve_script(args.script, config) if args.script else None,
+                            limit=args.limit)
+        for row in rows:
+            row.pop("id", None)
+            row.pop("script_hash", None)
+    history.close()
+
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    elif rows:
+        columns = list(rows[0])
+        print("\t".join(columns))
+        for row in rows:
+            print("\t".join(_format_cell(row[column]) for column in columns))
+    return 0
+
+
+def _reload_daemon_schedules(config):
+    """Have a running daemon pick up changed schedules"""
+    from .daemon_client import DaemonError, connect
+
+    config.flush()
+    client = connect(config)
+    if client is None:
+        return
+    try:
+        client.request("schedule.reload")
+    except DaemonError as e:
+        print(f"Error: {e}", file=sys.stderr)
+    finally:
+        client.close()
+
+
+def cmd_schedule(args) -> int:
+    """List, add or remove scheduled runs, which the daemon starts"""
+    import time
+    from .daemon_client import DaemonError, connect
+    from .execution import build_arguments
+    from .parser import ScriptParser
+    from .scheduler import Schedule, load_schedules
+
+    config = _load_config()
+    if args.action == "remove":
+        if args.name not in config.get_schedules():
+            print(f"No schedule named '{args.name}'", file=sys.stderr)
+            return 2
+        config.delete_schedule(args.name)
+        _reload_daemon_schedules(config)
+        return 0
+
+    if args.action == "add":
+        if not args.name or not args.script:
+            print("Error: give a NAME and a SCRIPT", file=sys.stderr)
+            return 2
+        path = _resolve_script(args.script, config)
+        if path is None:
+            print(f"Script not found: {args.script}", file=sys.stderr)
+            return 2
+        record = ScriptParser(config.script_cache_path).parse(path)
+        try:
+            arguments = build_arguments(record.arguments, _parse_assignments(args.arg))
+            schedule = Schedule(args.name, path, arguments, cron=args.cron, interval=args.every,
+                                jitter=args.jitter, overlap=args.overlap, catch_up=args.catch_up,
+                                enabled=not args.disabled)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        config.save_schedule(args.name, schedule.to_config())
+        _reload_daemon_schedules(config)
+        return 0
+
+    # The daemon knows the real next run times and what is running
+    items = None
+    client = connect(config)
+    if client is not None:
+        try:
+            items = client.request("schedule.list")
+        except DaemonError as e:
+            print(f"Error: {e}", file=sys.stderr)
+        finally:
+            client.close()
+    if items is None:
+        now = time.time()
+        items = [{"name": schedule.name, "schedule": schedule.to_config(),
+                  "next": schedule.next_due(now) if schedule.enabled else None,
+                  "active": 0, "queued": 0}
+                 for schedule in load_schedules(config.get_schedules())]
+
+    if args.json:
+        json.dump(items, sys.stdout, indent=2)
+        print()
+    else:
+        for item in items:
+            schedule = Schedule.from_config(item["name"], item["schedule"])
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(item["next"])) \
+                if item["next"] else "disabled"
+            running = f"\t{item['active']} running" if item["active"] else ""
+            print(f"{schedule.name}\t{schedule.describe()}\t{when}\t{schedule.script}{running}")
+    return 0
+
+
+def cmd_daemon(args) -> int:
+    """Start, stop or query the background daemon, or run one in this process"""
+    import time
+    from .daemon_client import DaemonError, connect
+
+    config = _load_config()
+    if args.action == "run":
+        from .daemon import run_daemon
+        return run_daemon(config)
+
+    client = connect(config, start=args.action == "start")
+    if client is None:
+        if args.action == "start":
+            print("Error: the daemon could not be started", file=sys.stderr)
+            return 1
+        print("Daemon is not running", file=sys.stderr)
+        return 0 if args.action == "stop" else 1
+
+    try:
+        status = client.request("ping")
+        if args.action == "stop":
+            client.request("shutdown")
+            # Running scripts get the usual grace period to exit
+            from .execution import KILL_GRACE
+            deadline = time.time() + KILL_GRACE + 5
+            while os.path.exists(config.daemon_socket_path) and time.time() < deadline:
+                time.sleep(0.1)
+            print(f"Stopped daemon {status['pid']}", file=sys.stderr)
+            return 0
+    except DaemonError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+
+    if args.json:
+        json.dump(status, sys.stdout, indent=2)
+        print()
+    else:
+        uptime = time.time() - status["started_at"]
+        print(f"Daemon {status['pid']} up {uptime:.0f}s: {status['scripts']} scripts"
+              f"{'' if status['loaded'] else ' (loading)'}, {status['active_runs']} active runs, "
+              f"{status['clients']} clients")
+    return 0
+
+
+def cmd_agent(args) -> int:
+    """Run a worker agent that executes scripts for other machines' controllers"""
+    from .agent import run_agent
+
+    config = _load_config()
+    return run_agent(config, args.host, args.port, args.slots, args.token)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m python_commander",
+                                     description="Run and manage Python Commander scripts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List scripts in the monitored paths")
+    list_parser.add_argument("--json", action="store_true", help="Output JSON")
+    list_parser.set_defaults(func=cmd_list)
+
+    search_parser = subparsers.add_parser("search", help="Search scripts")
+    search_parser.add_argument("query", nargs="+")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--json", action="store_true", help="Output JSON")
+    search_parser.set_defaults(func=cmd_search)
+
+    run_parser = subparsers.add_parser("run", help="Run a script")
+    run_parser.add_argument("script", help="Script path, title or file name")
+    run_parser.add_argument("--arg", action="append", default=[], metavar="KEY=VALUE",
+                            help="Argument value (repeatable)")
+    run_parser.add_argument("--no-cache", action="store_true",
+                            help="Always run, even if the script's result is cached")
+    _add_limit_arguments(run_parser)
+    run_parser.add_argument("--profile", action="store_true",
+                            help="Run main() under cProfile and print the hotspots")
+    run_parser.add_argument("--trace-memory", action="store_true",
+                            help="Profile and also trace memory allocations")
+    run_parser.add_argument("--local", action="store_true", help="Run here, not on an agent")
+    run_parser.set_defaults(func=cmd_run)
+
+    batch_parser = subparsers.add_parser("batch", help="Run a script over a sweep of argument values")
+    batch_parser.add_argument("script", help="Script path, title or file name")
+    batch_parser.add_argument("--sweep", action="append", default=[], metavar="KEY=VALUES",
+                              help="Values to sweep: comma-separated, or a glob of files (repeatable)")
+    batch_parser.add_argument("--arg", action="append", default=[], metavar="KEY=VALUE",
+                              help="Fixed argument value (repeatable)")
+    batch_parser.add_argument("--zip", action="store_true",
+                              help="Pair swept values position by position instead of every combination")
+    batch_parser.add_argument("--jobs", type=int, default=0,
+                              help="Runs at a time (default: number of CPUs)")
+    batch_parser.add_argument("--no-cache", action="store_true",
+                              help="Always run, even if a combination's result is cached")
+    batch_parser.add_argument("--local", action="store_true", help="Run only here, not on agents")
+    batch_parser.add_argument("--json", action="store_true", help="Output JSON")
+    _add_limit_arguments(batch_parser)
+    batch_parser.set_defaults(func=cmd_batch)
+
+    pipeline_parser = subparsers.add_parser(
+        "pipeline", help="Run scripts with each one's stdout piped into the next one's stdin")
+    pipeline_parser.add_argument("stage", nargs="*",
+                                 help='A stage as "script key=value ...", in pipeline order')
+    pipeline_parser.add_argument("--input", metavar="FILE", help="Feed this file to the first stage")
+    pipeline_parser.add_argument("--output", metavar="FILE",
+                                 help="Write the last stage's output to this file")
+    pipeline_parser.add_argument("--saved", metavar="NAME",
+                                 help="Start with the stages of a saved pipeline")
+    pipeline_parser.add_argument("--save", metavar="NAME", help="Save the stages under this name")
+    pipeline_parser.set_defaults(func=cmd_pipeline)
+
+    history_parser = subparsers.add_parser("history", help="Show past runs and run statistics")
+    history_parser.add_argument("report", nargs="?", default="runs",
+                                choices=("runs", "slowest", "regressions", "failures"))
+    history_parser.add_argument("--script", help="Only runs of this script (runs report)")
+    history_parser.add_argument("--days", type=float, default=7,
+                                help="Period to report on (regressions compare with the period before)")
+    history_parser.add_argument("--min-ratio", type=float, default=1.2,
+                                help="Slowdown that counts as a regression")
+    history_parser.add_argument("--limit", type=int, default=20)
+    history_parser.add_argument("--json", action="store_true", help="Output JSON")
+    history_parser.set_defaults(func=cmd_history)
+
+    schedule_parser = subparsers.add_parser(
+        "schedule", help="Manage scripts run on a cron expression or an interval by the daemon")
+    schedule_parser.add_argument("action", nargs="?", default="list", choices=("list", "add", "remove"))
+    schedule_parser.add_argument("name", nargs="?", help="Schedule name (add, remove)")
+    schedule_parser.add_argument("script", nargs="?", help="Script path or title (add)")
+    when_group = schedule_parser.add_mutually_exclusive_group()
+    when_group.add_argument("--cron", metavar="EXPR", help='Cron expression, e.g. "*/15 * * * *"')
+    when_group.add_argument("--every", type=float, metavar="SECONDS", help="Fixed interval")
+    schedule_parser.add_argument("--arg", action="append", default=[], metavar="KEY=VALUE",
+                                 help="Argument value for every run (repeatable)")
+    schedule_parser.add_argument("--jitter", type=float, default=0, metavar="SECONDS",
+                                 help="Start each run up to this much later, at random")
+    schedule_parser.add_argument("--overlap", default="skip", choices=("skip", "queue", "parallel"),
+                                 help="When the last run is still going")
+    schedule_parser.add_argument("--catch-up", default="latest", choices=("none", "latest", "all"),
+                                 help="Runs missed while the daemon was not running")
+    schedule_parser.add_argument("--disabled", action="store_true", help="Save without enabling")
+    schedule_parser.add_argument("--json", action="store_true", help="Output JSON (list)")
+    schedule_parser.set_defaults(func=cmd_schedule)
+
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Manage the background daemon that keeps the catalog and runs alive")
+    daemon_parser.add_argument("action", nargs="?", default="status",
+                               choices=("start", "stop", "status", "run"),
+                               help="run keeps the daemon in the foreground")
+    daemon_parser.add_argument("--json", action="store_true", help="Output JSON (status)")
+    daemon_parser.set_defaults(func=cmd_daemon)
+
+    agent_parser = subparsers.add_parser(
+        "agent", help="Run scripts sent by Python Commander on other machines")
+    agent_parser.add_argument("--host", default="127.0.0.1",
+                              help="Address to listen on (0.0.0.0 for every interface)")
+    agent_parser.add_argument("--port", type=int, default=7345)
+    agent_parser.add_argument("--slots", type=int, default=0,
+                              help="Runs at a time (default: number of CPUs)")
+    agent_parser.add_argument("--token", help="Shared secret controllers must know; required "
+                                              "unless the agent_token setting is set")
+    agent_parser.set_defaults(func=cmd_agent)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
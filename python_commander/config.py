@@ -1,13 +1,88 @@
 """
 Configuration management for Python Commander
 Handles default settings and user-specific configurations
+
+Several processes share config.json: GUI windows, the daemon, the CLI and
+agents. Each records the keys it changes and writes them under an advisory
+lock onto whatever is on disk then, so edits made elsewhere survive. Every
+write bumps a revision number; other processes notice by stat() and take
+in just the keys that changed.
 """
 
+import atexit
+import copy
 import json
 import os
 import sys
+import tempfile
+import threading
+import warnings
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Seconds to wait for more changes before writing config.json
+SAVE_DELAY = 0.5
+
+# Seconds between checks for changes saved by other processes
+WATCH_INTERVAL = 1.0
+
+# Counter in config.json bumped by every write
+REVISION_KEY = "revision"
+
+# Returned by an update function to remove the key
+DELETE = object()
+
+_MISSING = object()
+
+
+def merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge override into base in place, recursing into nested dicts"""
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            merge(base[key], value)
+        else:
+            base[key] = copy.deepcopy(value)
+    return base
+
+
+def _lookup(data: Dict[str, Any], path: Tuple[str, ...]):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return _MISSING
+        data = data[key]
+    return data
+
+
+def _apply(data: Dict[str, Any], path: Tuple[str, ...], update: Callable[[Any], Any]):
+    """Replace the value at path with update(old value or None), creating parent dicts"""
+    for key in path[:-1]:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+        data = data[key]
+    value = update(data.get(path[-1]))
+    if value is DELETE:
+        data.pop(path[-1], None)
+    else:
+        # Never shared between the config and the copy of what is on disk
+        data[path[-1]] = copy.deepcopy(value)
+
+
+def _diff(old: Any, new: Any, path: Tuple[str, ...] = ()) -> Set[Tuple[str, ...]]:
+    """Paths of the leaves that differ between two configs"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = set()
+        for key in old.keys() | new.keys():
+            changed |= _diff(old.get(key, _MISSING), new.get(key, _MISSING), path + (key,))
+        return changed
+    return set() if old == new else {path}
+
+
+def key_changed(keys: Iterable[str], key: str) -> bool:
+    """Whether a set of changed keys from the change feed touches key"""
+    return any(changed == key or changed.startswith(key + ".") or key.startswith(changed + ".")
+               for changed in keys)
+
 
 class ConfigManager:
     def __init__(self):
@@ -22,21 +97,70 @@ class ConfigManager:
                 "auto_refresh": True,
                 "refresh_interval": 5,  # seconds
                 "show_hidden_files": False,
-                "default_script_template": "script-template.py"
+                "default_script_template": "script-template.py",
+                "max_concurrent_runs": 4,
+                "worker_pool_size": 2,
+                "worker_preload": [],
+                "worker_max_runs": 50,
+                "worker_max_rss_mb": 512,
+                "output_ring_lines": 5000,
+                "output_spill_mb": 4,
+                "startup_budget_ms": 400,
+                "result_cache_mb": 256,
+                "bytecode_cache": True,
+                "script_environments": True,
+                "wheel_dir": "",
+                "batch_concurrency": 0,
+                "run_limits": {},
+                "sample_interval_ms": 500,
+                "profile_memory": False,
+                "profiles_kept": 100,
+                "use_daemon": True,
+                "daemon_replay_kb": 512,
+                "agents": [],
+                "agent_token": ""
             },
             "monitored_paths": [
                 str(Path.home() / "Documents" / "Python Scripts"),
                 str(Path.home() / "Desktop"),
             ],
             "recent_scripts": [],
-            "favorites": []
+            "favorites": [],
+            "pipelines": {},
+            "schedules": {},
+            "file_patterns": {
+                "include": ["*.py"],
+                "exclude": ["__pycache__", "*.pyc", ".git", ".venv", "venv"]
+            }
         }
         
+        # Write-behind state: sets mark the config dirty and a timer saves it
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._batch_depth = 0
+        self._save_timer = None
+        self.save_delay = SAVE_DELAY
+        # Unsaved changes, in order, as (key path, update function)
+        self._changes: List[Tuple[Tuple[str, ...], Callable[[Any], Any]]] = []
+        
+        # What this process last read or wrote: defaults plus the bundle config,
+        # the user file, its revision and its stat() signature
+        self._base: Dict[str, Any] = {}
+        self._disk: Dict[str, Any] = {}
+        self.revision = 0
+        self._signature = None
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self._watch_stop: Optional[threading.Event] = None
+        
         # Initialize paths
         self._setup_paths()
         
         # Load configuration
         self.config = self._load_config()
+        
+        # Never lose pending changes on exit
+        atexit.register(self.flush)
     
     def _setup_paths(self):
         """Set up configuration file paths for macOS app bundle"""
@@ -54,7 +178,14 @@ class ConfigManager:
         # User configuration in Application Support
         app_support = Path.home() / "Library" / "Application Support" / self.app_name
         app_support.mkdir(parents=True, exist_ok=True)
+        self.app_support_path = app_support
         self.user_config_path = app_support / self.config_filename
+        self.config_lock_path = app_support / "config.lock"
+        self.script_cache_path = app_support / "script_cache.json"
+        self.index_path = app_support / "index.sqlite3"
+        self.history_path = app_support / "history.sqlite3"
+        self.profiles_path = app_support / "profiles"
+        self.daemon_socket_path = app_support / "daemon.sock"
         
         print(f"Config paths:")
         print(f"  Default config: {self.default_config_path}")
@@ -62,45 +193,269 @@ class ConfigManager:
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration with fallbacks"""
-        config = self.defaults.copy()
+        base = copy.deepcopy(self.defaults)
         
         # Try to load default config from app bundle
         if self.default_config_path.exists():
             try:
                 with open(self.default_config_path, 'r') as f:
                     bundle_config = json.load(f)
-                    config.update(bundle_config)
+                    merge(base, bundle_config)
                 print(f"Loaded default config from: {self.default_config_path}")
             except Exception as e:
                 print(f"Error loading default config: {e}")
+        self._base = base
         
         # Load user config (overrides defaults)
-        if self.user_config_path.exists():
+        user_config, signature = self._read_user_config()
+        if user_config is not None:
+            print(f"Loaded user config from: {self.user_config_path}")
+        elif not self.user_config_path.exists():
+            # Create initial user config, unless another process just did
+            with self._file_lock():
+                user_config, signature = self._read_user_config()
+                if user_config is None:
+                    user_config = dict(copy.deepcopy(base), **{REVISION_KEY: 1})
+                    signature = self._write_user_config(user_config)
+                    print(f"Created initial user config at: {self.user_config_path}")
+        
+        self._disk = user_config or {}
+        self.revision = self._disk.get(REVISION_KEY, 0)
+        self._signature = signature
+        return merge(copy.deepcopy(base), self._disk)
+    
+    def _stat_signature(self, st: os.stat_result) -> Tuple[int, int, int]:
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    
+    def _read_user_config(self) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[int, int, int]]]:
+        """The user config file and its stat() signature; None if missing or unreadable"""
+        try:
+            with open(self.user_config_path, 'r') as f:
+                signature = self._stat_signature(os.fstat(f.fileno()))
+                try:
+                    data = json.load(f)
+                except ValueError as e:
+                    print(f"Error loading user config: {e}")
+                    return None, signature
+        except FileNotFoundError:
+            return None, None
+        except OSError as e:
+            print(f"Error loading user config: {e}")
+            return None, None
+        if not isinstance(data, dict):
+            print("Error loading user config: not a JSON object")
+            return None, signature
+        return data, signature
+    
+    @contextmanager
+    def _file_lock(self):
+        """Hold the advisory lock other Commander processes take to write config.json"""
+        try:
+            import fcntl
+        except ImportError:
+            # No advisory locks here; writes are still atomic
+            yield
+            return
+        with open(self.config_lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
             try:
-                with open(self.user_config_path, 'r') as f:
-                    user_config = json.load(f)
-                    config.update(user_config)
-                print(f"Loaded user config from: {self.user_config_path}")
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _write_user_config(self, data: Dict[str, Any]) -> Tuple[int, int, int]:
+        """Write config.json atomically (temp file + rename); returns its stat() signature"""
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp",
+                                            dir=str(self.user_config_path.parent))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                # The renamed file keeps this inode, so this is what watchers will see
+                signature = self._stat_signature(os.fstat(f.fileno()))
+            # Readers see either the old file or the new one, never a torn one
+            os.replace(tmp_path, self.user_config_path)
+        except BaseException:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return signature
+    
+    def reload(self):
+        """Re-read the config files, e.g. after another process changed them"""
+        self.flush()
+        config = self._load_config()
+        with self._lock:
+            self.config = config
+    
+    def _save_user_config(self):
+        """Write this process's changed keys onto the current config.json
+        
+        The file is re-read under the lock, so keys other processes saved
+        since it was last read are kept, and taken into this process's
+        config as well.
+        """
+        with self._write_lock:
+            with self._lock:
+                changes, self._changes = self._changes, []
+                self._dirty = False
+                if not changes:
+                    return
+            
+            try:
+                with self._file_lock():
+                    disk, _ = self._read_user_config()
+                    if disk is None:
+                        # Missing or corrupt: rewrite it from what this process has
+                        with self._lock:
+                            disk = copy.deepcopy(self.config)
+                    for path, update in changes:
+                        _apply(disk, path, update)
+                    disk[REVISION_KEY] = max(disk.get(REVISION_KEY, 0), self.revision) + 1
+                    signature = self._write_user_config(disk)
+                print(f"Saved user config to: {self.user_config_path}")
             except Exception as e:
-                print(f"Error loading user config: {e}")
-        else:
-            # Create initial user config
-            self._save_user_config(config)
-            print(f"Created initial user config at: {self.user_config_path}")
+                print(f"Error saving user config: {e}")
+                with self._lock:
+                    self._changes[:0] = changes
+                    self._dirty = True
+                return
+            
+            keys = self._absorb(disk, signature, {path for path, _ in changes})
+        self._notify(keys)
+    
+    def _absorb(self, disk: Dict[str, Any], signature, own: Iterable[Tuple[str, ...]] = ()) -> Set[str]:
+        """Take the keys that changed on disk into this process's config
+        
+        Keys with unsaved changes here keep them. Returns the keys changed
+        by other processes, for the listeners.
+        """
+        own = set(own)
+        with self._lock:
+            changed = _diff(self._disk, disk)
+            merged = merge(copy.deepcopy(self._base), disk)
+            for path in changed:
+                value = _lookup(merged, path)
+                _apply(self.config, path, lambda old: DELETE if value is _MISSING else value)
+            for path, update in self._changes:
+                _apply(self.config, path, update)
+            self._disk = disk
+            self.revision = disk.get(REVISION_KEY, 0)
+            self._signature = signature
         
-        return config
+        return {".".join(path) for path in changed
+                if path != (REVISION_KEY,)
+                and not any(path[:len(mine)] == mine for mine in own)}
     
-    def _save_user_config(self, config: Dict[str, Any] = None):
-        """Save user configuration"""
-        if config is None:
-            config = self.config
+    def _notify(self, keys: Set[str]):
+        if not keys:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(keys)
+            except Exception as e:
+                print(f"Error in config listener: {e}")
+    
+    def check_for_changes(self) -> Set[str]:
+        """Take in keys other processes saved since the last look; returns them
         
+        Costs one stat() when nothing changed.
+        """
         try:
-            with open(self.user_config_path, 'w') as f:
-                json.dump(config, f, indent=2)
-            print(f"Saved user config to: {self.user_config_path}")
-        except Exception as e:
-            print(f"Error saving user config: {e}")
+            signature = self._stat_signature(os.stat(self.user_config_path))
+        except OSError:
+            return set()
+        if signature == self._signature:
+            return set()
+        disk, signature = self._read_user_config()
+        if disk is None:
+            # Not again until it changes
+            self._signature = signature
+            return set()
+        with self._write_lock:
+            if disk.get(REVISION_KEY, 0) < self.revision:
+                # This process has since written a newer one
+                return set()
+            keys = self._absorb(disk, signature)
+        self._notify(keys)
+        return keys
+    
+    def add_listener(self, callback: Callable[[Set[str]], None]):
+        """Call callback(keys) with the dotted keys other processes change
+        
+        Changes are only noticed while watching (see start_watching) or on
+        check_for_changes(); callbacks run on that thread.
+        """
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback: Callable[[Set[str]], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def start_watching(self, interval: float = WATCH_INTERVAL):
+        """Check for changes from other processes on a background thread"""
+        if self._watch_stop is not None:
+            return
+        self._watch_stop = threading.Event()
+        threading.Thread(target=self._watch_loop, args=(self._watch_stop, interval),
+                         name="ConfigWatcher", daemon=True).start()
+    
+    def stop_watching(self):
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
+    
+    def _watch_loop(self, stop: threading.Event, interval: float):
+        while not stop.wait(interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                print(f"Error checking config for changes: {e}")
+    
+    def _schedule_save(self):
+        """Mark the config dirty and (re)start the debounced background save"""
+        with self._lock:
+            self._dirty = True
+            if self._batch_depth:
+                return
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.save_delay, self._save_if_dirty)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def _save_if_dirty(self):
+        """Write the config if anything changed since the last save"""
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+        self._save_user_config()
+    
+    @contextmanager
+    def batch(self):
+        """Group several set() calls into a single save"""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                pending = self._batch_depth == 0 and self._dirty
+            if pending:
+                self._schedule_save()
+    
+    def flush(self):
+        """Write pending changes now (called automatically at exit)"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+        # Also waits for a background save already under way
+        self._save_user_config()
     
     def get(self, key: str, default=None):
         """Get configuration value with dot notation support"""
@@ -117,41 +472,77 @@ class ConfigManager:
     
     def set(self, key: str, value: Any):
         """Set configuration value with dot notation support"""
-        keys = key.split('.')
-        config = self.config
-        
-        # Navigate to the parent dictionary
-        for k in keys[:-1]:
-            if k not in config:
-                config[k] = {}
-            config = config[k]
+        value = copy.deepcopy(value)
+        self._update(tuple(key.split('.')), lambda old: value, replace=True)
+    
+    def _update(self, path: Tuple[str, ...], update: Callable[[Any], Any], replace: bool = False):
+        """Change one key now and, when saving, on top of whatever config.json then holds
         
-        # Set the final value
-        config[keys[-1]] = value
+        update gets the key's current value (None if unset) and returns the
+        new one, or DELETE; it is called again at save time, so it should
+        only depend on its argument. With replace, the new value doesn't
+        depend on the old one, so earlier unsaved changes to the key are dropped.
+        """
+        with self._lock:
+            _apply(self.config, path, update)
+            if replace:
+                self._changes = [(p, u) for p, u in self._changes if p[:len(path)] != path]
+            self._changes.append((path, update))
         
-        # Save to user config
-        self._save_user_config()
+        # Save to user config in the background
+        self._schedule_save()
+    
+    def get_pipelines(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Saved pipelines by name, each a list of {"script", "arguments"} stages"""
+        return dict(self.config.get("pipelines", {}))
+    
+    def save_pipeline(self, name: str, stages: List[Dict[str, Any]]):
+        """Save (or replace) a named pipeline"""
+        stages = copy.deepcopy(stages)
+        self._update(("pipelines", name), lambda old: stages, replace=True)
+    
+    def delete_pipeline(self, name: str):
+        if name in self.get_pipelines():
+            self._update(("pipelines", name), lambda old: DELETE, replace=True)
+    
+    def get_schedules(self) -> Dict[str, Dict[str, Any]]:
+        """Saved schedules by name, each {"script", "arguments", "cron" or "interval", ...}"""
+        return dict(self.config.get("schedules", {}))
+    
+    def save_schedule(self, name: str, schedule: Dict[str, Any]):
+        """Save (or replace) a named schedule"""
+        schedule = copy.deepcopy(schedule)
+        self._update(("schedules", name), lambda old: schedule, replace=True)
+    
+    def delete_schedule(self, name: str):
+        if name in self.get_schedules():
+            self._update(("schedules", name), lambda old: DELETE, replace=True)
     
     def add_monitored_path(self, path: str):
         """Add a path to monitor for Python scripts"""
-        paths = self.config.get("monitored_paths", [])
-        if path not in paths:
-            paths.append(path)
-            self.set("monitored_paths", paths)
+        if path not in self.get_monitored_paths():
+            # Merged with paths other processes add or remove meanwhile
+            self._update(("monitored_paths",),
+                         lambda paths: (paths or []) + ([] if path in (paths or []) else [path]))
     
     def remove_monitored_path(self, path: str):
         """Remove a monitored path"""
-        paths = self.config.get("monitored_paths", [])
-        if path in paths:
-            paths.remove(path)
-            self.set("monitored_paths", paths)
+        if path in self.get_monitored_paths():
+            self._update(("monitored_paths",),
+                         lambda paths: [p for p in (paths or []) if p != path])
     
     def get_monitored_paths(self) -> List[str]:
         """Get list of monitored paths"""
         return self.config.get("monitored_paths", [])
     
     def add_recent_script(self, script_path: str):
-        """Add script to recent scripts list"""
+        """Add script to recent scripts list
+        
+        Deprecated: every run is now recorded in the run history, which is
+        where get_recent_scripts() reads from.
+        """
+        warnings.warn("add_recent_script() is deprecated; recents come from the run history",
+                      DeprecationWarning, stacklevel=2)
         recent = self.config.get("recent_scripts", [])
         
         # Remove if already exists
@@ -166,9 +557,25 @@ class ConfigManager:
         
         self.set("recent_scripts", recent)
     
-    def get_recent_scripts(self) -> List[str]:
-        """Get recent scripts list"""
-        return self.config.get("recent_scripts", [])
+    def get_recent_scripts(self, limit: int = 10) -> List[str]:
+        """Get recently run scripts, newest first, from the run history"""
+        from .history import RunHistory
+        
+        recent = []
+        if self.history_path.exists():
+            history = RunHistory(self.history_path)
+            try:
+                recent = history.recent_scripts(limit)
+            finally:
+                history.close()
+        
+        # Entries from the old config list fill any remaining slots
+        for script_path in self.config.get("recent_scripts", []):
+            if len(recent) >= limit:
+                break
+            if script_path not in recent:
+                recent.append(script_path)
+        return recent
     
     def toggle_dark_mode(self):
         """Toggle dark mode setting"""
@@ -180,5 +587,31 @@ class ConfigManager:
         """Check if dark mode is enabled"""
         return self.get("settings.dark_mode", False)
 
+class LazyConfigManager:
+    """Stand-in for the global ConfigManager that loads it on first use
+    
+    Importing this module stays free of file system work; the config files
+    are only read when a setting is first needed.
+    """
+    
+    def __init__(self):
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._instance is not None
+    
+    def load(self) -> ConfigManager:
+        """Return the real ConfigManager, creating it if needed"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = ConfigManager()
+        return self._instance
+    
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
 # Global config instance
-config = ConfigManager() 
\ No newline at end of file
+config = LazyConfigManager() 
\ No newline at end of file
@@ -0,0 +1,490 @@
+"""
+Background daemon for Python Commander
+Owns the script catalog, its file watchers and the execution engines in a
+long-lived process, so runs outlive the window and reopening it attaches to
+an already warm index. Clients talk to it over a Unix domain socket using
+the frames in protocol.py.
+"""
+
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .bytecode import BytecodeCompiler
+from .catalog import ScriptCatalog
+from .config import key_changed
+from .execution import (EVENT_FINISHED, EVENT_OUTPUT, EVENT_QUEUED, EVENT_STARTED, KILL_GRACE,
+                        ExecutionEngine)
+from .history import RunHistory
+from .protocol import read_frame, record_to_item, run_to_dict, sample_to_list, send_frame
+from .sampler import ResourceSampler
+from .scheduler import Scheduler
+
+# Engines clients can submit to; batches get their own so a sweep can't starve interactive runs
+ENGINES = ("runs", "batch")
+
+# Runs that finished while no window was attached, replayed to the next one that does
+MAX_UNSEEN_RUNS = 20
+
+TOPICS = ("runs", "catalog", "samples")
+
+
+class _Client:
+    """One connection; a writer thread drains its queue so a slow client never blocks the engines"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.topics = set()
+        self.closed = False
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name="DaemonWriter", daemon=True)
+        self._writer.start()
+
+    def send(self, message: Dict[str, Any]):
+        if not self.closed:
+            self._queue.put(message)
+
+    def _write_loop(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            try:
+                send_frame(self.sock, message)
+            except OSError:
+                break
+        self.closed = True
+        try:
+            # Wakes the reader thread if it is still waiting on a request
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        self.closed = True
+        self._queue.put(None)
+
+
+class Daemon:
+    """Serves the catalog and execution engines to GUI windows and the CLI
+
+    Every engine event is kept (output bounded per run) until the run has
+    been seen by an attached window, so a window opened mid-run, or after
+    runs finished unattended, replays them before live events continue.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.socket_path = str(config.daemon_socket_path)
+        self.lock_path = str(config.app_support_path / "daemon.lock")
+        self.started_at = time.time()
+        self.replay_bytes = int(config.get("settings.daemon_replay_kb", 512) * 1024)
+
+        self.catalog = ScriptCatalog(config)
+        self.history = RunHistory.from_config(config)
+        self.sampler = ResourceSampler.from_config(config)
+        self.engines: Dict[str, ExecutionEngine] = {}
+        self.scheduler: Optional[Scheduler] = None
+        self.compiler = BytecodeCompiler.from_config(config, self.catalog)
+
+        self._clients = []
+        self._lock = threading.RLock()
+        # Runs kept for replay by id: (engine name, run), with their recent output
+        self._runs: Dict[int, Tuple[str, Any]] = {}
+        self._output: Dict[int, deque] = {}
+        self._output_size: Dict[int, int] = {}
+        self._unseen: deque = deque()
+        # The client and request id being handled on this thread, see _on_run_event
+        self._local = threading.local()
+        self._stopped = threading.Event()
+        self._server: Optional[socket.socket] = None
+        self._lock_file = None
+
+        self._handlers: Dict[str, Callable] = {
+            "ping": self._op_ping,
+            "shutdown": self._op_shutdown,
+            "subscribe": self._op_subscribe,
+            "catalog.scripts": self._op_catalog_scripts,
+            "catalog.search": self._op_catalog_search,
+            "catalog.refresh": self._op_catalog_refresh,
+            "run.submit": self._op_run_submit,
+            "run.pipeline": self._op_run_pipeline,
+            "run.cancel": self._op_run_cancel,
+            "run.kill": self._op_run_kill,
+            "run.list": self._op_run_list,
+            "schedule.list": self._op_schedule_list,
+            "schedule.reload": self._op_schedule_reload,
+        }
+
+    def engine(self, name: str = "runs") -> ExecutionEngine:
+        """The named engine, created on first use"""
+        if name not in ENGINES:
+            raise ValueError(f"Unknown engine '{name}'")
+        with self._lock:
+            engine = self.engines.get(name)
+            if engine is not None:
+                return engine
+            if name == "runs":
+                engine = ExecutionEngine.from_config(self.config)
+            else:
+                engine = ExecutionEngine(
+                    max_concurrency=self.config.get("settings.batch_concurrency", 0) or os.cpu_count() or 1,
+                    result_cache=self.engine("runs").result_cache,
+                    default_limits=self.config.get("settings.run_limits", {}),
+                    bytecode_dir=self.engine("runs").bytecode_dir,
+                    environments=self.engine("runs").environments,
+                    agents=self.engine("runs").agents)
+            self.history.attach(engine)
+            self.sampler.attach(engine)
+            engine.add_listener(lambda run, event, data: self._on_run_event(name, run, event, data))
+            self.engines[name] = engine
+            return engine
+
+    # Lifecycle
+
+    def serve(self):
+        """Listen for clients until stop() or a termination signal"""
+        self._acquire_lock()
+        self._bind()
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(sig, lambda signum, frame: self.stop())
+
+        self.catalog.add_listener(self._on_catalog_changes)
+        if self.compiler is not None:
+            self.compiler.start()
+        if self.engine("runs").environments is not None:
+            # Environments are built as scripts are found, ahead of their first run
+            self.engine("runs").environments.watch(self.catalog)
+        threading.Thread(target=self._load_catalog, name="CatalogLoader", daemon=True).start()
+        self.sampler.add_listener(self._on_sample)
+        self.sampler.start()
+        self.scheduler = Scheduler.from_config(self.engine("runs"), self.config, self.catalog)
+        self.scheduler.start()
+        self.config.add_listener(self._on_config_changes)
+        self.config.start_watching()
+        threading.Thread(target=self._accept_loop, name="DaemonAccept", daemon=True).start()
+        print(f"Daemon {os.getpid()} listening on {self.socket_path}", flush=True)
+
+        while not self._stopped.wait(1):
+            pass
+        self._shutdown()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _acquire_lock(self):
+        """Hold daemon.lock for the daemon's lifetime; only one daemon per user"""
+        import fcntl
+        self._lock_file = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError("Another daemon is already running") from None
+        self._lock_file.truncate(0)
+        self._lock_file.write(str(os.getpid()))
+        self._lock_file.flush()
+
+    def _bind(self):
+        # Holding the lock means any socket file left behind is stale
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._server.listen(16)
+
+    def _load_catalog(self):
+        self.catalog.load()
+        if self.config.get("settings.auto_refresh", True):
+            self.catalog.start_monitoring()
+        print(f"Catalog loaded: {len(self.catalog.scripts())} scripts", flush=True)
+
+    def _shutdown(self):
+        """Stop serving, end every run and release the socket"""
+        print("Daemon shutting down", flush=True)
+        try:
+            self._server.close()
+        except OSError:
+            pass
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+        self.config.stop_watching()
+        self.config.remove_listener(self._on_config_changes)
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.catalog.remove_listener(self._on_catalog_changes)
+        self.catalog.stop()
+        if self.compiler is not None:
+            self.compiler.stop()
+        if self.engine("runs").environments is not None:
+            self.engine("runs").environments.stop()
+        runs = []
+        for engine in self.engines.values():
+            for run in engine.runs():
+                if not run.done.is_set():
+                    engine.cancel(run.id)
+                    runs.append((engine, run))
+            engine.shutdown()
+        # Scripts that ignore SIGTERM are killed after the usual grace period
+        deadline = time.time() + KILL_GRACE
+        for engine, run in runs:
+            if not run.done.wait(max(0.0, deadline - time.time())):
+                engine.kill_run(run.id, "Daemon shut down")
+                run.done.wait(1)
+        if self.engine("runs").agents is not None:
+            self.engine("runs").agents.stop()
+        self.sampler.stop()
+        self.history.close()
+
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+
+    # Connections
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            client = _Client(sock)
+            with self._lock:
+                self._clients.append(client)
+            threading.Thread(target=self._serve_client, args=(client,), name="DaemonClient",
+                             daemon=True).start()
+
+    def _serve_client(self, client: _Client):
+        """Handle one client's requests in order"""
+        stream = client.sock.makefile("rb")
+        try:
+            while True:
+                try:
+                    message = read_frame(stream)
+                except (OSError, ValueError):
+                    break
+                if message is None:
+                    break
+                self._handle(client, message)
+        finally:
+            with self._lock:
+                if client in self._clients:
+                    self._clients.remove(client)
+            client.close()
+            stream.close()
+
+    def _handle(self, client: _Client, message: Dict[str, Any]):
+        request_id = message.get("id")
+        handler = self._handlers.get(message.get("op"))
+        self._local.request = (client, request_id)
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown operation '{message.get('op')}'")
+            response = {"id": request_id, "result": handler(client, message)}
+        except Exception as e:
+            response = {"id": request_id, "error": str(e) or type(e).__name__}
+        finally:
+            self._local.request = None
+        client.send(response)
+
+    def _broadcast(self, topic: str, message: Dict[str, Any]):
+        with self._lock:
+            for client in self._clients:
+                if topic in client.topics:
+                    client.send(message)
+
+    # Events
+
+    def _on_run_event(self, name: str, run, event: str, data):
+        message = {"event": "run", "engine": name, "kind": event}
+        if event == EVENT_OUTPUT:
+            message["id"] = run.id
+            message["data"] = list(data)
+        else:
+            message["run"] = run_to_dict(run, name)
+            message["data"] = data
+        request = getattr(self._local, "request", None)
+        with self._lock:
+            self._track(name, run, event, data)
+            for client in self._clients:
+                if "runs" not in client.topics:
+                    continue
+                if event == EVENT_QUEUED and request is not None and request[0] is client:
+                    # Lets the submitting client raise this event on the submitting thread
+                    client.send(dict(message, request=request[1]))
+                else:
+                    client.send(message)
+
+    def _track(self, name: str, run, event: str, data):
+        """Keep events for replay; called with the lock held"""
+        if event == EVENT_QUEUED:
+            self._runs[run.id] = (name, run)
+            self._output[run.id] = deque()
+            self._output_size[run.id] = 0
+        elif event == EVENT_OUTPUT and run.id in self._output:
+            chunks = self._output[run.id]
+            chunks.append(data)
+            self._output_size[run.id] += len(data[1])
+            while self._output_size[run.id] > self.replay_bytes and len(chunks) > 1:
+                self._output_size[run.id] -= len(chunks.popleft()[1])
+        elif event == EVENT_FINISHED and run.id in self._runs:
+            if any("runs" in client.topics for client in self._clients):
+                self._forget(run.id)
+            else:
+                self._unseen.append(run.id)
+                while len(self._unseen) > MAX_UNSEEN_RUNS:
+                    self._forget(self._unseen.popleft())
+
+    def _forget(self, run_id: int):
+        self._runs.pop(run_id, None)
+        self._output.pop(run_id, None)
+        self._output_size.pop(run_id, None)
+
+    def _replay(self, client: _Client):
+        """Send a new subscriber the events of live and unseen runs; called with the lock held"""
+        for run_id, (name, run) in sorted(self._runs.items()):
+            state = run_to_dict(run, name)
+            base = {"event": "run", "engine": name}
+            client.send(dict(base, kind=EVENT_QUEUED, run=state, data=None))
+            if run.started_at is not None:
+                client.send(dict(base, kind=EVENT_STARTED, run=state, data=None))
+            for chunk in self._output.get(run_id, ()):
+                client.send(dict(base, kind=EVENT_OUTPUT, id=run_id, data=list(chunk)))
+            if run.done.is_set():
+                client.send(dict(base, kind=EVENT_FINISHED, run=state, data=run.returncode))
+        for run_id in self._unseen:
+            self._forget(run_id)
+        self._unseen.clear()
+
+    def _on_catalog_changes(self, changes):
+        records = []
+        for path in sorted(changes.added | changes.updated):
+            record = self.catalog.get(path)
+            if record is not None:
+                records.append(record_to_item(record))
+        self._broadcast("catalog", {
+            "event": "catalog",
+            "records": records,
+            "removed": sorted(changes.removed),
+            "added_dirs": sorted(changes.added_dirs),
+            "removed_dirs": sorted(changes.removed_dirs),
+            "loaded": self.catalog.loaded.is_set(),
+        })
+
+    def _on_config_changes(self, keys):
+        """Follow config changes saved by windows, the CLI and other processes"""
+        if key_changed(keys, "schedules"):
+            self.scheduler.set_schedules(self.config.get_schedules())
+        if key_changed(keys, "monitored_paths"):
+            threading.Thread(target=self.catalog.refresh_paths, name="CatalogRefresh",
+                             daemon=True).start()
+
+    def _on_sample(self, run, sample):
+        self._broadcast("samples", {"event": "sample", "id": run.id, "sample": sample_to_list(sample)})
+
+    # Operations
+
+    def _op_ping(self, client, message):
+        return {
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "loaded": self.catalog.loaded.is_set(),
+            "scripts": len(self.catalog.scripts()),
+            "active_runs": sum(1 for engine in self.engines.values()
+                               for run in engine.runs() if not run.done.is_set()),
+            "clients": len(self._clients),
+        }
+
+    def _op_shutdown(self, client, message):
+        self.stop()
+        return None
+
+    def _op_subscribe(self, client, message):
+        topics = set(message.get("topics") or TOPICS)
+        unknown = topics.difference(TOPICS)
+        if unknown:
+            raise ValueError(f"Unknown topic(s): {', '.join(sorted(unknown))}")
+        with self._lock:
+            if "runs" in topics and "runs" not in client.topics:
+                self._replay(client)
+            client.topics.update(topics)
+        return None
+
+    def _op_catalog_scripts(self, client, message):
+        if message.get("wait"):
+            self.catalog.loaded.wait()
+        return {"loaded": self.catalog.loaded.is_set(),
+                "scripts": [record_to_item(record) for record in self.catalog.scripts()]}
+
+    def _op_catalog_search(self, client, message):
+        return [[record.path, score] for record, score
+                in self.catalog.search(message["query"], message.get("limit", 50))]
+
+    def _op_catalog_refresh(self, client, message):
+        # The client changed the monitored paths in its copy of the config; picking
+        # the change up now, rather than on the next poll, refreshes the catalog
+        self.config.check_for_changes()
+        return None
+
+    def _op_run_submit(self, client, message):
+        run = self.engine(message.get("engine", "runs")).submit(
+            message["script"], message.get("arguments"), memoize=message.get("memoize", False),
+            cache_inputs=message.get("cache_inputs") or (), limits=message.get("limits"),
+            profile=message.get("profile"))
+        return run_to_dict(run, message.get("engine", "runs"))
+
+    def _op_run_pipeline(self, client, message):
+        name = message.get("engine", "runs")
+        runs = self.engine(name).submit_pipeline(
+            [(script, arguments) for script, arguments in message["stages"]],
+            limits=message.get("limits"))
+        return [run_to_dict(run, name) for run in runs]
+
+    def _op_run_cancel(self, client, message):
+        self.engine(message.get("engine", "runs")).cancel(message["run"])
+        return None
+
+    def _op_run_kill(self, client, message):
+        self.engine(message.get("engine", "runs")).kill_run(message["run"], message["reason"])
+        return None
+
+    def _op_run_list(self, client, message):
+        name = message.get("engine", "runs")
+        return [run_to_dict(run, name) for run in self.engine(name).runs()
+                if not run.done.is_set()]
+
+    def _op_schedule_list(self, client, message):
+        return [dict(self.scheduler.status(schedule.name), name=schedule.name,
+                     schedule=schedule.to_config(), next=when)
+                for schedule, when in self.scheduler.upcoming()]
+
+    def _op_schedule_reload(self, client, message):
+        # The client changed the schedules in its copy of the config; picking the
+        # change up now hands them to the scheduler, see _on_config_changes
+        self.config.check_for_changes()
+        return None
+
+
+def run_daemon(config) -> int:
+    """Run a daemon in this process until it is stopped"""
+    daemon = Daemon(config)
+    try:
+        daemon.serve()
+    except RuntimeError as e:
+        print(f"Error: {e}", flush=True)
+        return 1
+    return 0
@@ -0,0 +1,574 @@
+"""
+Client side of Python Commander's background daemon
+Connects to the daemon's socket and exposes its engines, catalog and
+sampler through the same interfaces as the in-process ones, so the GUI and
+CLI work the same whether or not they are attached to a daemon
+"""
+
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .execution import EVENT_FINISHED, EVENT_OUTPUT, FAILED, QUEUED
+from .protocol import read_frame, record_from_item, sample_from_list, send_frame
+from .scanner import ChangeSet
+
+# Seconds to wait for a newly started daemon to accept connections
+START_TIMEOUT = 10.0
+
+REQUEST_TIMEOUT = 30.0
+
+
+class DaemonError(RuntimeError):
+    """A request the daemon refused, or a lost connection"""
+
+
+class RemoteRun:
+    """A run owned by the daemon, with the same attributes as execution.Run"""
+
+    def __init__(self, run_id: int):
+        self.id = run_id
+        self.engine = "runs"
+        self.script_path = ""
+        self.arguments: Dict[str, Any] = {}
+        self.status = QUEUED
+        self.returncode: Optional[int] = None
+        self.pid: Optional[int] = None
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.ended_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.cached = False
+        self.rusage: Optional[Dict[str, float]] = None
+        self.limits: Dict[str, float] = {}
+        self.profile: Optional[Dict[str, str]] = None
+        self.host: Optional[str] = None
+        self.pipeline: Optional[List["RemoteRun"]] = None
+        self.done = threading.Event()
+
+    def update(self, state: Dict[str, Any], pipeline: Optional[List["RemoteRun"]]):
+        """Take on the state sent with a run event"""
+        self.engine = state["engine"]
+        self.script_path = state["script"]
+        self.arguments = state["arguments"]
+        self.status = state["status"]
+        self.returncode = state["returncode"]
+        self.pid = state["pid"]
+        self.queued_at = state["queued_at"]
+        self.started_at = state["started_at"]
+        self.ended_at = state["ended_at"]
+        self.error = state["error"]
+        self.cached = state["cached"]
+        self.rusage = state["rusage"]
+        self.limits = state["limits"] or {}
+        self.profile = state["profile"]
+        self.host = state.get("host")
+        self.pipeline = pipeline
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.ended_at or time.time()) - self.started_at
+
+    def __repr__(self):
+        return f"RemoteRun(id={self.id}, script={os.path.basename(self.script_path)!r}, status={self.status})"
+
+
+class DaemonClient:
+    """A connection to the daemon
+
+    Events for subscribed topics are handled on a reader thread. The
+    events of a run up to its submit() returning are held back and raised
+    on the submitting thread instead, the way ExecutionEngine does it.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = str(socket_path)
+        self.connected = False
+        self._closing = False
+        self._sock: Optional[socket.socket] = None
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Future] = {}
+        self._send_lock = threading.Lock()
+        self._lock = threading.RLock()
+        # Runs not yet finished, and the pipelines they belong to
+        self._runs: Dict[int, RemoteRun] = {}
+        self._pipelines: Dict[int, List[RemoteRun]] = {}
+        self._engines: Dict[str, "RemoteEngine"] = {}
+        # Run events held for in-flight submit requests, by request id
+        self._held: Dict[int, List[Dict[str, Any]]] = {}
+        self._held_runs: Dict[int, int] = {}
+        self._handlers: Dict[str, List[Callable]] = {"catalog": [], "sample": []}
+        self._disconnect_listeners: List[Callable[[], None]] = []
+
+    def connect(self, timeout: float = 1.0):
+        """Connect to the socket; raises OSError if no daemon is listening"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(self.socket_path)
+            sock.settimeout(None)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self.connected = True
+        threading.Thread(target=self._read_loop, name="DaemonReader", daemon=True).start()
+
+    def close(self):
+        """Disconnect; the daemon and its runs carry on"""
+        self._closing = True
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def request(self, op: str, timeout: Optional[float] = REQUEST_TIMEOUT, **params) -> Any:
+        """Send a request and wait for its result"""
+        _, future = self._send(op, params)
+        return self._result(future, timeout)
+
+    def subscribe(self, *topics: str):
+        """Start receiving events; subscribing to runs replays live and unseen runs first"""
+        self.request("subscribe", topics=list(topics))
+
+    def engine(self, name: str = "runs") -> "RemoteEngine":
+        with self._lock:
+            engine = self._engines.get(name)
+            if engine is None:
+                engine = self._engines[name] = RemoteEngine(self, name)
+            return engine
+
+    def get_run(self, run_id: int) -> Optional[RemoteRun]:
+        """Look up a run that has not finished yet"""
+        return self._runs.get(run_id)
+
+    def add_handler(self, kind: str, callback: Callable[[Dict[str, Any]], None]):
+        """Register a callback for "catalog" or "sample" events"""
+        self._handlers[kind].append(callback)
+
+    def remove_handler(self, kind: str, callback: Callable[[Dict[str, Any]], None]):
+        if callback in self._handlers[kind]:
+            self._handlers[kind].remove(callback)
+
+    def add_disconnect_listener(self, callback: Callable[[], None]):
+        self._disconnect_listeners.append(callback)
+
+    def _send(self, op: str, params: Dict[str, Any], hold: bool = False) -> Tuple[int, Future]:
+        future = Future()
+        with self._lock:
+            if not self.connected:
+                raise DaemonError("Not connected to the daemon")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            if hold:
+                self._held[request_id] = []
+        try:
+            with self._send_lock:
+                send_frame(self._sock, dict(params, id=request_id, op=op))
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._held.pop(request_id, None)
+            raise DaemonError(f"Lost connection to the daemon: {e}") from None
+        return request_id, future
+
+    def _result(self, future: Future, timeout: Optional[float]) -> Any:
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            raise DaemonError("The daemon did not answer in time") from None
+
+    def _submit(self, op: str, convert: Callable[[Any], Any], **params) -> Any:
+        """Send a request that queues runs, raising their early events on this thread
+
+        The result is converted, e.g. into RemoteRuns, before the held
+        events are raised, so a run that already finished is still found.
+        """
+        request_id, future = self._send(op, params, hold=True)
+        try:
+            return convert(self._result(future, REQUEST_TIMEOUT))
+        finally:
+            self._release(request_id)
+
+    def _release(self, request_id: int):
+        """Dispatch held events in order until none are left, then stop holding"""
+        while True:
+            with self._lock:
+                held = self._held.get(request_id)
+                if not held:
+                    self._held.pop(request_id, None)
+                    for run_id in [run_id for run_id, owner in self._held_runs.items()
+                                   if owner == request_id]:
+                        del self._held_runs[run_id]
+                    return
+                message = held.pop(0)
+            self._run_event(message)
+
+    def _read_loop(self):
+        stream = self._sock.makefile("rb")
+        try:
+            while True:
+                try:
+                    message = read_frame(stream)
+                except (OSError, ValueError):
+                    break
+                if message is None:
+                    break
+                if "event" in message:
+                    self._dispatch(message)
+                    continue
+                with self._lock:
+                    future = self._pending.pop(message.get("id"), None)
+                if future is None:
+                    continue
+                if "error" in message:
+                    future.set_exception(DaemonError(message["error"]))
+                else:
+                    future.set_result(message.get("result"))
+        finally:
+            stream.close()
+            self._disconnected()
+
+    def _dispatch(self, message: Dict[str, Any]):
+        kind = message["event"]
+        if kind == "run":
+            run_id = message["run"]["id"] if "run" in message else message["id"]
+            with self._lock:
+                owner = message.get("request")
+                if owner in self._held:
+                    self._held_runs[run_id] = owner
+                else:
+                    owner = self._held_runs.get(run_id)
+                if owner is not None:
+                    self._held[owner].append(message)
+                    return
+            self._run_event(message)
+            return
+
+        for callback in list(self._handlers.get(kind, ())):
+            try:
+                callback(message)
+            except Exception as e:
+                print(f"Error in daemon {kind} handler: {e}")
+
+    def _run_event(self, message: Dict[str, Any]):
+        with self._lock:
+            if "run" in message:
+                run = self._run_from(message["run"], update=True)
+            else:
+                run = self._runs.get(message["id"]) or self._new_run(message["id"])
+            engine = self._engines.get(message["engine"])
+        event = message["kind"]
+        data = tuple(message["data"]) if event == EVENT_OUTPUT else message.get("data")
+        if engine is not None:
+            engine._emit(run, event, data)
+        if event == EVENT_FINISHED:
+            run.done.set()
+            self._forget(run)
+
+    def _forget(self, run: RemoteRun):
+        """Drop a finished run, and its pipeline once every stage has finished"""
+        with self._lock:
+            self._runs.pop(run.id, None)
+            if run.pipeline and all(stage.done.is_set() for stage in run.pipeline):
+                self._pipelines.pop(run.pipeline[0].id, None)
+
+    def _new_run(self, run_id: int) -> RemoteRun:
+        run = self._runs[run_id] = RemoteRun(run_id)
+        return run
+
+    def _run_from(self, state: Dict[str, Any], update: bool = False) -> RemoteRun:
+        """The local run for a state dict; an existing run is only updated if asked to"""
+        with self._lock:
+            run = self._runs.get(state["id"])
+            if run is None:
+                run = self._new_run(state["id"])
+            elif not update:
+                return run
+            run.update(state, self._pipeline(state["pipeline"]))
+            return run
+
+    def _pipeline(self, ids: Optional[List[int]]) -> Optional[List[RemoteRun]]:
+        """One shared list per pipeline, as with engine runs"""
+        if not ids:
+            return None
+        stages = self._pipelines.get(ids[0])
+        if stages is None:
+            stages = self._pipelines[ids[0]] = [self._runs.get(run_id) or self._new_run(run_id)
+                                                for run_id in ids]
+        return stages
+
+    def _disconnected(self):
+        """Fail outstanding requests and runs once the daemon is gone"""
+        with self._lock:
+            self.connected = False
+            pending, self._pending = self._pending, {}
+            self._held.clear()
+            self._held_runs.clear()
+            unfinished = [run for run in self._runs.values() if not run.done.is_set()]
+            self._runs.clear()
+            self._pipelines.clear()
+        for future in pending.values():
+            future.set_exception(DaemonError("Lost connection to the daemon"))
+        if self._closing:
+            return
+        for run in unfinished:
+            run.status = FAILED
+            run.error = "Lost connection to the daemon"
+            run.ended_at = time.time()
+            engine = self._engines.get(run.engine)
+            if engine is not None:
+                engine._emit(run, EVENT_FINISHED, None)
+            run.done.set()
+        for callback in list(self._disconnect_listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in daemon disconnect listener: {e}")
+
+
+class RemoteEngine:
+    """An ExecutionEngine in the daemon
+
+    Listeners are called as listener(run, event, data) with RemoteRuns;
+    shutdown() only detaches, since the daemon's runs outlive any client.
+    Pipelines can't be given file descriptors for stdin or stdout.
+    """
+
+    def __init__(self, client: DaemonClient, name: str):
+        self.client = client
+        self.name = name
+        # The daemon's result cache and limits are not visible from here
+        self.result_cache = None
+        self.default_limits: Dict[str, float] = {}
+        self._listeners: List[Callable] = []
+
+    def add_listener(self, callback: Callable):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _emit(self, run: RemoteRun, event: str, data: Any = None):
+        for callback in list(self._listeners):
+            try:
+                callback(run, event, data)
+            except Exception as e:
+                print(f"Error in execution listener: {e}")
+
+    def submit(self, script_path: str, arguments: Optional[Dict[str, Any]] = None,
+               memoize: bool = False, cache_inputs=(), limits: Optional[Dict[str, Any]] = None,
+               profile: Optional[Dict[str, str]] = None) -> RemoteRun:
+        """Queue a run in the daemon, see ExecutionEngine.submit()"""
+        return self.client._submit("run.submit", self.client._run_from, engine=self.name,
+                                   script=os.path.abspath(script_path),
+                                   arguments=dict(arguments or {}), memoize=memoize,
+                                   cache_inputs=list(cache_inputs), limits=limits, profile=profile)
+
+    def submit_pipeline(self, stages, limits: Optional[Dict[str, Any]] = None,
+                        stdin: Optional[int] = None, stdout: Optional[int] = None) -> List[RemoteRun]:
+        """Queue a pipeline in the daemon, see ExecutionEngine.submit_pipeline()"""
+        if stdin is not None or stdout is not None:
+            raise ValueError("Pipelines run by the daemon can't use this process's files")
+        runs = self.client._submit("run.pipeline",
+                                   lambda states: [self.client._run_from(state) for state in states],
+                                   engine=self.name, limits=limits,
+                                   stages=[[os.path.abspath(script_path), dict(arguments or {})]
+                                           for script_path, arguments in stages])
+        return runs[0].pipeline or runs
+
+    def get_run(self, run_id: int) -> Optional[RemoteRun]:
+        return self.client.get_run(run_id)
+
+    def runs(self) -> List[RemoteRun]:
+        """The daemon's queued and running runs"""
+        return [self.client._run_from(state)
+                for state in self.client.request("run.list", engine=self.name)]
+
+    def cancel(self, run_id: int):
+        self.client.request("run.cancel", engine=self.name, run=run_id)
+
+    def kill_run(self, run_id: int, reason: str):
+        self.client.request("run.kill", engine=self.name, run=run_id, reason=reason)
+
+    def shutdown(self, wait: bool = False):
+        """Stop listening; the daemon keeps running queued and running runs"""
+        self._listeners.clear()
+
+
+class RemoteCatalog:
+    """The daemon's ScriptCatalog, mirrored locally from its change events
+
+    The daemon does the scanning and watching, so start_monitoring() has
+    nothing to do; searches are answered by the daemon's search index.
+    """
+
+    def __init__(self, client: DaemonClient, config):
+        self.client = client
+        self.config = config
+        self._scripts = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[ChangeSet], None]] = []
+        self.loaded = threading.Event()
+        client.add_handler("catalog", self._on_message)
+
+    def add_listener(self, callback: Callable[[ChangeSet], None]):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[ChangeSet], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, changes: ChangeSet):
+        for callback in list(self._listeners):
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"Error in catalog listener: {e}")
+
+    def roots(self) -> List[str]:
+        """Monitored paths, expanded"""
+        return [os.path.abspath(os.path.expanduser(path))
+                for path in self.config.get_monitored_paths()]
+
+    def load(self):
+        """Fetch every script from the daemon, waiting for it to finish loading"""
+        result = self.client.request("catalog.scripts", timeout=None, wait=True)
+        records = {}
+        for item in result["scripts"]:
+            record = record_from_item(item)
+            records[record.path] = record
+
+        changes = ChangeSet()
+        with self._lock:
+            changes.removed = set(self._scripts) - set(records)
+            changes.updated = set(self._scripts) & set(records)
+            changes.added = set(records) - set(self._scripts)
+            self._scripts = records
+        self.loaded.set()
+        self._notify(changes)
+
+    def refresh_paths(self):
+        """Have the daemon pick up monitored path changes saved to the config"""
+        self.config.flush()
+        self.client.request("catalog.refresh")
+
+    def start_monitoring(self):
+        pass
+
+    def stop(self):
+        self.client.remove_handler("catalog", self._on_message)
+
+    def _on_message(self, message: Dict[str, Any]):
+        changes = ChangeSet()
+        with self._lock:
+            for item in message["records"]:
+                record = record_from_item(item)
+                (changes.updated if record.path in self._scripts else changes.added).add(record.path)
+                self._scripts[record.path] = record
+            for path in message["removed"]:
+                if self._scripts.pop(path, None) is not None:
+                    changes.removed.add(path)
+            changes.added_dirs.update(message["added_dirs"])
+            changes.removed_dirs.update(message["removed_dirs"])
+        if changes:
+            self._notify(changes)
+
+    def get(self, path: str):
+        with self._lock:
+            return self._scripts.get(path)
+
+    def scripts(self) -> List:
+        with self._lock:
+            return list(self._scripts.values())
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[Any, float]]:
+        results = []
+        for path, score in self.client.request("catalog.search", query=query, limit=limit):
+            entry = self.get(path)
+            if entry is not None:
+                results.append((entry, score))
+        return results
+
+
+class RemoteSampler:
+    """Resource samples taken by the daemon, for ResourceSampler listeners"""
+
+    available = True
+
+    def __init__(self, client: DaemonClient):
+        self.client = client
+        self._listeners: List[Callable] = []
+        client.add_handler("sample", self._on_message)
+
+    def add_listener(self, callback: Callable):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def stop(self):
+        self.client.remove_handler("sample", self._on_message)
+
+    def _on_message(self, message: Dict[str, Any]):
+        run = self.client.get_run(message["id"])
+        if run is None:
+            return
+        sample = sample_from_list(message["sample"])
+        for listener in list(self._listeners):
+            try:
+                listener(run, sample)
+            except Exception as e:
+                print(f"Error in sampler listener: {e}")
+
+
+def start_daemon(config) -> bool:
+    """Start a detached daemon process; False if this install can't"""
+    if getattr(sys, 'frozen', False):
+        # A bundled app has no interpreter to run the daemon module with
+        return False
+    log_dir = config.app_support_path / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+    env["PYTHONUNBUFFERED"] = "1"
+    with open(log_dir / "daemon.log", "ab") as log:
+        subprocess.Popen([sys.executable, "-m", "python_commander", "daemon", "run"],
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                         cwd=str(config.app_support_path), env=env, close_fds=True,
+                         # Its own session, so it outlives this process and its terminal
+                         start_new_session=True)
+    return True
+
+
+def connect(config, start: bool = False) -> Optional[DaemonClient]:
+    """Connect to the user's daemon, starting one if asked; None if none is reachable"""
+    client = DaemonClient(config.daemon_socket_path)
+    try:
+        client.connect()
+        return client
+    except OSError:
+        if not start or not start_daemon(config):
+            return None
+
+    deadline = time.time() + START_TIMEOUT
+    while time.time() < deadline:
+        try:
+            client.connect()
+            return client
+        except OSError:
+            time.sleep(0.05)
+    print(f"Daemon did not start; see {config.app_support_path / 'logs' / 'daemon.log'}")
+    return None
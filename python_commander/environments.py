@@ -0,0 +1,474 @@
+"""
+Script environments for Python Commander
+Gives scripts that need packages this interpreter lacks a virtual
+environment built from a local wheel directory. Environments are keyed by a
+hash of the requirement set, so scripts with the same needs share one, and
+package files are hardlinked from a store of unpacked wheels rather than
+copied into every environment.
+"""
+
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from .parser import ScriptParser
+from .scanner import ChangeSet
+
+# Bump when the layout of built environments changes
+ENVIRONMENT_VERSION = 1
+
+# Written last into a built environment; its presence means the build finished
+MARKER = "commander-environment.json"
+
+_NAME = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+_SPECIFIER = re.compile(r"\s*(~=|===|==|!=|<=|>=|<|>)\s*([A-Za-z0-9.*+!_-]+)\s*")
+
+
+def canonical_name(name: str) -> str:
+    """Distribution name normalized as in PEP 503"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def requirement_name(requirement: str) -> Optional[str]:
+    match = _NAME.match(requirement)
+    return match.group(1) if match else None
+
+
+def _release(version: str) -> Optional[Tuple[int, ...]]:
+    """The numeric release part of a plain version, or None for anything fancier"""
+    parts = version.split(".")
+    if not all(part.isdigit() for part in parts):
+        return None
+    return tuple(int(part) for part in parts)
+
+
+def _matches(installed: str, operator: str, wanted: str) -> Optional[bool]:
+    """Compare versions for one specifier, or None if it needs a real resolver"""
+    if operator == "==" and wanted.endswith(".*"):
+        prefix = _release(wanted[:-2])
+        have = _release(installed)
+        return None if prefix is None or have is None else have[:len(prefix)] == prefix
+    have, want = _release(installed), _release(wanted)
+    if have is None or want is None:
+        return None
+    width = max(len(have), len(want))
+    have, want = have + (0,) * (width - len(have)), want + (0,) * (width - len(want))
+    if operator == "~=":
+        prefix = _release(wanted)[:-1]
+        return have >= want and have[:len(prefix)] == prefix
+    return {"==": have == want, "===": have == want, "!=": have != want, "<=": have <= want,
+            ">=": have >= want, "<": have < want, ">": have > want}[operator]
+
+
+def host_satisfies(requirement: str) -> bool:
+    """Whether this interpreter already has a distribution meeting a requirement
+
+    Only plain version specifiers are checked here; requirements with
+    extras, markers or URLs are left to pip.
+    """
+    match = _NAME.match(requirement)
+    if match is None:
+        return False
+    rest = requirement[match.end():]
+    if any(mark in rest for mark in "[;@"):
+        return False
+    try:
+        installed = importlib.metadata.version(match.group(1))
+    except importlib.metadata.PackageNotFoundError:
+        return False
+    specifiers = [item for item in rest.split(",") if item.strip()]
+    for item in specifiers:
+        spec = _SPECIFIER.fullmatch(item)
+        if spec is None or not _matches(installed, spec.group(1), spec.group(2)):
+            return False
+    return True
+
+
+class WheelIndex:
+    """Which wheels in a directory provide which top-level modules
+
+    Rescanned whenever the directory changes.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._modules: Dict[str, str] = {}
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def provider(self, module: str) -> Optional[str]:
+        """Name of a distribution whose wheel provides a top-level module"""
+        with self._lock:
+            self._refresh()
+            return self._modules.get(module)
+
+    def _refresh(self):
+        try:
+            mtime = self.directory.stat().st_mtime_ns
+        except OSError:
+            self._modules, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        modules = {}
+        for path in sorted(self.directory.glob("*.whl")):
+            distribution = path.name.split("-")[0]
+            try:
+                for module in self._top_level(path):
+                    modules.setdefault(module, distribution)
+            except (OSError, zipfile.BadZipFile) as e:
+                print(f"Skipping wheel {path.name}: {e}")
+        self._modules, self._mtime = modules, mtime
+
+    @staticmethod
+    def _top_level(path: Path) -> List[str]:
+        """Top-level modules in a wheel, from top_level.txt or else its file list"""
+        with zipfile.ZipFile(path) as wheel:
+            names = wheel.namelist()
+            for name in names:
+                if name.endswith(".dist-info/top_level.txt"):
+                    text = wheel.read(name).decode("utf-8", "replace")
+                    return [line.strip() for line in text.splitlines() if line.strip()]
+        modules = set()
+        for name in names:
+            first = name.split("/")[0]
+            if first.endswith((".dist-info", ".data")):
+                continue
+            if "/" in name:
+                modules.add(first)
+            elif first.endswith(".py"):
+                modules.add(first[:-3])
+            elif first.endswith((".so", ".pyd")):
+                modules.add(first.split(".")[0])
+        return sorted(modules)
+
+
+class Environment:
+    """A virtual environment for one requirement set
+
+    python is the environment's interpreter once built, or None when the
+    host interpreter turned out to satisfy every requirement already.
+    """
+
+    def __init__(self, key: str, requirements: List[str], path: Path):
+        self.key = key
+        self.requirements = requirements
+        self.path = path
+        self.python: Optional[str] = None
+        self.error: Optional[str] = None
+        self.ready = threading.Event()
+        self._callbacks: List[Callable[["Environment"], None]] = []
+        self._lock = threading.Lock()
+
+    def when_ready(self, callback: Callable[["Environment"], None]):
+        """Call callback(environment) once built, or at once if it already is"""
+        with self._lock:
+            if not self.ready.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, python: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            self.python = python
+            self.error = error
+            self.ready.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Error in environment callback: {e}")
+
+
+class EnvironmentManager:
+    """Finds what each script needs and builds shared environments for it
+
+    Requirements come from a script's `requires` list and from its imports
+    that this interpreter can't satisfy, mapped to wheels in the wheel
+    directory. pip resolves them against that directory only, each wheel is
+    unpacked once into a store, and environments (with access to this
+    interpreter's own packages) are assembled from hardlinks into it. Builds
+    run one at a time on a background thread.
+    """
+
+    def __init__(self, directory, wheel_dir, python: str = sys.executable,
+                 parser: Optional[ScriptParser] = None):
+        self.directory = Path(directory)
+        self.store = self.directory / "store"
+        self.wheel_dir = Path(wheel_dir)
+        self.python = python
+        self.parser = parser or ScriptParser()
+        self.wheels = WheelIndex(self.wheel_dir)
+
+        self._environments: Dict[str, Environment] = {}
+        self._available: Dict[str, bool] = {}
+        self._satisfied: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+        self._builds: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._catalog = None
+
+    @classmethod
+    def from_config(cls, config) -> Optional["EnvironmentManager"]:
+        """Create the manager from settings, or None if disabled or unsupported"""
+        if not config.get("settings.script_environments", True) or getattr(sys, "frozen", False):
+            return None
+        wheel_dir = config.get("settings.wheel_dir", "")
+        wheel_dir = os.path.expanduser(wheel_dir) if wheel_dir else config.app_support_path / "wheels"
+        # Reads the parser's cache but never writes it; the catalog owns that
+        return cls(config.app_support_path / "environments", wheel_dir,
+                   parser=ScriptParser(config.script_cache_path))
+
+    def requirements(self, record) -> List[str]:
+        """Requirement specifiers a script needs beyond this interpreter, or [] for none"""
+        declared = {canonical_name(requirement_name(spec) or spec) for spec in record.requires}
+        needed = [spec for spec in record.requires if not self._host_satisfies(spec)]
+        for module in record.imports:
+            if self._module_available(module, record.dir):
+                continue
+            distribution = self.wheels.provider(module)
+            if distribution is not None and canonical_name(distribution) not in declared:
+                declared.add(canonical_name(distribution))
+                needed.append(distribution)
+        if not needed:
+            return []
+        # Pins the host already meets still constrain what else gets installed
+        return sorted(set(needed) | set(record.requires))
+
+    def _host_satisfies(self, requirement: str) -> bool:
+        with self._lock:
+            satisfied = self._satisfied.get(requirement)
+        if satisfied is None:
+            satisfied = host_satisfies(requirement)
+            with self._lock:
+                self._satisfied[requirement] = satisfied
+        return satisfied
+
+    def _module_available(self, module: str, script_dir: str) -> bool:
+        """Whether a script can import a module without an environment"""
+        if module in sys.builtin_module_names:
+            return True
+        # Scripts import their neighbours, since the runner puts their directory on sys.path
+        base = os.path.join(script_dir, module)
+        if os.path.exists(base + ".py") or os.path.isdir(base):
+            return True
+        with self._lock:
+            available = self._available.get(module)
+        if available is None:
+            try:
+                available = importlib.util.find_spec(module) is not None
+            except (ImportError, ValueError):
+                available = False
+            with self._lock:
+                self._available[module] = available
+        return available
+
+    def key(self, requirements: List[str]) -> str:
+        identity = [ENVIRONMENT_VERSION, os.path.realpath(self.python), sorted(requirements)]
+        return hashlib.blake2b(json.dumps(identity).encode("utf-8"), digest_size=12).hexdigest()
+
+    def resolve(self, script_path: str, record=None) -> Optional[Environment]:
+        """The environment a script runs in, queued for building if needed; None for none
+
+        Raises OSError if the script can't be read.
+        """
+        if record is None:
+            record = self.parser.parse(script_path)
+        requirements = self.requirements(record)
+        if not requirements:
+            return None
+
+        key = self.key(requirements)
+        with self._lock:
+            environment = self._environments.get(key)
+            # A failed build is tried again, e.g. once the missing wheel is added
+            if environment is not None and not environment.error:
+                return environment
+            environment = Environment(key, requirements, self.directory / key)
+            self._environments[key] = environment
+        if not self._load(environment):
+            self._builds.put(environment)
+            self._start()
+        return environment
+
+    def _load(self, environment: Environment) -> bool:
+        """Pick up an environment built earlier"""
+        try:
+            with open(environment.path / MARKER) as f:
+                built = json.load(f)
+        except (OSError, ValueError):
+            return False
+        python = built.get("python")
+        if python is not None and not os.path.exists(python):
+            return False
+        environment._finish(python)
+        return True
+
+    def watch(self, catalog):
+        """Build environments as the catalog discovers scripts, ahead of their first run"""
+        self._catalog = catalog
+        catalog.add_listener(self._on_changes)
+
+    def stop(self):
+        if self._catalog is not None:
+            self._catalog.remove_listener(self._on_changes)
+            self._catalog = None
+        if self._thread is not None:
+            self._builds.put(None)
+            self._thread = None
+
+    def _on_changes(self, changes: ChangeSet):
+        for path in changes.added | changes.updated:
+            record = self._catalog.get(path)
+            if record is not None and (record.requires or record.imports):
+                try:
+                    self.resolve(path, record)
+                except OSError:
+                    pass
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._build_loop, name="EnvironmentBuilder",
+                                            daemon=True)
+        self._thread.start()
+
+    def _build_loop(self):
+        while True:
+            environment = self._builds.get()
+            if environment is None:
+                return
+            print(f"Building environment {environment.key}: {', '.join(environment.requirements)}")
+            try:
+                python = self._build(environment)
+            except (OSError, RuntimeError, subprocess.SubprocessError, zipfile.BadZipFile) as e:
+                print(f"Could not build environment {environment.key}: {e}")
+                environment._finish(error=str(e))
+            else:
+                environment._finish(python)
+
+    # Building
+
+    def _build(self, environment: Environment) -> Optional[str]:
+        """Resolve, unpack and link an environment; returns its interpreter"""
+        wheels = self._resolve_wheels(environment.requirements)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(prefix=f".{environment.key}-", dir=str(self.directory)))
+        try:
+            python = None
+            if wheels:
+                subprocess.run([self.python, "-m", "venv", "--without-pip", "--system-site-packages",
+                                str(tmp_path)], check=True, capture_output=True, timeout=120)
+                site_packages = self._site_packages(tmp_path)
+                for wheel in wheels:
+                    self._link(self._unpack(wheel), site_packages)
+                python = str(environment.path / self._interpreter(tmp_path).relative_to(tmp_path))
+            with open(tmp_path / MARKER, "w") as f:
+                json.dump({"requirements": environment.requirements, "python": python,
+                           "wheels": [wheel.name for wheel in wheels]}, f)
+            if environment.path.exists():
+                # Left over from an interrupted build
+                shutil.rmtree(environment.path)
+            os.replace(tmp_path, environment.path)
+        finally:
+            if tmp_path.exists():
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        return python
+
+    def _resolve_wheels(self, requirements: List[str]) -> List[Path]:
+        """Ask pip which wheels from the wheel directory satisfy the requirements"""
+        fd, report_path = tempfile.mkstemp(prefix="pip-report-", suffix=".json")
+        os.close(fd)
+        try:
+            result = subprocess.run(
+                [self.python, "-m", "pip", "install", "--dry-run", "--quiet",
+                 "--disable-pip-version-check", "--no-index", "--only-binary", ":all:",
+                 "--find-links", str(self.wheel_dir), "--report", report_path, *requirements],
+                capture_output=True, text=True, timeout=300)
+            if result.returncode != 0:
+                lines = [line for line in result.stderr.splitlines() if line.strip()]
+                raise RuntimeError(lines[-1] if lines else f"pip exited with {result.returncode}")
+            with open(report_path) as f:
+                report = json.load(f)
+        finally:
+            os.remove(report_path)
+
+        wheels = []
+        for item in report.get("install", []):
+            url = item.get("download_info", {}).get("url", "")
+            if not url.startswith("file://"):
+                raise RuntimeError(f"Unexpected package source {url}")
+            wheels.append(Path(unquote(urlparse(url).path)))
+        return wheels
+
+    def _unpack(self, wheel: Path) -> Path:
+        """Unpack a wheel into the store once, returning its directory"""
+        target = self.store / wheel.name[:-len(".whl")]
+        if target.is_dir():
+            return target
+        self.store.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(prefix=".unpack-", dir=str(self.store)))
+        try:
+            with zipfile.ZipFile(wheel) as archive:
+                for name in archive.namelist():
+                    destination = (tmp_path / name).resolve()
+                    if not str(destination).startswith(str(tmp_path.resolve()) + os.sep):
+                        raise RuntimeError(f"Unsafe path {name} in {wheel.name}")
+                archive.extractall(tmp_path)
+            os.replace(tmp_path, target)
+        finally:
+            if tmp_path.exists():
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        return target
+
+    @staticmethod
+    def _link(source: Path, site_packages: Path):
+        """Hardlink an unpacked wheel's importable files into site-packages"""
+        for directory, _, files in os.walk(source):
+            relative = Path(directory).relative_to(source)
+            parts = relative.parts
+            if parts and parts[0].endswith(".data"):
+                # Only the library parts of a wheel's .data directory are importable
+                if len(parts) < 2 or parts[1] not in ("purelib", "platlib"):
+                    continue
+                relative = Path(*parts[2:])
+            target_dir = site_packages / relative
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for name in files:
+                target = target_dir / name
+                try:
+                    os.link(os.path.join(directory, name), target)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    # Another filesystem, or links unsupported
+                    shutil.copy2(os.path.join(directory, name), target)
+
+    @staticmethod
+    def _site_packages(path: Path) -> Path:
+        matches = sorted(path.glob("lib/python*/site-packages")) or sorted(path.glob("Lib/site-packages"))
+        if not matches:
+            raise RuntimeError(f"No site-packages in {path}")
+        return matches[0]
+
+    @staticmethod
+    def _interpreter(path: Path) -> Path:
+        for candidate in (path / "bin" / "python", path / "Scripts" / "python.exe"):
+            if os.path.lexists(candidate):
+                return candidate
+        raise RuntimeError(f"No interpreter in {path}")
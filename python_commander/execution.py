@@ -0,0 +1,847 @@
+"""
+Script execution for Python Commander
+Runs scripts' main(args) in child processes with bounded concurrency and
+streams their output as it is produced
+"""
+
+import codecs
+import itertools
+import json
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runner.py")
+
+# Run states
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+# Listener event kinds
+EVENT_QUEUED = "queued"
+EVENT_STARTED = "started"
+EVENT_OUTPUT = "output"
+EVENT_FINISHED = "finished"
+
+READ_SIZE = 65536
+
+# Resource limits understood by the engine and runner
+LIMIT_KEYS = ("memory_mb", "cpu_seconds", "timeout")
+
+# Seconds between SIGTERM and SIGKILL for a run that overran its timeout
+KILL_GRACE = 5.0
+
+_SIGKILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+# Kernel buffer requested for pipes between pipeline stages (Linux only)
+PIPE_SIZE = 1024 * 1024
+_F_SETPIPE_SZ = 1031
+
+# ru_maxrss is bytes on macOS, kilobytes elsewhere
+_MAXRSS_SCALE = 1 if sys.platform == "darwin" else 1024
+
+_TRUE_STRINGS = {"1", "true", "yes", "on", "y"}
+_FALSE_STRINGS = {"0", "false", "no", "off", "n", ""}
+
+
+def _convert(value: Any, type_name: str, name: str) -> Any:
+    """Convert a value to an argument's declared type"""
+    if type_name in (None, "", "str"):
+        return value if isinstance(value, str) else str(value)
+    if type_name == "int":
+        return int(value)
+    if type_name == "float":
+        return float(value)
+    if type_name == "bool":
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE_STRINGS:
+            return True
+        if text in _FALSE_STRINGS:
+            return False
+        raise ValueError(f"Invalid boolean for '{name}': {value!r}")
+    if type_name == "list":
+        if isinstance(value, (list, tuple)):
+            return list(value)
+        return [item.strip() for item in str(value).split(",") if item.strip()]
+    # Unknown types are passed through untouched
+    return value
+
+
+def build_arguments(schema: List[Dict[str, Any]], values: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build the args passed to main() from a script's arguments schema"""
+    values = dict(values or {})
+    arguments = {}
+
+    for spec in schema:
+        name = spec["name"]
+        if name in values:
+            value = values.pop(name)
+        elif "default" in spec:
+            value = spec["default"]
+        else:
+            raise ValueError(f"Missing value for argument '{name}'")
+
+        try:
+            arguments[name] = None if value is None else _convert(value, spec.get("type"), name)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid value for argument '{name}': {e}") from None
+
+    if values:
+        raise ValueError(f"Unknown argument(s): {', '.join(sorted(values))}")
+
+    return arguments
+
+
+def normalize_limits(*sources: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Merge limit dicts, later ones winning; None is skipped and zero lifts a limit"""
+    limits: Dict[str, float] = {}
+    for source in sources:
+        for key, value in (source or {}).items():
+            if key not in LIMIT_KEYS or value is None or isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)) and value > 0:
+                limits[key] = value
+            elif not value:
+                limits.pop(key, None)
+    return limits
+
+
+def _enlarge_pipe(fd: int):
+    """Ask for a bigger pipe buffer so stages block on each other less often"""
+    try:
+        import fcntl
+        fcntl.fcntl(fd, _F_SETPIPE_SZ, PIPE_SIZE)
+    except (ImportError, OSError):
+        pass
+
+
+class Run:
+    """A single execution of a script"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, script_path: str, arguments: Dict[str, Any]):
+        self.id = next(self._ids)
+        self.script_path = script_path
+        self.arguments = arguments
+        self.status = QUEUED
+        self.returncode: Optional[int] = None
+        self.pid: Optional[int] = None
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.ended_at: Optional[float] = None
+        self.error: Optional[str] = None
+        # Set when the run's result was replayed from the result cache
+        self.cached = False
+        # utime/stime in seconds and maxrss in bytes, once the run has been reaped
+        self.rusage: Optional[Dict[str, float]] = None
+        self.limits: Dict[str, float] = {}
+        # Output paths when the run is profiled, see runner.call_main
+        self.profile: Optional[Dict[str, str]] = None
+        # Wall clock deadline while a timeout applies; a second one follows SIGTERM
+        self._deadline: Optional[float] = None
+        self._terminated = False
+        # Every stage's run, in order, when this run is a pipeline stage
+        self.pipeline: Optional[List["Run"]] = None
+        # File descriptors for stdin/stdout instead of /dev/null and a captured pipe
+        self._stdin: Optional[int] = None
+        self._stdout: Optional[int] = None
+        # Environment with the packages the script needs, see environments.py
+        self._environment = None
+        # Address of the agent running it, for runs placed on another machine
+        self.host: Optional[str] = None
+        self._agent = None
+
+        self._process: Optional[subprocess.Popen] = None
+        self._open_streams = 0
+        self._decoders: Dict[str, Any] = {}
+        # Result cache key and captured output, for runs that may be memoized
+        self._cache_key: Optional[str] = None
+        self._captured: Optional[List[Tuple[str, str]]] = None
+        self._captured_size = 0
+        self.done = threading.Event()
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.ended_at or time.time()) - self.started_at
+
+    def __repr__(self):
+        return f"Run(id={self.id}, script={os.path.basename(self.script_path)!r}, status={self.status})"
+
+
+class ExecutionEngine:
+    """Launches script runs in child processes with a concurrency limit
+
+    Output is read from non-blocking pipes by a single I/O thread and handed
+    to listeners chunk by chunk; only runs that may be memoized keep a copy.
+    Listeners are called from the I/O thread as listener(run, event, data),
+    except for cached results, which are replayed on the submitting thread.
+    """
+
+    def __init__(self, max_concurrency: int = 4, python: str = sys.executable, worker_pool=None,
+                 result_cache=None, default_limits: Optional[Dict[str, Any]] = None,
+                 bytecode_dir: Optional[str] = None, environments=None, agents=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.python = python
+        # Optional WorkerPool; runs fall back to a fresh interpreter when no worker is idle
+        self.worker_pool = worker_pool
+        # Optional ResultCache for scripts that opt in to memoization
+        self.result_cache = result_cache
+        # Limits applied to every run, overridable per run
+        self.default_limits = normalize_limits(default_limits)
+        # Optional BytecodeCache directory runs load precompiled scripts from
+        self.bytecode_dir = bytecode_dir
+        # Optional EnvironmentManager for scripts needing packages this interpreter lacks
+        self.environments = environments
+        # Optional AgentPool; eligible runs go to the agent with the most headroom
+        self.agents = agents
+
+        self._queue: deque = deque()
+        # Queued and running runs; finished ones are dropped, as engines can live for weeks
+        self._runs: Dict[int, Run] = {}
+        self._running: Dict[int, Run] = {}
+        self._reaping: List[Run] = []
+        self._listeners: List[Callable[[Run, str, Any], None]] = []
+        self._lock = threading.RLock()
+
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._pending_registrations: List[Run] = []
+        self._stores: List[threading.Thread] = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._io_loop, name="ExecutionEngine", daemon=True)
+        self._thread.start()
+        if agents is not None:
+            agents.add_listener(self._start_queued)
+
+    @classmethod
+    def from_config(cls, config) -> "ExecutionEngine":
+        """Create an engine using the execution settings in the config"""
+        from .bytecode import BytecodeCache
+        from .environments import EnvironmentManager
+        from .remote import AgentPool
+        from .result_cache import ResultCache
+        from .worker_pool import WorkerPool
+        worker_pool = WorkerPool.from_config(config)
+        if worker_pool is not None:
+            worker_pool.start()
+        agents = AgentPool.from_config(config)
+        if agents is not None:
+            agents.start()
+        bytecode = BytecodeCache.from_config(config)
+        return cls(max_concurrency=config.get("settings.max_concurrent_runs", 4),
+                   worker_pool=worker_pool,
+                   result_cache=ResultCache.from_config(config),
+                   default_limits=config.get("settings.run_limits", {}),
+                   bytecode_dir=str(bytecode.directory) if bytecode is not None else None,
+                   environments=EnvironmentManager.from_config(config),
+                   agents=agents)
+
+    def add_listener(self, callback: Callable[[Run, str, Any], None]):
+        """Register a callback for run events"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Run, str, Any], None]):
+        """Unregister a run event callback"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _emit(self, run: Run, event: str, data: Any = None):
+        for callback in list(self._listeners):
+            try:
+                callback(run, event, data)
+            except Exception as e:
+                print(f"Error in execution listener: {e}")
+
+    def submit(self, script_path: str, arguments: Optional[Dict[str, Any]] = None,
+               memoize: bool = False, cache_inputs: Iterable[str] = (),
+               limits: Optional[Dict[str, Any]] = None,
+               profile: Optional[Dict[str, str]] = None) -> Run:
+        """Queue a script run; it starts as soon as a slot is free
+
+        With memoize, a cached result for the same script content, arguments
+        and input files is replayed instead of running the script again.
+        limits (memory_mb, cpu_seconds, timeout) override the engine defaults.
+        A profile dict runs main() under the profiler; profiled runs are
+        never memoized.
+        """
+        run = Run(os.path.abspath(script_path), dict(arguments or {}))
+        run.limits = normalize_limits(self.default_limits, limits)
+        run.profile = profile
+        if memoize and not profile and self.result_cache is not None:
+            try:
+                run._cache_key = self.result_cache.key(run.script_path, run.arguments, cache_inputs)
+            except OSError as e:
+                print(f"Not caching run of {run.script_path}: {e}")
+            else:
+                cached = self.result_cache.get(run._cache_key)
+                if cached is not None:
+                    return self._replay(run, *cached)
+                run._captured = []
+
+        waiting = self._resolve_environments([run])
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Execution engine is shut down")
+            self._runs[run.id] = run
+            if not waiting:
+                self._queue.append(run)
+        self._emit(run, EVENT_QUEUED)
+        if waiting:
+            self._await_environments([run], waiting)
+        else:
+            self._start_queued()
+        return run
+
+    def submit_pipeline(self, stages: List[Tuple[str, Optional[Dict[str, Any]]]],
+                        limits: Optional[Dict[str, Any]] = None, stdin: Optional[int] = None,
+                        stdout: Optional[int] = None) -> List[Run]:
+        """Queue scripts whose stdout feeds the next one's stdin
+
+        Stages are started together, as soon as one slot is free, and are
+        connected by OS pipes, so data flows between them without passing
+        through this process and a slow stage holds back the ones before it.
+        Only the last stage's stdout (unless redirected to the stdout file
+        descriptor) and every stage's stderr are captured. stdin optionally
+        feeds the first stage from a file descriptor.
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        runs = [Run(os.path.abspath(script_path), dict(arguments or {}))
+                for script_path, arguments in stages]
+        for run in runs:
+            run.limits = normalize_limits(self.default_limits, limits)
+            run.pipeline = runs
+        runs[0]._stdin = stdin
+        runs[-1]._stdout = stdout
+
+        waiting = self._resolve_environments(runs)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Execution engine is shut down")
+            for run in runs:
+                self._runs[run.id] = run
+                if not waiting:
+                    self._queue.append(run)
+        for run in runs:
+            self._emit(run, EVENT_QUEUED)
+        if waiting:
+            self._await_environments(runs, waiting)
+        else:
+            self._start_queued()
+        return runs
+
+    def _resolve_environments(self, runs: List[Run]) -> list:
+        """Attach each run's environment; returns those still being built"""
+        if self.environments is None:
+            return []
+        waiting = []
+        for run in runs:
+            try:
+                run._environment = self.environments.resolve(run.script_path)
+            except OSError:
+                # An unreadable script fails at launch, with its own error
+                continue
+            if run._environment is not None and not run._environment.ready.is_set():
+                waiting.append(run._environment)
+        return waiting
+
+    def _await_environments(self, runs: List[Run], waiting: list):
+        """Queue runs (a pipeline's together) once their environments are built"""
+        pending = set(waiting)
+
+        def ready(environment):
+            with self._lock:
+                pending.discard(environment)
+                if pending:
+                    return
+                live = [run for run in runs if run.status == QUEUED]
+                errors = [run._environment.error for run in runs
+                          if run._environment is not None and run._environment.error]
+                if not errors and not self._closed:
+                    self._queue.extend(live)
+            if errors or self._closed:
+                for run in live:
+                    run.error = f"Could not build environment: {errors[0]}" if errors \
+                        else "Execution engine is shut down"
+                    self._finish(run, None)
+            else:
+                self._start_queued()
+
+        for environment in pending.copy():
+            environment.when_ready(ready)
+
+    def _replay(self, run: Run, returncode: int, output: List[Tuple[str, str]]) -> Run:
+        """Complete a run from a cached result, on the caller's thread"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Execution engine is shut down")
+            self._runs[run.id] = run
+        run.cached = True
+        self._emit(run, EVENT_QUEUED)
+        run.status = RUNNING
+        run.started_at = time.time()
+        self._emit(run, EVENT_STARTED)
+        for stream, text in output:
+            self._emit(run, EVENT_OUTPUT, (stream, text))
+        run.returncode = returncode
+        run.status = FINISHED
+        run.ended_at = time.time()
+        with self._lock:
+            self._runs.pop(run.id, None)
+        self._emit(run, EVENT_FINISHED, returncode)
+        run.done.set()
+        return run
+
+    def get_run(self, run_id: int) -> Optional[Run]:
+        """Look up a queued or running run by id"""
+        return self._runs.get(run_id)
+
+    def runs(self) -> List[Run]:
+        """Runs that are queued or running"""
+        with self._lock:
+            return list(self._runs.values())
+
+    def cancel(self, run_id: int):
+        """Cancel a queued run, or terminate a running one"""
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            if run.status == QUEUED:
+                # Pipeline stages only start together, so they are cancelled together
+                cancelled = [stage for stage in (run.pipeline or [run]) if stage.status == QUEUED]
+                for stage in cancelled:
+                    if stage in self._queue:
+                        # Otherwise still waiting for its environment
+                        self._queue.remove(stage)
+                    stage.status = CANCELLED
+                    stage.ended_at = time.time()
+                    self._runs.pop(stage.id, None)
+            else:
+                cancelled = []
+                if run.status == RUNNING:
+                    run.status = CANCELLED
+                    # A run still being launched is terminated by _start_queued
+                    if run._process is not None:
+                        self._signal(run, signal.SIGTERM)
+
+        for stage in cancelled:
+            self._emit(stage, EVENT_FINISHED, None)
+            stage.done.set()
+
+    def kill_run(self, run_id: int, reason: str):
+        """Kill a run's whole process group, e.g. for exceeding a limit
+
+        Also works on a cancelled run whose process ignored SIGTERM.
+        """
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run.done.is_set() or run._process is None:
+                return
+            run.error = reason
+            self._signal(run, _SIGKILL)
+
+    def process_group(self, run: Run) -> Optional[int]:
+        """Process group id of a running run; each run leads its own group"""
+        process = run._process
+        return process.pid if process is not None else None
+
+    def _signal(self, run: Run, sig):
+        """Signal a run's process group, falling back to the process itself"""
+        process = run._process
+        if isinstance(process, subprocess.Popen) and hasattr(os, "killpg"):
+            try:
+                os.killpg(process.pid, sig)
+                return
+            except OSError:
+                pass
+        try:
+            process.send_signal(sig)
+        except OSError:
+            pass
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting runs; cancel queued runs and optionally wait for running ones"""
+        with self._lock:
+            self._closed = True
+            # Including runs waiting for an environment
+            queued = [run for run in self._runs.values() if run.status == QUEUED]
+        for run in queued:
+            self.cancel(run.id)
+        if self.worker_pool is not None:
+            self.worker_pool.shutdown()
+        if self.agents is not None:
+            self.agents.remove_listener(self._start_queued)
+
+        if wait:
+            for run in list(self._running.values()):
+                run.done.wait()
+            for thread in list(self._stores):
+                thread.join()
+
+    def _start_queued(self):
+        """Start queued runs while slots are free, here or on an agent"""
+        while True:
+            with self._lock:
+                if not self._queue:
+                    return
+                run = self._queue[0]
+                agent = self.agents.place(run.id) \
+                    if self.agents is not None and self._remote_eligible(run) else None
+                if agent is None:
+                    # Runs on agents don't take local slots
+                    local = sum(1 for running in self._running.values() if running.host is None)
+                    if local >= self.max_concurrency:
+                        return
+                else:
+                    run._agent = agent
+                    run.host = agent.address
+                self._queue.popleft()
+                # A pipeline takes one slot, however many stages it has
+                group = run.pipeline or [run]
+                for stage in group:
+                    if stage is not run:
+                        self._queue.remove(stage)
+                    stage.status = RUNNING
+                    self._running[stage.id] = stage
+
+            if run.pipeline is not None:
+                self._launch_pipeline(group)
+                continue
+            try:
+                self._launch(run)
+            except Exception as e:
+                run.error = str(e)
+                self._finish(run, None)
+                continue
+            self._started(run)
+
+    @staticmethod
+    def _remote_eligible(run: Run) -> bool:
+        """Whether a run can go to an agent: it needs no local file descriptors or paths"""
+        return run.pipeline is None and run._stdin is None and run._stdout is None and not run.profile
+
+    def _started(self, run: Run):
+        """Announce a launched run and arm its timeout"""
+        self._emit(run, EVENT_STARTED)
+        with self._lock:
+            if run.status == CANCELLED and run._process is not None:
+                # Cancelled while it was being launched
+                self._signal(run, signal.SIGTERM)
+            elif run.limits.get("timeout"):
+                run._deadline = run.started_at + run.limits["timeout"]
+                self._wake()
+
+    def _launch_pipeline(self, stages: List[Run]):
+        """Spawn every stage, each reading the previous stage's stdout"""
+        launched = []
+        error = None
+        read_end = stages[0]._stdin
+        for index, run in enumerate(stages):
+            write_end = next_read = None
+            try:
+                if index < len(stages) - 1:
+                    next_read, write_end = os.pipe()
+                    _enlarge_pipe(write_end)
+                    run._stdout = write_end
+                run._stdin = read_end
+                self._spawn(run)
+                launched.append(run)
+            except Exception as e:
+                error = e
+            finally:
+                # The children hold their own copies; ours would keep the pipes open
+                if index > 0 and read_end is not None:
+                    os.close(read_end)
+                if write_end is not None:
+                    os.close(write_end)
+            read_end = next_read
+            if error is not None:
+                if read_end is not None:
+                    os.close(read_end)
+                break
+
+        for run in launched:
+            self._started(run)
+        if error is not None:
+            # Stop the stages that did start; they finish through the I/O thread
+            with self._lock:
+                for run in stages:
+                    run.error = f"Pipeline could not start: {error}"
+                for run in launched:
+                    self._signal(run, _SIGKILL)
+            for run in stages[len(launched):]:
+                self._finish(run, None)
+
+    def _command(self, run: Run) -> List[str]:
+        """Build the child process command line"""
+        python = run._environment.python if run._environment is not None else None
+        command = [python or self.python, RUNNER_PATH, run.script_path, json.dumps(run.arguments)]
+        options = {}
+        if run.limits:
+            options["limits"] = run.limits
+        if run.pipeline is not None and run._stdout is not None:
+            # Feeding another process: block-buffer and exit quietly if it goes away
+            options["pipe_stdout"] = True
+        if run.profile:
+            options["profile"] = run.profile
+        if self.bytecode_dir:
+            options["bytecode_dir"] = self.bytecode_dir
+        if options:
+            command.append(json.dumps(options))
+        return command
+
+    def _launch(self, run: Run):
+        """Start a run on its agent, else in a warm worker if one is idle, else in a new process"""
+        if run._agent is not None:
+            # The engine enforces the timeout itself, on every run
+            limits = {key: value for key, value in run.limits.items() if key != "timeout"}
+            try:
+                run._process = run._agent.start(run.id, run.script_path, run.arguments, limits)
+            except OSError as e:
+                print(f"Agent {run.host} unavailable, running locally: {e}")
+                run._agent = None
+                run.host = None
+            else:
+                run._process.on_exit = self._wake
+                run.started_at = time.time()
+                self._register(run)
+                return
+
+        worker = None
+        # Warm workers run this interpreter, so not scripts needing another environment
+        if (self.worker_pool is not None and run._stdin is None and run._stdout is None
+                and (run._environment is None or run._environment.python is None)):
+            worker = self.worker_pool.acquire()
+        if worker is not None:
+            try:
+                run._process = worker.start(run.script_path, run.arguments,
+                                            os.path.dirname(run.script_path), run.limits or None,
+                                            run.profile, self.bytecode_dir)
+            except OSError as e:
+                print(f"Worker unavailable, starting a new process: {e}")
+                worker.close()
+            else:
+                run._process.on_exit = self._wake
+                run.started_at = time.time()
+                self._register(run)
+                return
+
+        self._spawn(run)
+
+    def _spawn(self, run: Run):
+        """Spawn a fresh child process for a run"""
+        env = dict(os.environ)
+        env.setdefault("PYTHONIOENCODING", "utf-8")
+        # The runner line-buffers output itself
+        env.pop("PYTHONUNBUFFERED", None)
+
+        run._process = subprocess.Popen(
+            self._command(run),
+            stdin=subprocess.DEVNULL if run._stdin is None else run._stdin,
+            stdout=subprocess.PIPE if run._stdout is None else run._stdout,
+            stderr=subprocess.PIPE,
+            cwd=os.path.dirname(run.script_path),
+            env=env,
+            close_fds=True,
+            # Own session and process group, so signals reach the script's children too
+            start_new_session=True,
+        )
+        run.pid = run._process.pid
+        run.started_at = time.time()
+        self._register(run)
+
+    def _register(self, run: Run):
+        """Hand a run's pipes to the I/O thread"""
+        for name in ("stdout", "stderr"):
+            stream = getattr(run._process, name)
+            if stream is None:
+                # Redirected elsewhere, e.g. into the next pipeline stage
+                continue
+            os.set_blocking(stream.fileno(), False)
+            run._decoders[name] = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            run._open_streams += 1
+
+        with self._lock:
+            self._pending_registrations.append(run)
+        self._wake()
+
+    def _wake(self):
+        try:
+            os.write(self._wakeup_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _io_loop(self):
+        """Multiplex every running process's pipes on one thread"""
+        while True:
+            with self._lock:
+                pending, self._pending_registrations = self._pending_registrations, []
+            for run in pending:
+                for name in run._decoders:
+                    self._selector.register(getattr(run._process, name), selectors.EVENT_READ,
+                                            (run, name))
+
+            # Poll quickly only while exited-but-unreaped processes remain
+            timeout = 0.01 if self._reaping else None
+            deadline = self._check_deadlines()
+            if deadline is not None:
+                wait = max(0.0, deadline - time.time())
+                timeout = wait if timeout is None else min(timeout, wait)
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    try:
+                        while os.read(self._wakeup_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+
+                run, name = key.data
+                try:
+                    data = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b""
+
+                decoder = run._decoders[name]
+                if data:
+                    text = decoder.decode(data)
+                    if text:
+                        self._output(run, name, text)
+                    continue
+
+                # EOF on this stream
+                text = decoder.decode(b"", final=True)
+                if text:
+                    self._output(run, name, text)
+                self._selector.unregister(key.fileobj)
+                key.fileobj.close()
+                run._open_streams -= 1
+                if run._open_streams == 0:
+                    self._reaping.append(run)
+
+            for run in list(self._reaping):
+                returncode = self._reap(run)
+                if returncode is not None:
+                    self._reaping.remove(run)
+                    self._finish(run, returncode)
+
+    def _check_deadlines(self) -> Optional[float]:
+        """Stop runs past their timeout; returns the next deadline, if any"""
+        now = time.time()
+        upcoming = None
+        with self._lock:
+            for run in self._running.values():
+                if run._deadline is None or run._process is None:
+                    continue
+                if now >= run._deadline:
+                    if not run._terminated:
+                        run.error = f"Timed out after {run.limits['timeout']:g}s"
+                        run._terminated = True
+                        run._deadline = now + KILL_GRACE
+                        self._signal(run, signal.SIGTERM)
+                    else:
+                        run._deadline = None
+                        self._signal(run, _SIGKILL)
+                        continue
+                upcoming = run._deadline if upcoming is None else min(upcoming, run._deadline)
+        return upcoming
+
+    def _reap(self, run: Run) -> Optional[int]:
+        """Poll a run's process, collecting its resource usage once it has exited"""
+        process = run._process
+        if not isinstance(process, subprocess.Popen):
+            # Warm worker runs report usage from the worker's own wait4()
+            returncode = process.poll()
+            if returncode is not None and run.host is not None:
+                # Agents report usage already in bytes, and why a run failed there
+                run.rusage = process.rusage
+                if process.error and run.error is None and run.status != CANCELLED:
+                    run.error = process.error
+            elif returncode is not None and process.rusage:
+                run.rusage = dict(process.rusage, maxrss=process.rusage["maxrss"] * _MAXRSS_SCALE)
+            return returncode
+
+        if not hasattr(os, "wait4") or process.returncode is not None:
+            return process.poll()
+        try:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        except ChildProcessError:
+            return process.poll()
+        if pid == 0:
+            return None
+        # Reaped here, so tell Popen it has no child left to wait for
+        process.returncode = os.waitstatus_to_exitcode(status)
+        run.rusage = {"utime": usage.ru_utime, "stime": usage.ru_stime,
+                      "maxrss": usage.ru_maxrss * _MAXRSS_SCALE}
+        return process.returncode
+
+    def _output(self, run: Run, stream: str, text: str):
+        """Pass output to listeners, keeping a copy if the result may be cached"""
+        if run._captured is not None:
+            run._captured_size += len(text)
+            if run._captured_size > self.result_cache.max_entry_bytes:
+                # Too big to be worth caching
+                run._captured = None
+            else:
+                run._captured.append((stream, text))
+        self._emit(run, EVENT_OUTPUT, (stream, text))
+
+    def _store_result(self, run: Run):
+        """Save a successful memoizable run to the result cache"""
+        try:
+            self.result_cache.put(run._cache_key, run.script_path, run.returncode, run._captured)
+        except Exception as e:
+            print(f"Error caching result of {run.script_path}: {e}")
+        run._captured = None
+
+    def _finish(self, run: Run, returncode: Optional[int]):
+        """Record a run's exit and start the next queued run"""
+        with self._lock:
+            run.returncode = returncode
+            run.ended_at = time.time()
+            if run.pid is None and run._process is not None:
+                # Runs in warm workers only learn their pid once forked
+                run.pid = run._process.pid
+            run._deadline = None
+            if run.status != CANCELLED:
+                # Runs stopped for exceeding a limit carry an error
+                run.status = FINISHED if returncode is not None and run.error is None else FAILED
+            self._running.pop(run.id, None)
+            self._runs.pop(run.id, None)
+            run._process = None
+            run._agent = None
+
+        if run._captured is not None:
+            # Only clean exits are memoized; failures may be transient
+            if run.status == FINISHED and returncode == 0:
+                thread = threading.Thread(target=self._store_result, args=(run,),
+                                          name="ResultCache", daemon=True)
+                self._stores = [t for t in self._stores if t.is_alive()] + [thread]
+                thread.start()
+            else:
+                run._captured = None
+
+        # Listeners hear about the exit before anyone waiting on done wakes up
+        self._emit(run, EVENT_FINISHED, returncode)
+        run.done.set()
+        self._start_queued()
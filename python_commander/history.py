@@ -0,0 +1,182 @@
+"""
+Run history for Python Commander
+An append-only SQLite log of every script run with its timing and resource
+usage, queried for recents, slow scripts, regressions and failure rates
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .execution import CANCELLED, EVENT_FINISHED, EVENT_STARTED, FINISHED
+from .parser import hash_source
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    script TEXT NOT NULL,
+    script_hash TEXT,
+    arguments TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL NOT NULL,
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    wall REAL NOT NULL,
+    user_cpu REAL,
+    system_cpu REAL,
+    peak_rss INTEGER,
+    cached INTEGER NOT NULL DEFAULT 0,
+    profile TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS runs_script_started ON runs(script, started);
+"""
+
+# Columns added since the first schema, added to older databases on open
+MIGRATIONS = (
+    ("profile", "ALTER TABLE runs ADD COLUMN profile TEXT"),
+)
+
+DAY = 24 * 60 * 60
+
+
+class RunHistory:
+    """Persistent record of finished runs
+
+    Attach it to an ExecutionEngine to record every run; queries can be made
+    from any thread.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._hashes: Dict[int, Optional[str]] = {}
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(runs)")}
+        for column, statement in MIGRATIONS:
+            if column not in columns:
+                self._db.execute(statement)
+        self._db.commit()
+
+    @classmethod
+    def from_config(cls, config) -> "RunHistory":
+        return cls(config.history_path)
+
+    def attach(self, engine):
+        """Record every run the engine finishes"""
+        engine.add_listener(self._on_event)
+
+    def detach(self, engine):
+        engine.remove_listener(self._on_event)
+
+    def _on_event(self, run, event, data):
+        if event == EVENT_STARTED:
+            # Hash the source as it was when the run started
+            try:
+                with open(run.script_path, 'rb') as f:
+                    self._hashes[run.id] = hash_source(f.read())
+            except OSError:
+                self._hashes[run.id] = None
+        elif event == EVENT_FINISHED and run.started_at is not None:
+            self.record(run, self._hashes.pop(run.id, None))
+
+    def record(self, run, script_hash: Optional[str] = None):
+        """Append a finished run"""
+        rusage = run.rusage or {}
+        ended = run.ended_at or time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO runs (script, script_hash, arguments, started, ended, status, exit_code, "
+                "wall, user_cpu, system_cpu, peak_rss, cached, profile) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run.script_path, script_hash, json.dumps(run.arguments, sort_keys=True, default=str),
+                 run.started_at, ended, run.status, run.returncode, ended - run.started_at,
+                 rusage.get("utime"), rusage.get("stime"), rusage.get("maxrss"), int(run.cached),
+                 run.profile["stats"] if run.profile else None))
+            self._db.commit()
+
+    def _query(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def recent_scripts(self, limit: int = 10) -> List[str]:
+        """Most recently run scripts, newest first"""
+        rows = self._query("SELECT script, MAX(started) AS last FROM runs GROUP BY script "
+                           "ORDER BY last DESC LIMIT ?", (limit,))
+        return [row["script"] for row in rows]
+
+    def runs(self, script: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Latest runs, optionally for one script"""
+        if script is None:
+            return self._query("SELECT * FROM runs ORDER BY started DESC LIMIT ?", (limit,))
+        return self._query("SELECT * FROM runs WHERE script = ? ORDER BY started DESC LIMIT ?",
+                           (script, limit))
+
+    def profiles(self, script: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Latest profiled runs, optionally for one script"""
+        if script is None:
+            return self._query("SELECT * FROM runs WHERE profile IS NOT NULL "
+                               "ORDER BY started DESC LIMIT ?", (limit,))
+        return self._query("SELECT * FROM runs WHERE profile IS NOT NULL AND script = ? "
+                           "ORDER BY started DESC LIMIT ?", (script, limit))
+
+    def slowest(self, days: float = 7, limit: int = 10) -> List[Dict[str, Any]]:
+        """Scripts with the highest mean wall time over the last few days"""
+        return self._query(
+            "SELECT script, COUNT(*) AS runs, AVG(wall) AS mean_wall, MAX(wall) AS max_wall, "
+            "AVG(user_cpu + system_cpu) AS mean_cpu, MAX(peak_rss) AS peak_rss FROM runs "
+            "WHERE started >= ? AND status = ? AND cached = 0 "
+            "GROUP BY script ORDER BY mean_wall DESC LIMIT ?",
+            (time.time() - days * DAY, FINISHED, limit))
+
+    def regressions(self, days: float = 7, min_ratio: float = 1.2, min_runs: int = 2,
+                    limit: int = 20) -> List[Dict[str, Any]]:
+        """Scripts whose mean wall time grew versus the period before
+
+        Compares the last `days` with the `days` before that; only scripts
+        with at least min_runs clean runs in both periods are considered.
+        """
+        now = time.time()
+        return self._query(
+            "SELECT script, recent_wall, previous_wall, recent_wall / previous_wall AS ratio, "
+            "recent_runs, previous_runs FROM ("
+            "  SELECT script,"
+            "    AVG(CASE WHEN started >= :split THEN wall END) AS recent_wall,"
+            "    AVG(CASE WHEN started < :split THEN wall END) AS previous_wall,"
+            "    SUM(started >= :split) AS recent_runs,"
+            "    SUM(started < :split) AS previous_runs"
+            "  FROM runs WHERE started >= :start AND status = :finished AND exit_code = 0"
+            "    AND cached = 0"
+            "  GROUP BY script)"
+            " WHERE recent_runs >= :min_runs AND previous_runs >= :min_runs"
+            "   AND previous_wall > 0 AND recent_wall / previous_wall >= :min_ratio"
+            " ORDER BY ratio DESC LIMIT :limit",
+            {"split": now - days * DAY, "start": now - 2 * days * DAY, "finished": FINISHED,
+             "min_runs": min_runs, "min_ratio": min_ratio, "limit": limit})
+
+    def failure_rates(self, days: float = 7, min_runs: int = 1,
+                      limit: int = 20) -> List[Dict[str, Any]]:
+        """Share of runs per script that failed, highest first; cancelled runs don't count"""
+        return self._query(
+            "SELECT script, COUNT(*) AS runs,"
+            "  SUM(status != :finished OR exit_code IS NULL OR exit_code != 0) AS failures,"
+            "  AVG(status != :finished OR exit_code IS NULL OR exit_code != 0) AS failure_rate"
+            " FROM runs WHERE started >= :start AND status != :cancelled"
+            " GROUP BY script HAVING COUNT(*) >= :min_runs"
+            " ORDER BY failure_rate DESC, runs DESC LIMIT :limit",
+            {"finished": FINISHED, "cancelled": CANCELLED, "start": time.time() - days * DAY,
+             "min_runs": min_runs, "limit": limit})
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,244 @@
+"""
+Persistent script index for Python Commander
+Keeps a SQLite snapshot of every monitored directory's mtime and scripts so
+startup only re-lists directories that changed since the last run
+"""
+
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .scanner import ChangeSet, PatternMatcher, dir_mtime, list_directory, walk_directories
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    mtime INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scripts (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    root TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scripts_dir ON scripts(dir);
+"""
+
+
+def _under(path: str, prefix: str) -> bool:
+    """Check whether path is prefix or lives below it"""
+    return path == prefix or path.startswith(prefix + os.sep)
+
+
+class ScriptIndex:
+    """SQLite-backed snapshot of monitored directories and their scripts"""
+
+    def __init__(self, db_path, matcher: Optional[PatternMatcher] = None,
+                 max_workers: Optional[int] = None):
+        self.db_path = Path(db_path)
+        self.matcher = matcher or PatternMatcher()
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._check_signature()
+
+    def _check_signature(self):
+        """Discard the snapshot if it was built with different file patterns"""
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'matcher'").fetchone()
+        if row is None or row[0] != self.matcher.signature:
+            with self._db:
+                self._db.execute("DELETE FROM directories")
+                self._db.execute("DELETE FROM scripts")
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('matcher', ?)",
+                                 (self.matcher.signature,))
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._db.close()
+
+    def scripts(self, root: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Return (root, path) for every indexed script, optionally for one root"""
+        with self._lock:
+            if root is None:
+                rows = self._db.execute("SELECT root, path FROM scripts ORDER BY path")
+            else:
+                rows = self._db.execute("SELECT root, path FROM scripts WHERE root = ? "
+                                        "ORDER BY path", (root,))
+            return rows.fetchall()
+
+    def reconcile(self, roots: Iterable[str]) -> ChangeSet:
+        """Bring the snapshot up to date with the file system
+
+        Every known directory is stat'ed; only those whose mtime changed are
+        re-listed, and only new directories are walked. Returns the scripts
+        that were added or removed since the snapshot was taken.
+        """
+        roots = [os.path.abspath(os.path.expanduser(root)) for root in roots]
+        roots = list(dict.fromkeys(roots))
+        changes = ChangeSet()
+
+        with self._lock:
+            known_dirs: Dict[str, Tuple[str, int]] = {
+                path: (root, mtime) for path, root, mtime
+                in self._db.execute("SELECT path, root, mtime FROM directories")
+            }
+            known_scripts: Dict[str, Set[str]] = {}
+            for path, directory in self._db.execute("SELECT path, dir FROM scripts"):
+                known_scripts.setdefault(directory, set()).add(path)
+
+        dir_updates: Dict[str, Tuple[str, int]] = {}
+        dir_deletes: Set[str] = set()
+        script_adds: List[Tuple[str, str, str]] = []
+
+        # Roots that are no longer monitored
+        for path, (root, _) in known_dirs.items():
+            if root not in roots:
+                dir_deletes.add(path)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="index") as executor:
+            candidates = [path for path, (root, _) in known_dirs.items() if root in roots]
+            changed = []
+            for path, mtime in zip(candidates, executor.map(dir_mtime, candidates)):
+                if mtime is None:
+                    dir_deletes.add(path)
+                elif mtime != known_dirs[path][1]:
+                    changed.append((path, mtime))
+
+            # Re-list only the directories whose entries changed
+            new_dirs = [(root, root) for root in roots if root not in known_dirs]
+            listings = executor.map(lambda item: list_directory(item[0], self.matcher), changed)
+            for (path, mtime), (subdirs, scripts) in zip(changed, listings):
+                root = known_dirs[path][0]
+                dir_updates[path] = (root, mtime)
+                before = known_scripts.get(path, set())
+                after = set(scripts)
+                for script in after - before:
+                    script_adds.append((script, path, root))
+                    changes.added.add(script)
+                changes.removed.update(before - after)
+                for subdir in subdirs:
+                    if subdir not in known_dirs:
+                        new_dirs.append((subdir, root))
+
+        self._walk(new_dirs, dir_updates, script_adds, changes)
+
+        # Anything below a deleted directory is gone too
+        for path in dir_deletes:
+            changes.removed.update(known_scripts.get(path, ()))
+
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM directories WHERE path = ?",
+                                 ((path,) for path in dir_deletes))
+            self._db.executemany("DELETE FROM scripts WHERE dir = ?",
+                                 ((path,) for path in dir_deletes))
+            self._db.executemany("DELETE FROM scripts WHERE path = ?",
+                                 ((path,) for path in changes.removed))
+            self._db.executemany("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                                 ((path, root, mtime) for path, (root, mtime)
+                                  in dir_updates.items()))
+            self._db.executemany("INSERT OR REPLACE INTO scripts VALUES (?, ?, ?)",
+                                 script_adds)
+
+        return changes
+
+    def _walk(self, starts: List[Tuple[str, str]], dir_updates: Dict[str, Tuple[str, int]],
+              script_adds: List[Tuple[str, str, str]], changes: ChangeSet):
+        """Walk new directory trees with the streaming scanner"""
+        for root, path, mtime, scripts in walk_directories(starts, self.matcher, self.max_workers):
+            dir_updates[path] = (root, mtime)
+            for script in scripts:
+                script_adds.append((script, path, root))
+                changes.added.add(script)
+
+    def apply_changes(self, changes: ChangeSet, roots: Iterable[str]) -> ChangeSet:
+        """Fold a monitor ChangeSet into the snapshot
+
+        Directory events are expanded into the scripts they contain, so the
+        returned ChangeSet only lists scripts.
+        """
+        roots = [os.path.abspath(os.path.expanduser(root)) for root in roots]
+        result = ChangeSet()
+
+        def root_for(path: str) -> Optional[str]:
+            matches = [root for root in roots if _under(path, root)]
+            return max(matches, key=len) if matches else None
+
+        with self._lock:
+            removed_dirs = []
+            for directory in changes.removed_dirs:
+                rows = self._db.execute(
+                    "SELECT path FROM directories WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                    (directory, self._like_prefix(directory))).fetchall()
+                removed_dirs.extend(row[0] for row in rows)
+            for directory in removed_dirs:
+                result.removed.update(row[0] for row in self._db.execute(
+                    "SELECT path FROM scripts WHERE dir = ?", (directory,)))
+            known = {row[0] for row in self._db.execute("SELECT path FROM scripts")} \
+                if changes.added or changes.updated else set()
+
+        dir_updates: Dict[str, Tuple[str, int]] = {}
+        script_adds: List[Tuple[str, str, str]] = []
+        walked = ChangeSet()
+
+        new_dirs = []
+        for directory in changes.added_dirs:
+            root = root_for(directory)
+            if root is not None:
+                new_dirs.append((directory, root))
+        self._walk(new_dirs, dir_updates, script_adds, walked)
+
+        for path in changes.added | changes.updated | walked.added:
+            root = root_for(path)
+            if root is None:
+                continue
+            directory = os.path.dirname(path)
+            if path in known:
+                result.updated.add(path)
+            else:
+                result.added.add(path)
+                script_adds.append((path, directory, root))
+            mtime = dir_mtime(directory)
+            if mtime is not None:
+                dir_updates[directory] = (root, mtime)
+
+        result.removed.update(changes.removed)
+        result.removed -= result.added | result.updated
+        for path in changes.removed:
+            directory = os.path.dirname(path)
+            root = root_for(directory)
+            mtime = dir_mtime(directory)
+            if root is not None and mtime is not None:
+                dir_updates[directory] = (root, mtime)
+
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM directories WHERE path = ?",
+                                 ((path,) for path in removed_dirs))
+            self._db.executemany("DELETE FROM scripts WHERE path = ?",
+                                 ((path,) for path in result.removed))
+            self._db.executemany("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                                 ((path, root, mtime) for path, (root, mtime)
+                                  in dir_updates.items()))
+            self._db.executemany("INSERT OR REPLACE INTO scripts VALUES (?, ?, ?)",
+                                 script_adds)
+
+        return result
+
+    @staticmethod
+    def _like_prefix(directory: str) -> str:
+        """Build a LIKE pattern matching everything below a directory"""
+        escaped = directory.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return escaped + os.sep + "%"
@@ -1,53 +1,83 @@
 import sys
 import os
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QMenuBar
-from PySide6.QtCore import Qt, QRect
-from PySide6.QtGui import QPalette, QColor, QAction, QIcon
+import threading
+import time
+import traceback
+
+_IMPORT_START = time.perf_counter()
+
+from functools import lru_cache
+from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QMenuBar,
+                               QDockWidget, QDialog, QListWidget, QPushButton, QLabel, QTreeView,
+                               QAbstractItemView, QHeaderView)
+from PySide6.QtCore import Qt, QRect, QTimer, Signal
+from PySide6.QtGui import QPalette, QColor, QAction, QIcon, QKeySequence
 from pathlib import Path
 
-from .config import config
+# Only what the first paint needs is imported here; backend modules are
+# imported by start_backend() and dialogs by the actions that open them
+from .config import config, key_changed
+from .startup import DEFAULT_BUDGET_MS, PROFILE_FLAG, timeline
+
+timeline.record("import GUI modules", _IMPORT_START, time.perf_counter())
+
+_RESOURCES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images")
+_ICONSET_DIR = os.path.join(_RESOURCES, "icon", "iconset.iconset")
+
+# Icon candidates, best first; the relative paths cover running from the repo root
+QT_ICON_PATHS = (
+    # Try high-resolution PNG icons first for better quality
+    os.path.join(_RESOURCES, "logo-images", "IconOnly_NoBuffer_rounded.png"),
+    os.path.join(_RESOURCES, "logo-images", "IconOnly_Transparent.png"),
+    os.path.join(_ICONSET_DIR, "icon_512x512.png"),
+    os.path.join(_ICONSET_DIR, "icon_256x256.png"),
+    # Fallback to ICNS
+    os.path.join(_RESOURCES, "icon", "iconset.icns"),
+    "resources/images/logo-images/IconOnly_NoBuffer_rounded.png",
+    "resources/images/logo-images/IconOnly_Transparent.png",
+    "resources/images/icon/iconset.iconset/icon_512x512.png",
+    "resources/images/icon/iconset.iconset/icon_256x256.png",
+    "resources/images/icon/iconset.icns"
+)
+
+# AppKit and the window icon want PNGs
+PNG_ICON_PATHS = (
+    os.path.join(_RESOURCES, "logo-images", "IconOnly_NoBuffer_rounded.png"),
+    os.path.join(_RESOURCES, "logo-images", "IconOnly_Transparent.png"),
+    os.path.join(_ICONSET_DIR, "icon_512x512.png"),
+    "resources/images/logo-images/IconOnly_NoBuffer_rounded.png",
+    "resources/images/logo-images/IconOnly_Transparent.png",
+    "resources/images/icon/iconset.iconset/icon_512x512.png"
+)
+
+@lru_cache(maxsize=None)
+def resolve_icon_path(candidates):
+    """Return the first existing icon path; each candidate list is probed once"""
+    for icon_path in candidates:
+        if os.path.exists(icon_path):
+            return icon_path
+    return None
 
 def set_app_icon(app):
     """Set the application icon for both PySide6 and macOS dock"""
-    # For Qt application icon, prefer high-resolution PNG files
-    qt_icon_paths = [
-        # Try high-resolution PNG icons first for better quality
-        os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "logo-images", "IconOnly_NoBuffer_rounded.png"),
-        os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "logo-images", "IconOnly_Transparent.png"),
-        os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "icon", "iconset.iconset", "icon_512x512.png"),
-        os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "icon", "iconset.iconset", "icon_256x256.png"),
-        # Fallback to ICNS
-        os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "icon", "iconset.icns"),
-        "resources/images/logo-images/IconOnly_NoBuffer_rounded.png",
-        "resources/images/logo-images/IconOnly_Transparent.png",
-        "resources/images/icon/iconset.iconset/icon_512x512.png",
-        "resources/images/icon/iconset.iconset/icon_256x256.png",
-        "resources/images/icon/iconset.icns"
-    ]
-    
-    icon_set = False
-    for icon_path in qt_icon_paths:
-        if os.path.exists(icon_path):
-            print(f"Setting Qt application icon from: {icon_path}")
-            icon = QIcon(icon_path)
-            
-            # If it's a PNG file, add multiple sizes to the icon for better scaling
-            if icon_path.endswith('.png') and 'iconset.iconset' in icon_path:
-                # Add multiple resolutions from the iconset
-                iconset_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "icon", "iconset.iconset")
-                icon_sizes = ['icon_16x16.png', 'icon_32x32.png', 'icon_128x128.png', 'icon_256x256.png', 'icon_512x512.png']
-                
-                for size_file in icon_sizes:
-                    size_path = os.path.join(iconset_dir, size_file)
-                    if os.path.exists(size_path):
-                        icon.addFile(size_path)
-                        print(f"Added icon size: {size_file}")
+    icon_path = resolve_icon_path(QT_ICON_PATHS)
+    if icon_path:
+        print(f"Setting Qt application icon from: {icon_path}")
+        icon = QIcon(icon_path)
+        
+        # If it's a PNG file, add multiple sizes to the icon for better scaling
+        if icon_path.endswith('.png') and 'iconset.iconset' in icon_path:
+            # Add multiple resolutions from the iconset
+            icon_sizes = ['icon_16x16.png', 'icon_32x32.png', 'icon_128x128.png', 'icon_256x256.png', 'icon_512x512.png']
             
-            app.setWindowIcon(icon)
-            icon_set = True
-            break
-    
-    if not icon_set:
+            for size_file in icon_sizes:
+                size_path = os.path.join(_ICONSET_DIR, size_file)
+                if os.path.exists(size_path):
+                    icon.addFile(size_path)
+                    print(f"Added icon size: {size_file}")
+        
+        app.setWindowIcon(icon)
+    else:
         print("Warning: Could not find icon file for Qt application")
     
     # For macOS, also set the dock icon using AppKit
@@ -55,27 +85,16 @@ def set_app_icon(app):
         try:
             from AppKit import NSApplication, NSImage
             
-            # Try to find a high-resolution PNG version for AppKit
-            appkit_icon_paths = [
-                os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "logo-images", "IconOnly_NoBuffer_rounded.png"),
-                os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "logo-images", "IconOnly_Transparent.png"),
-                os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "icon", "iconset.iconset", "icon_512x512.png"),
-                "resources/images/logo-images/IconOnly_NoBuffer_rounded.png",
-                "resources/images/logo-images/IconOnly_Transparent.png",
-                "resources/images/icon/iconset.iconset/icon_512x512.png"
-            ]
-            
-            for icon_path in appkit_icon_paths:
-                if os.path.exists(icon_path):
-                    print(f"Setting macOS dock icon from: {icon_path}")
-                    nsapp = NSApplication.sharedApplication()
-                    image = NSImage.alloc().initByReferencingFile_(os.path.abspath(icon_path))
-                    if image:
-                        nsapp.setApplicationIconImage_(image)
-                        print("Successfully set macOS dock icon")
-                    else:
-                        print(f"Failed to load image from {icon_path}")
-                    break
+            icon_path = resolve_icon_path(PNG_ICON_PATHS)
+            if icon_path:
+                print(f"Setting macOS dock icon from: {icon_path}")
+                nsapp = NSApplication.sharedApplication()
+                image = NSImage.alloc().initByReferencingFile_(os.path.abspath(icon_path))
+                if image:
+                    nsapp.setApplicationIconImage_(image)
+                    print("Successfully set macOS dock icon")
+                else:
+                    print(f"Failed to load image from {icon_path}")
             else:
                 print("Warning: Could not find icon file for macOS dock")
                 
@@ -84,42 +103,204 @@ def set_app_icon(app):
         except Exception as e:
             print(f"Could not set macOS dock icon: {e}")
 
+# Longest a closing window waits for the startup thread, e.g. a daemon still starting
+STARTUP_CLOSE_WAIT = 1.0
+
+
 class MainWindow(QMainWindow):
+    # Emitted from the startup thread with the catalog once the daemon and engine exist
+    backend_ready = Signal(object)
+    # Emitted from the startup thread with the error if starting them failed
+    backend_failed = Signal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Python Commander")
         self.setMinimumSize(800, 600)
-        self.set_window_icon()
-        self.set_initial_geometry()
-        
-        # Load dark mode setting from config
-        self.is_dark_mode = config.is_dark_mode()
         
+        # Everything that touches the disk or spawns work is set up by
+        # finish_startup() once the window has painted
+        self.is_dark_mode = False
+        # Client of the background daemon when attached to one, else None
+        self.daemon = None
+        self.catalog = None
+        self.catalog_bridge = None
+        self.engine = None
+        self.engine_bridge = None
+        self.batch_engine = None
+        self.history = None
+        self.sampler = None
+        self.sampler_bridge = None
+        # Runs schedules here when there is no daemon to do it
+        self.scheduler = None
+        self.compiler = None
+        self.output_panel = None
+        self.resource_panel = None
+        self.profile_store = None
+        self.profiled_runs = set()
+        self.command_palette = None
+        self.script_model = None
+        self._startup_thread = None
+        self._closed = False
+        # Set when the window closed before startup finished, leaving the
+        # startup thread to shut down what it created
+        self._startup_orphaned = False
+        self._startup_lock = threading.Lock()
+        
+        self.init_ui()
         self.init_menu_bar()
+        self.backend_ready.connect(self.attach_backend)
+        self.backend_failed.connect(self.show_backend_error)
+
+    def finish_startup(self):
+        """Deferred startup work, run from the event loop after first paint
+
+        Only what the window needs to look right happens here; attaching to
+        the daemon (which may have to be started) and creating the engine
+        and catalog happen on a thread, then attach_backend() wires them up.
+        """
+        with timeline.phase("load config"):
+            config.load()
+        
+        with timeline.phase("apply settings"):
+            self.set_initial_geometry()
+            # Load dark mode setting from config
+            self.is_dark_mode = config.is_dark_mode()
+            if self.is_dark_mode:
+                self.set_dark_palette()
+            else:
+                self.set_light_palette()
         
-        # Apply initial theme
-        if self.is_dark_mode:
-            self.set_dark_palette()
+        with timeline.phase("resolve icons"):
+            set_app_icon(QApplication.instance())
+            self.set_window_icon()
+        
+        self.statusBar().showMessage("Starting…")
+        self._startup_thread = threading.Thread(target=self.start_backend, name="Startup",
+                                                daemon=True)
+        self._startup_thread.start()
+
+    def start_backend(self):
+        """Attach to the daemon or create local services (runs on the startup thread)
+
+        The catalog is handed over with backend_ready rather than set here,
+        as the window's actions treat self.catalog as "ready to run scripts".
+        """
+        catalog = None
+        error = None
+        try:
+            with timeline.phase("import backend modules"):
+                from .bytecode import BytecodeCompiler
+                from .catalog import ScriptCatalog
+                from .daemon_client import RemoteCatalog, RemoteSampler, connect as connect_daemon
+                from .execution import ExecutionEngine
+                from .history import RunHistory
+                from .sampler import ResourceSampler
+            
+            if config.get("settings.use_daemon", True):
+                with timeline.phase("attach to daemon"):
+                    # Runs and the catalog live in the daemon, so they survive this window
+                    self.daemon = connect_daemon(config, start=True)
+                    if self.daemon is not None:
+                        self.daemon.add_disconnect_listener(
+                            lambda: print("Lost connection to the daemon"))
+            
+            with timeline.phase("start execution engine"):
+                # Script runs happen in child processes
+                self.history = RunHistory.from_config(config)
+                if self.daemon is not None:
+                    # The daemon records its own runs and samples them
+                    self.engine = self.daemon.engine()
+                    self.sampler = RemoteSampler(self.daemon)
+                else:
+                    self.engine = ExecutionEngine.from_config(config)
+                    self.history.attach(self.engine)
+                    self.sampler = ResourceSampler.from_config(config)
+                    self.sampler.attach(self.engine)
+                    self.sampler.start()
+            
+            with timeline.phase("create catalog"):
+                if self.daemon is not None:
+                    catalog = RemoteCatalog(self.daemon, config)
+                else:
+                    catalog = ScriptCatalog(config)
+                    # Precompiles scripts for faster launches; the daemon has its own
+                    self.compiler = BytecodeCompiler.from_config(config, catalog)
+                    if self.compiler is not None:
+                        self.compiler.start()
+                    if self.engine.environments is not None:
+                        self.engine.environments.watch(catalog)
+        except Exception as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+        
+        with self._startup_lock:
+            self._startup_thread = None
+            orphaned = self._startup_orphaned
+        if orphaned:
+            self.catalog = catalog
+            self.stop_backend()
+        elif error is not None:
+            # Signals are queued onto the GUI thread
+            self.backend_failed.emit(error)
         else:
-            self.set_light_palette()
+            self.backend_ready.emit(catalog)
+
+    def show_backend_error(self, error):
+        """Report a failed start_backend(); the window stays up but can't run scripts"""
+        if self._closed:
+            return
+        from PySide6.QtWidgets import QMessageBox
+        self.statusBar().showMessage(f"Could not start: {error}")
+        QMessageBox.critical(self, "Python Commander",
+                             f"Python Commander could not start its script runner:\n\n{error}")
+
+    def attach_backend(self, catalog):
+        """Connect the services start_backend() created to the window"""
+        if self._closed or catalog is None:
+            return
+        self.catalog = catalog
+        from .ui.bridge import CatalogBridge, EngineBridge, SamplerBridge
+        from .ui.script_model import ScriptTreeModel
+        
+        with timeline.phase("attach execution engine"):
+            # Output arrives via the bridge
+            self.engine_bridge = EngineBridge(self.engine, self)
+            self.sampler_bridge = SamplerBridge(self.sampler, self)
+            self.init_output_panel()
+            self.init_resource_panel()
+            self.engine_bridge.run_event.connect(self.on_run_event)
+        
+        with timeline.phase("attach catalog"):
+            # Script catalog, loaded in the background
+            self.catalog_bridge = CatalogBridge(self.catalog, self)
+            self.script_model = ScriptTreeModel(self.catalog, self)
+            self.catalog_bridge.changed.connect(self.script_model.queue_changes)
+            self.script_tree.setModel(self.script_model)
+            self.script_tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+            if self.daemon is not None:
+                # Everything is listening now; runs still going replay their output first
+                self.daemon.subscribe("runs", "catalog", "samples")
+            self.start_catalog()
+        
+        if self.daemon is None:
+            with timeline.phase("start scheduler"):
+                from .scheduler import Scheduler
+                self.scheduler = Scheduler.from_config(self.engine, config, self.catalog)
+                self.scheduler.start()
+        
+        # Pick up what other windows, the CLI and the daemon save to the config
+        config.add_listener(self.on_config_changed)
+        config.start_watching()
+        self.statusBar().clearMessage()
 
     def set_window_icon(self):
         """Set the window icon specifically for this window"""
         # Try to load the largest available icon for the window
-        icon_paths = [
-            os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "logo-images", "IconOnly_NoBuffer_rounded.png"),
-            os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "logo-images", "IconOnly_Transparent.png"),
-            os.path.join(os.path.dirname(os.path.dirname(__file__)), "resources", "images", "icon", "iconset.iconset", "icon_512x512.png"),
-            "resources/images/logo-images/IconOnly_NoBuffer_rounded.png",
-            "resources/images/logo-images/IconOnly_Transparent.png",
-            "resources/images/icon/iconset.iconset/icon_512x512.png"
-        ]
-        
-        for icon_path in icon_paths:
-            if os.path.exists(icon_path):
-                print(f"Setting window icon from: {icon_path}")
-                self.setWindowIcon(QIcon(icon_path))
-                break
+        icon_path = resolve_icon_path(PNG_ICON_PATHS)
+        if icon_path:
+            print(f"Setting window icon from: {icon_path}")
+            self.setWindowIcon(QIcon(icon_path))
 
     def set_initial_geometry(self):
         screen = QApplication.primaryScreen()
@@ -142,7 +323,43 @@ class MainWindow(QMainWindow):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
         central_widget.setLayout(layout)
+        
+        # Script browser; the model is attached once the catalog exists
+        self.script_tree = QTreeView()
+        self.script_tree.setUniformRowHeights(True)
+        self.script_tree.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.script_tree.activated.connect(self.on_script_activated)
+        self.script_tree.setContextMenuPolicy(Qt.ActionsContextMenu)
+        layout.addWidget(self.script_tree)
+    
+    def on_script_activated(self, index):
+        """Run the script behind a browser row"""
+        path = self.script_model.path_for_index(index) if self.script_model else None
+        if path:
+            self.select_script(path)
+
+    def init_output_panel(self):
+        from .ui.output_panel import OutputPanel
+        self.output_panel = OutputPanel.from_config(config)
+        self.engine_bridge.run_event.connect(self.output_panel.handle_event)
+        self.output_dock = QDockWidget("Output", self)
+        self.output_dock.setObjectName("OutputDock")
+        self.output_dock.setWidget(self.output_panel)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.output_dock)
+
+    def init_resource_panel(self):
+        from .ui.resource_panel import ResourcePanel
+        self.resource_panel = ResourcePanel()
+        self.engine_bridge.run_event.connect(self.resource_panel.handle_event)
+        self.sampler_bridge.sampled.connect(self.resource_panel.handle_sample)
+        self.resource_dock = QDockWidget("Resources", self)
+        self.resource_dock.setObjectName("ResourceDock")
+        self.resource_dock.setWidget(self.resource_panel)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.resource_dock)
+        self.tabifyDockWidget(self.output_dock, self.resource_dock)
+        self.output_dock.raise_()
 
     def init_menu_bar(self):
         menu_bar = self.menuBar()
@@ -158,6 +375,251 @@ class MainWindow(QMainWindow):
         self.manage_paths_action = QAction("Manage Monitored Paths...", self)
         self.manage_paths_action.triggered.connect(self.show_path_manager)
         file_menu.addAction(self.manage_paths_action)
+        
+        self.find_script_action = QAction("Find Script...", self)
+        self.find_script_action.setShortcut(QKeySequence("Ctrl+K"))
+        self.find_script_action.triggered.connect(self.show_command_palette)
+        file_menu.addAction(self.find_script_action)
+        
+        self.run_batch_action = QAction("Run Batch...", self)
+        self.run_batch_action.triggered.connect(self.run_batch_for_selection)
+        file_menu.addAction(self.run_batch_action)
+        self.script_tree.addAction(self.run_batch_action)
+        
+        self.profile_action = QAction("Run with Profiler...", self)
+        self.profile_action.triggered.connect(self.profile_selection)
+        file_menu.addAction(self.profile_action)
+        self.script_tree.addAction(self.profile_action)
+        
+        self.pipeline_action = QAction("New Pipeline...", self)
+        self.pipeline_action.triggered.connect(self.show_pipeline_dialog)
+        file_menu.addAction(self.pipeline_action)
+        
+        self.schedules_action = QAction("Schedules...", self)
+        self.schedules_action.triggered.connect(self.show_schedules)
+        file_menu.addAction(self.schedules_action)
+        
+        self.schedule_action = QAction("Schedule...", self)
+        self.schedule_action.triggered.connect(self.schedule_selection)
+        self.script_tree.addAction(self.schedule_action)
+        
+        self.profiles_menu = file_menu.addMenu("Recent Profiles")
+        self.profiles_menu.aboutToShow.connect(self.populate_profiles_menu)
+        
+        # Recent scripts come from the run history, refreshed on open
+        self.recent_menu = file_menu.addMenu("Recent Scripts")
+        self.recent_menu.aboutToShow.connect(self.populate_recent_menu)
+
+    def start_catalog(self):
+        """Load the script catalog and start monitoring off the GUI thread"""
+        def load():
+            with timeline.phase("load catalog index"):
+                self.catalog.load()
+            if config.get("settings.auto_refresh", True):
+                with timeline.phase("start monitor"):
+                    self.catalog.start_monitoring()
+            if timeline.enabled:
+                timeline.report(config.get("settings.startup_budget_ms", DEFAULT_BUDGET_MS))
+        
+        threading.Thread(target=load, name="CatalogLoader", daemon=True).start()
+
+    def refresh_catalog_paths(self):
+        """Pick up monitored path changes in the background"""
+        if self.catalog is None:
+            return
+        threading.Thread(target=self.catalog.refresh_paths, name="CatalogRefresh",
+                         daemon=True).start()
+
+    def show_command_palette(self):
+        """Show the script search palette"""
+        if self.catalog is None:
+            return
+        if self.command_palette is None:
+            from .ui.command_palette import CommandPalette
+            self.command_palette = CommandPalette(self.catalog, self)
+            self.command_palette.script_selected.connect(self.select_script)
+        self.command_palette.popup()
+
+    def select_script(self, path):
+        """Handle a script picked from the catalog"""
+        entry = self.catalog.get(path)
+        if entry is None:
+            return
+        self.statusBar().showMessage(f"{entry.title} — {path}")
+        print(f"Selected script: {path}")
+        self.run_script(path)
+
+    def run_script(self, path, profile=False):
+        """Ask for argument values and start a run, optionally under the profiler"""
+        entry = self.catalog.get(path)
+        if entry is None:
+            return
+        
+        from .ui.run_dialog import RunDialog
+        dialog = RunDialog(entry, self, profile=profile,
+                           trace_memory=config.get("settings.profile_memory", False))
+        if dialog.exec():
+            profile_paths = None
+            if profile:
+                if self.profile_store is None:
+                    from .profiling import ProfileStore
+                    self.profile_store = ProfileStore.from_config(config)
+                profile_paths = self.profile_store.allocate(path, memory=dialog.trace_memory)
+            run = self.engine.submit(path, dialog.arguments, memoize=entry.cache,
+                                     cache_inputs=entry.cache_inputs, limits=entry.limits,
+                                     profile=profile_paths)
+            self.output_dock.show()
+            if profile:
+                self.profiled_runs.add(run)
+                print(f"Started profiled run #{run.id}: {path}")
+            elif run.cached:
+                print(f"Replayed cached result as run #{run.id}: {path}")
+            else:
+                print(f"Started run #{run.id}: {path}")
+
+    def show_pipeline_dialog(self):
+        """Compose a pipeline of catalog scripts and start it"""
+        if self.catalog is None:
+            return
+        from .pipeline import Pipeline
+        from .ui.pipeline_dialog import PipelineDialog
+        dialog = PipelineDialog(self.catalog, config, self)
+        if dialog.exec():
+            pipeline = Pipeline(self.engine, dialog.stages)
+            runs = pipeline.start()
+            self.output_dock.show()
+            print(f"Started pipeline #{runs[0].id}: "
+                  + " | ".join(os.path.basename(path) for path, _ in dialog.stages))
+
+    def show_schedules(self):
+        """List, add and edit the scripts run on a schedule"""
+        if self.catalog is None:
+            return
+        from .ui.schedule_dialog import SchedulesDialog
+        SchedulesDialog(self.catalog, config, self.reload_schedules, self).exec()
+
+    def schedule_selection(self):
+        """Schedule the script selected in the browser"""
+        path = None
+        if self.script_model is not None:
+            path = self.script_model.path_for_index(self.script_tree.currentIndex())
+        if path is None:
+            self.statusBar().showMessage("Select a script to schedule", 3000)
+            return
+        from .ui.schedule_dialog import SchedulesDialog
+        SchedulesDialog(self.catalog, config, self.reload_schedules, self).schedule_script(path)
+
+    def on_config_changed(self, keys):
+        """Follow config changes saved by other processes (called off the GUI thread)"""
+        if self.daemon is not None:
+            # The daemon follows them itself
+            return
+        if key_changed(keys, "schedules"):
+            self.scheduler.set_schedules(config.get_schedules())
+        if key_changed(keys, "monitored_paths"):
+            self.refresh_catalog_paths()
+
+    def reload_schedules(self):
+        """Hand changed schedules to whichever scheduler runs them"""
+        if self.scheduler is not None:
+            self.scheduler.set_schedules(config.get_schedules())
+        elif self.daemon is not None:
+            from .daemon_client import DaemonError
+            config.flush()
+            try:
+                self.daemon.request("schedule.reload")
+            except DaemonError as e:
+                print(f"Error reloading schedules: {e}")
+
+    def profile_selection(self):
+        """Profile the script selected in the browser"""
+        path = None
+        if self.script_model is not None:
+            path = self.script_model.path_for_index(self.script_tree.currentIndex())
+        if path is None:
+            self.statusBar().showMessage("Select a script to profile", 3000)
+            return
+        self.run_script(path, profile=True)
+
+    def on_run_event(self, run, event, data):
+        """Show the profile of a profiled run once it finishes"""
+        from .execution import EVENT_FINISHED
+        if event == EVENT_FINISHED and run in self.profiled_runs:
+            self.profiled_runs.discard(run)
+            if run.status != "cancelled" and os.path.exists(run.profile["stats"]):
+                self.show_profile(run.profile["stats"], run.profile.get("memory"),
+                                  os.path.basename(run.script_path))
+
+    def show_profile(self, stats_path, memory_path=None, title=""):
+        if memory_path is not None and not os.path.exists(memory_path):
+            memory_path = None
+        from .ui.profile_view import ProfileView
+        ProfileView(stats_path, memory_path, title, self).show()
+
+    def populate_profiles_menu(self):
+        """Fill the Recent Profiles menu from the run history"""
+        self.profiles_menu.clear()
+        if self.profile_store is None:
+            from .profiling import ProfileStore
+            self.profile_store = ProfileStore.from_config(config)
+        rows = self.history.profiles() if self.history is not None else []
+        rows = [row for row in rows if os.path.exists(row["profile"])]
+        for row in rows:
+            started = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["started"]))
+            title = os.path.basename(row["script"])
+            action = self.profiles_menu.addAction(f"{title} — {started} ({row['wall']:.1f}s)")
+            action.triggered.connect(
+                lambda checked=False, row=row, title=title: self.show_profile(
+                    row["profile"], self.profile_store.memory_path(row["profile"]), title))
+        if not rows:
+            self.profiles_menu.addAction("No Profiles").setEnabled(False)
+
+    def populate_recent_menu(self):
+        """Fill the Recent Scripts menu from the run history"""
+        self.recent_menu.clear()
+        recent = self.history.recent_scripts() if self.history is not None else []
+        for path in recent:
+            entry = self.catalog.get(path) if self.catalog is not None else None
+            action = self.recent_menu.addAction(entry.title if entry else os.path.basename(path))
+            action.setToolTip(path)
+            action.setEnabled(entry is not None)
+            action.triggered.connect(lambda checked=False, path=path: self.run_script(path))
+        if not recent:
+            self.recent_menu.addAction("No Recent Scripts").setEnabled(False)
+
+    def run_batch_for_selection(self):
+        """Open the batch dialog for the script selected in the browser"""
+        path = None
+        if self.script_model is not None:
+            path = self.script_model.path_for_index(self.script_tree.currentIndex())
+        if path is None:
+            self.statusBar().showMessage("Select a script to run as a batch", 3000)
+            return
+        self.run_batch(path)
+
+    def run_batch(self, path):
+        """Set up and run a parameter sweep for a script"""
+        entry = self.catalog.get(path)
+        if entry is None:
+            return
+        
+        if self.batch_engine is None and self.daemon is not None:
+            self.batch_engine = self.daemon.engine("batch")
+        elif self.batch_engine is None:
+            from .execution import ExecutionEngine
+            # Batches get their own engine so a sweep can use every core
+            # without starving interactive runs
+            self.batch_engine = ExecutionEngine(
+                max_concurrency=config.get("settings.batch_concurrency", 0) or os.cpu_count() or 1,
+                result_cache=self.engine.result_cache,
+                default_limits=config.get("settings.run_limits", {}),
+                bytecode_dir=self.engine.bytecode_dir,
+                environments=self.engine.environments,
+                agents=self.engine.agents)
+            self.history.attach(self.batch_engine)
+            self.sampler.attach(self.batch_engine)
+        from .ui.batch_dialog import BatchDialog
+        BatchDialog(entry, self.batch_engine, self).show()
 
     def toggle_dark_mode(self):
         # Use config to toggle and save
@@ -172,10 +634,6 @@ class MainWindow(QMainWindow):
 
     def show_path_manager(self):
         """Show dialog to manage monitored paths"""
-        from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListWidget, 
-                                       QPushButton, QFileDialog, QLabel, QSplitter)
-        from PySide6.QtCore import Qt
-        
         dialog = QDialog(self)
         dialog.setWindowTitle("Manage Monitored Paths")
         dialog.setMinimumSize(500, 400)
@@ -328,6 +786,7 @@ class MainWindow(QMainWindow):
             
             # Add to config
             config.add_monitored_path(path)
+            self.refresh_catalog_paths()
             
             # Add to UI list
             self.path_list.addItem(path)
@@ -364,6 +823,7 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.Yes:
             # Remove from config
             config.remove_monitored_path(path)
+            self.refresh_catalog_paths()
             
             # Remove from UI list
             self.path_list.takeItem(self.path_list.row(current_item))
@@ -379,14 +839,61 @@ class MainWindow(QMainWindow):
         pass
 
     def closeEvent(self, event):
-        """Save window size when closing"""
-        if config.get("settings.remember_window_position", True):
+        """Save window size and shut everything down when closing"""
+        self._closed = True
+        thread = self._startup_thread
+        if thread is not None:
+            thread.join(STARTUP_CLOSE_WAIT)
+        with self._startup_lock:
+            # Still starting: it shuts down whatever it creates once done
+            self._startup_orphaned = self._startup_thread is not None
+        
+        if config.is_loaded and config.get("settings.remember_window_position", True):
             size = self.size()
-            config.set("settings.window_size.width", size.width())
-            config.set("settings.window_size.height", size.height())
+            with config.batch():
+                config.set("settings.window_size.width", size.width())
+                config.set("settings.window_size.height", size.height())
+        
+        if config.is_loaded:
+            config.stop_watching()
+            config.remove_listener(self.on_config_changed)
+        if not self._startup_orphaned:
+            self.stop_backend()
         
         super().closeEvent(event)
 
+    def stop_backend(self):
+        """Stop the services start_backend() created and attach_backend() wired up"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        if self.catalog_bridge is not None:
+            self.catalog_bridge.detach()
+        if self.catalog is not None:
+            self.catalog.stop()
+        if self.compiler is not None:
+            self.compiler.stop()
+        if self.daemon is None and self.engine is not None and self.engine.environments is not None:
+            self.engine.environments.stop()
+        if self.sampler_bridge is not None:
+            self.sampler_bridge.detach()
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self.batch_engine is not None:
+            self.batch_engine.shutdown()
+        if self.engine_bridge is not None:
+            self.engine_bridge.detach()
+        if self.engine is not None:
+            # Only detaches when attached to the daemon, whose runs carry on
+            self.engine.shutdown()
+        if self.output_panel is not None:
+            for model in self.output_panel.models.values():
+                model.buffer.close()
+        if self.daemon is None and self.engine is not None and self.engine.agents is not None:
+            # Runs on agents end with the connection
+            self.engine.agents.stop()
+        if self.daemon is not None:
+            self.daemon.close()
+
     def set_dark_palette(self):
         dark_palette = QPalette()
         dark_palette.setColor(QPalette.Window, QColor(53, 53, 53))
@@ -410,11 +917,25 @@ class MainWindow(QMainWindow):
 def main():
     import sys
     from PySide6.QtCore import QCoreApplication
-    QCoreApplication.setApplicationName("Python Commander")
-    app = QApplication(sys.argv)
-    set_app_icon(app)
-    window = MainWindow()
-    window.show()
+    
+    if PROFILE_FLAG in sys.argv:
+        sys.argv.remove(PROFILE_FLAG)
+        timeline.enabled = True
+    
+    with timeline.phase("create QApplication"):
+        QCoreApplication.setApplicationName("Python Commander")
+        app = QApplication(sys.argv)
+    
+    with timeline.phase("create main window"):
+        window = MainWindow()
+    
+    with timeline.phase("show window"):
+        window.show()
+        # Let the first expose/paint happen before anything else runs
+        app.processEvents()
+    timeline.mark("first paint")
+    
+    QTimer.singleShot(0, window.finish_startup)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -0,0 +1,216 @@
+"""
+File system monitoring for Python Commander
+Watches monitored paths with watchdog and reports coalesced, incremental
+changes instead of rescanning whole trees on an interval
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from .scanner import ChangeSet
+
+# Per-path change kinds, in the order they were first seen during a burst
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+
+def default_accept(path: str, is_dir: bool, root: Optional[str] = None) -> bool:
+    """Default event filter: Python files outside __pycache__ below root"""
+    if root is not None:
+        path = os.path.relpath(path, root)
+    if "__pycache__" in path.split(os.sep):
+        return False
+    return is_dir or path.endswith(".py")
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the monitor's pending set"""
+
+    def __init__(self, monitor: "ScriptMonitor"):
+        super().__init__()
+        self.monitor = monitor
+
+    def on_created(self, event):
+        self.monitor._record(event.src_path, event.is_directory, CREATED)
+
+    def on_modified(self, event):
+        # Directory modified events only mean "an entry changed"; the entry
+        # itself gets its own event
+        if not event.is_directory:
+            self.monitor._record(event.src_path, False, MODIFIED)
+
+    def on_deleted(self, event):
+        self.monitor._record(event.src_path, event.is_directory, DELETED)
+
+    def on_moved(self, event):
+        self.monitor._record(event.src_path, event.is_directory, DELETED)
+        self.monitor._record(event.dest_path, event.is_directory, CREATED)
+
+
+class ScriptMonitor:
+    """Watches monitored paths and emits debounced ChangeSets"""
+
+    def __init__(self, paths: Iterable[str], on_changes: Callable[[ChangeSet], None],
+                 debounce: float = 0.05, max_delay: float = 1.0,
+                 accept: Callable[[str, bool, Optional[str]], bool] = default_accept):
+        self.paths = self._normalize(paths)
+        self.on_changes = on_changes
+        self.debounce = debounce  # quiet period that ends a burst
+        self.max_delay = max_delay  # upper bound on latency during long bursts
+        # Called as accept(path, is_dir, root) with the monitored path the event is under
+        self.accept = accept
+
+        self._observer: Optional[Observer] = None
+        self._watches: Dict[str, object] = {}
+        self._handler = _EventHandler(self)
+
+        # path -> (is_dir, first change kind seen in this burst)
+        self._pending: Dict[str, tuple] = {}
+        self._burst_started = 0.0
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._running = False
+        self._flush_thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _normalize(paths: Iterable[str]) -> List[str]:
+        """Expand and de-duplicate monitored paths"""
+        result = []
+        for path in paths:
+            path = os.path.abspath(os.path.expanduser(path))
+            if path not in result:
+                result.append(path)
+        return result
+
+    def start(self):
+        """Start watching all monitored paths"""
+        if self._running:
+            return
+
+        self._running = True
+        self._observer = Observer()
+        for path in self.paths:
+            self._schedule(path)
+        self._observer.start()
+
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="ScriptMonitor",
+                                              daemon=True)
+        self._flush_thread.start()
+
+    def stop(self):
+        """Stop watching and deliver any pending changes"""
+        if not self._running:
+            return
+
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+        self._observer.stop()
+        self._observer.join()
+        self._observer = None
+        self._watches.clear()
+        self._flush_thread.join()
+        self._flush_thread = None
+        self._flush()
+
+    def set_paths(self, paths: Iterable[str]):
+        """Update the set of monitored paths, (un)subscribing as needed"""
+        new_paths = self._normalize(paths)
+
+        if self._observer is not None:
+            for path in self.paths:
+                if path not in new_paths and path in self._watches:
+                    self._observer.unschedule(self._watches.pop(path))
+            for path in new_paths:
+                if path not in self._watches:
+                    self._schedule(path)
+
+        self.paths = new_paths
+
+    def _schedule(self, path: str):
+        """Subscribe to a single monitored path"""
+        if not os.path.isdir(path):
+            print(f"Not monitoring missing path: {path}")
+            return
+
+        try:
+            self._watches[path] = self._observer.schedule(self._handler, path, recursive=True)
+        except OSError as e:
+            print(f"Could not monitor {path}: {e}")
+
+    def _record(self, path: str, is_dir: bool, kind: str):
+        """Add an event to the pending burst"""
+        roots = [root for root in self.paths if path == root or path.startswith(root + os.sep)]
+        if not self.accept(path, is_dir, max(roots, key=len) if roots else None):
+            return
+
+        now = time.monotonic()
+        with self._cond:
+            if not self._pending:
+                self._burst_started = now
+            # Keep the first kind; the final state is read from disk at flush
+            self._pending.setdefault(path, (is_dir, kind))
+            self._last_event = now
+            self._cond.notify()
+
+    def _flush_loop(self):
+        """Deliver a ChangeSet once a burst goes quiet (or runs too long)"""
+        with self._cond:
+            while self._running:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+
+                now = time.monotonic()
+                quiet_at = self._last_event + self.debounce
+                deadline = self._burst_started + self.max_delay
+                due = min(quiet_at, deadline)
+                if now < due:
+                    self._cond.wait(due - now)
+                    continue
+
+                self._cond.release()
+                try:
+                    self._flush()
+                finally:
+                    self._cond.acquire()
+
+    def _flush(self):
+        """Resolve pending events against the file system and emit them"""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return
+
+        changes = ChangeSet()
+        for path, (is_dir, kind) in pending.items():
+            exists = os.path.isdir(path) if is_dir else os.path.isfile(path)
+
+            if is_dir:
+                if exists and kind == CREATED:
+                    changes.added_dirs.add(path)
+                elif not exists:
+                    changes.removed_dirs.add(path)
+            elif not exists:
+                # Created-then-deleted files were never seen by anyone
+                if kind != CREATED:
+                    changes.removed.add(path)
+            elif kind == CREATED:
+                changes.added.add(path)
+            else:
+                # Modified, or deleted and recreated (atomic saves)
+                changes.updated.add(path)
+
+        if changes:
+            try:
+                self.on_changes(changes)
+            except Exception as e:
+                print(f"Error handling file changes: {e}")
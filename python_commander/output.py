@@ -0,0 +1,234 @@
+"""
+Run output storage for Python Commander
+Keeps the most recent lines of a run in a fixed-size ring buffer and spills
+the full output to a memory-mapped log file once it outgrows memory
+"""
+
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+# One marker byte per stored line records which stream it came from
+_MARKERS = {STDOUT: b"O", STDERR: b"E"}
+_STREAMS = {ord("O"): STDOUT, ord("E"): STDERR}
+
+# Every Nth line's file offset is kept; lines in between are found by scanning
+CHECKPOINT_INTERVAL = 64
+
+# A lone \r ends a line too, so progress bars redrawn in place add lines
+# instead of one ever-growing unterminated one
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+# Unterminated output longer than this (characters) is stored as a line of its own
+MAX_PARTIAL = 64 * 1024
+
+
+class OutputBuffer:
+    """Line-oriented store for one run's output with bounded memory use"""
+
+    def __init__(self, log_path, ring_lines: int = 5000, spill_bytes: int = 4 * 1024 * 1024):
+        self.log_path = Path(log_path)
+        self.ring_lines = ring_lines
+        self.spill_bytes = spill_bytes
+
+        self._ring: deque = deque(maxlen=ring_lines)
+        self._ring_bytes = 0
+        # Pieces of each stream's unterminated last line, and their total length
+        self._partial = {STDOUT: [], STDERR: []}
+        self._partial_size = {STDOUT: 0, STDERR: 0}
+        # Whether a stream's last chunk ended in \r, whose \n may start the next one
+        self._after_cr = {STDOUT: False, STDERR: False}
+        self._count = 0
+        self._lock = threading.RLock()
+
+        # Set once the output has spilled to disk
+        self._file = None
+        self._file_size = 0
+        self._file_lines = 0
+        self._checkpoints = array("Q")
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+        self._unflushed = False
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def __len__(self):
+        return self._count
+
+    def append(self, stream: str, text: str) -> int:
+        """Add a chunk of output; returns the number of completed lines
+
+        Only the new chunk is searched for line breaks; the unterminated
+        rest is kept as pieces and joined once its line ends.
+        """
+        with self._lock:
+            if self._after_cr[stream] and text.startswith("\n"):
+                text = text[1:]
+            if not text:
+                return 0
+            self._after_cr[stream] = text.endswith("\r")
+
+            pieces = _LINE_BREAK.split(text)
+            partial = self._partial[stream]
+            lines = []
+            if len(pieces) > 1:
+                partial.append(pieces[0])
+                lines.append("".join(partial))
+                lines.extend(pieces[1:-1])
+                partial.clear()
+                self._partial_size[stream] = 0
+            if pieces[-1]:
+                partial.append(pieces[-1])
+                self._partial_size[stream] += len(pieces[-1])
+                if self._partial_size[stream] > MAX_PARTIAL:
+                    lines.append("".join(partial))
+                    partial.clear()
+                    self._partial_size[stream] = 0
+
+            if self._file is not None:
+                # Already on disk: encode and write the whole chunk at once
+                self._write_lines(stream, lines)
+            else:
+                for line in lines:
+                    self._add_line(stream, line)
+            return len(lines)
+
+    def finish(self) -> int:
+        """Flush unterminated last lines once the run has ended"""
+        with self._lock:
+            added = 0
+            for stream, partial in self._partial.items():
+                if partial:
+                    self._add_line(stream, "".join(partial))
+                    partial.clear()
+                    self._partial_size[stream] = 0
+                    added += 1
+            if self._file is not None:
+                self._file.flush()
+            return added
+
+    def _add_line(self, stream: str, line: str):
+        if self._file is None and (len(self._ring) == self.ring_lines
+                                   or self._ring_bytes + len(line) > self.spill_bytes):
+            self._spill()
+
+        if self._file is not None:
+            self._write_lines(stream, [line])
+            return
+
+        self._ring_bytes += len(line)
+        self._ring.append((stream, line))
+        self._count += 1
+
+    def _spill(self):
+        """Start the log file, writing everything held in memory so far"""
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.log_path, "wb")
+        for stream, line in self._ring:
+            self._write(stream, [line])
+        self._ring_bytes = 0
+
+    def _write_lines(self, stream: str, lines: List[str]):
+        """Append lines to the log file and the ring"""
+        self._write(stream, lines)
+        self._ring.extend((stream, line) for line in lines)
+        self._count += len(lines)
+
+    def _write(self, stream: str, lines: List[str]):
+        """Append lines to the log file only"""
+        marker = _MARKERS[stream]
+        encoded = [marker + line.encode("utf-8", "replace") + b"\n" for line in lines]
+        size = self._file_size
+        number = self._file_lines
+        for data in encoded:
+            if number % CHECKPOINT_INTERVAL == 0:
+                self._checkpoints.append(size)
+            size += len(data)
+            number += 1
+        self._file.write(b"".join(encoded))
+        self._file_size = size
+        self._file_lines = number
+        self._unflushed = True
+
+    def _map(self) -> mmap.mmap:
+        """Return a mapping covering everything written so far"""
+        if self._unflushed:
+            self._file.flush()
+            self._unflushed = False
+        if self._mmap is None or self._mapped_size < self._file_size:
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.log_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), self._file_size, access=mmap.ACCESS_READ)
+            self._mapped_size = self._file_size
+        return self._mmap
+
+    def line(self, index: int) -> Tuple[str, str]:
+        """Return (stream, text) for a line"""
+        with self._lock:
+            if index < 0 or index >= self._count:
+                raise IndexError(index)
+
+            ring_start = self._count - len(self._ring)
+            if index >= ring_start:
+                return self._ring[index - ring_start]
+
+            return self._read_file(index, 1)[0]
+
+    def _read_file(self, index: int, count: int) -> List[Tuple[str, str]]:
+        """Read consecutive lines from the log file via the mapping"""
+        data = self._map()
+        checkpoint, skip = divmod(index, CHECKPOINT_INTERVAL)
+        start = self._checkpoints[checkpoint]
+        for _ in range(skip):
+            start = data.find(b"\n", start) + 1
+
+        result = []
+        for _ in range(count):
+            end = data.find(b"\n", start)
+            result.append((_STREAMS.get(data[start], STDOUT),
+                           data[start + 1:end].decode("utf-8", "replace")))
+            start = end + 1
+        return result
+
+    def lines(self, start: int, count: int) -> List[Tuple[str, str]]:
+        """Return up to count consecutive lines starting at start"""
+        with self._lock:
+            start = max(0, start)
+            end = min(self._count, start + count)
+            ring_start = self._count - len(self._ring)
+            result = []
+            if start < ring_start:
+                result = self._read_file(start, min(end, ring_start) - start)
+                start = ring_start
+            result.extend(self._ring[index - ring_start] for index in range(start, end))
+            return result
+
+    def tail(self, count: int) -> List[Tuple[str, str]]:
+        """Return the last count lines"""
+        return self.lines(self._count - count, count)
+
+    def close(self, delete: bool = True):
+        """Release the mapping and log file"""
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                if delete:
+                    try:
+                        os.remove(self.log_path)
+                    except OSError:
+                        pass
@@ -0,0 +1,203 @@
+"""
+Script metadata parser for Python Commander
+Statically extracts the title, description and arguments that scripts declare,
+without importing or executing them
+"""
+
+import ast
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from .records import ScriptRecord
+
+# Module-level names read from scripts (see script-template.py)
+METADATA_FIELDS = ("title", "description", "arguments", "cache", "cache_inputs", "limits",
+                   "requires")
+
+# Resource limits a script may declare, e.g. limits = {"memory_mb": 512, "timeout": 600}
+LIMIT_FIELDS = ("memory_mb", "cpu_seconds", "timeout")
+
+# Bump when the shape of cached metadata changes
+CACHE_VERSION = 5
+
+
+def hash_source(data: bytes) -> str:
+    """Return the content hash used to key cached metadata"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def extract_metadata(source, filename: str = "<script>") -> Dict[str, Any]:
+    """Extract script metadata from source text or bytes using the AST"""
+    metadata = {
+        "title": None,
+        "description": "",
+        "arguments": [],
+        "cache": False,
+        "cache_inputs": [],
+        "limits": {},
+        "requires": [],
+        "imports": [],
+        "has_main": False,
+        "error": None,
+    }
+
+    try:
+        tree = ast.parse(source, filename=filename)
+    except (SyntaxError, ValueError) as e:
+        metadata["error"] = f"{type(e).__name__}: {e}"
+        return metadata
+
+    # Only top-level statements count; nothing below is evaluated
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "main":
+            metadata["has_main"] = True
+            continue
+
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets = [node.target]
+        else:
+            continue
+
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in METADATA_FIELDS:
+                try:
+                    metadata[target.id] = ast.literal_eval(node.value)
+                except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+                    # Computed values can't be read without running the script
+                    pass
+
+    # Top-level packages imported anywhere, for dependency detection
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name.partition(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imports.add(node.module.partition(".")[0])
+    metadata["imports"] = sorted(imports)
+
+    if isinstance(metadata["description"], str):
+        metadata["description"] = metadata["description"].strip()
+    else:
+        metadata["description"] = ""
+
+    if not isinstance(metadata["title"], str):
+        metadata["title"] = None
+
+    if not isinstance(metadata["arguments"], (list, tuple)):
+        metadata["arguments"] = []
+    metadata["arguments"] = [arg for arg in metadata["arguments"]
+                             if isinstance(arg, dict) and "name" in arg]
+
+    # Results are only memoized when a script asks for it explicitly
+    metadata["cache"] = metadata["cache"] is True
+    if not isinstance(metadata["cache_inputs"], (list, tuple)):
+        metadata["cache_inputs"] = []
+    metadata["cache_inputs"] = [item for item in metadata["cache_inputs"] if isinstance(item, str)]
+
+    limits = metadata["limits"] if isinstance(metadata["limits"], dict) else {}
+    metadata["limits"] = {name: value for name, value in limits.items()
+                          if name in LIMIT_FIELDS and isinstance(value, (int, float))
+                          and not isinstance(value, bool) and value > 0}
+
+    # Requirement specifiers, e.g. requires = ["requests>=2.28", "numpy==1.26.*"]
+    if not isinstance(metadata["requires"], (list, tuple)):
+        metadata["requires"] = []
+    metadata["requires"] = [item.strip() for item in metadata["requires"]
+                            if isinstance(item, str) and item.strip()]
+
+    return metadata
+
+
+class ScriptParser:
+    """Parses script metadata, backed by a persistent content-hash cache"""
+
+    def __init__(self, cache_path: Optional[Path] = None):
+        self.cache_path = Path(cache_path) if cache_path else None
+        # path -> (mtime_ns, size, hash, record)
+        self._entries: Dict[str, Tuple[int, int, str, ScriptRecord]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load_cache()
+
+    def _load_cache(self):
+        """Load cached metadata from disk"""
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                for path, (mtime, size, digest, row) in data.get("entries", {}).items():
+                    record = ScriptRecord.from_row(path, row)
+                    self._entries[path] = (mtime, size, digest, record)
+        except Exception as e:
+            print(f"Error loading script cache: {e}")
+
+    def save(self):
+        """Write the cache to disk if anything changed since the last save"""
+        if self.cache_path is None:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = {path: [mtime, size, digest, record.to_row()]
+                       for path, (mtime, size, digest, record) in self._entries.items()}
+            self._dirty = False
+        data = {"version": CACHE_VERSION, "entries": entries}
+
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"Error saving script cache: {e}")
+
+    def parse(self, path) -> ScriptRecord:
+        """Return the record for a script, re-parsing only if its content changed"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+        # Fast path: unchanged mtime and size means an unchanged file
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[3]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hash_source(data)
+
+        if entry and entry[2] == digest:
+            # Touched but not edited; refresh the stat key only
+            record = entry[3]
+        else:
+            record = ScriptRecord.from_metadata(path, extract_metadata(data, filename=path))
+
+        with self._lock:
+            self._entries[path] = (st.st_mtime_ns, st.st_size, digest, record)
+            self._dirty = True
+
+        return record
+
+    def get_hash(self, path) -> Optional[str]:
+        """Return the cached content hash for a script, if known"""
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(path))
+        return entry[2] if entry else None
+
+    def forget(self, path):
+        """Drop a script from the cache"""
+        with self._lock:
+            if self._entries.pop(os.path.abspath(path), None) is not None:
+                self._dirty = True
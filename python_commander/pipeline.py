@@ -0,0 +1,134 @@
+"""
+Script pipelines for Python Commander
+Chains scripts so each stage's stdout streams into the next stage's stdin
+through OS pipes, the way a shell pipeline does
+"""
+
+import shlex
+import signal
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .execution import CANCELLED, EVENT_FINISHED, FAILED, FINISHED
+
+# Exit code of a stage killed because the stage after it stopped reading
+_SIGPIPE_EXIT = -getattr(signal, "SIGPIPE", 13)
+
+
+def parse_stage(text: str) -> Tuple[str, Dict[str, str]]:
+    """Split "script key=value ..." into the script and its raw argument values"""
+    parts = shlex.split(text)
+    if not parts:
+        raise ValueError("Empty pipeline stage")
+    values = {}
+    for item in parts[1:]:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            raise ValueError(f"Expected KEY=VALUE in stage '{text}', got '{item}'")
+        values[key] = value
+    return parts[0], values
+
+
+def stages_to_config(stages: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Serializable form of a pipeline's stages, as kept in the config"""
+    return [{"script": script_path, "arguments": arguments} for script_path, arguments in stages]
+
+
+def stages_from_config(items: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    return [(item["script"], dict(item.get("arguments") or {})) for item in items]
+
+
+def stage_succeeded(run, last: bool) -> bool:
+    """Whether a stage ran cleanly
+
+    An earlier stage killed by SIGPIPE only wrote more than a later stage
+    wanted to read, as with `yes | head`, so it does not count as a failure.
+    """
+    if run.status != FINISHED:
+        return False
+    return run.returncode == 0 or (not last and run.returncode == _SIGPIPE_EXIT)
+
+
+class Pipeline:
+    """Scripts submitted to an ExecutionEngine as one pipeline
+
+    Progress is tracked from engine events, so done is set from the
+    engine's I/O thread.
+    """
+
+    def __init__(self, engine, stages: List[Tuple[str, Dict[str, Any]]],
+                 limits: Optional[Dict[str, Any]] = None, stdin: Optional[int] = None,
+                 stdout: Optional[int] = None):
+        self.engine = engine
+        self.stages = list(stages)
+        self.limits = limits
+        self.stdin = stdin
+        self.stdout = stdout
+        self.runs: List = []
+        self.done = threading.Event()
+        self._remaining = len(self.stages)
+        # Stages may finish before submit_pipeline() returns, e.g. if they can't start
+        self._early: List = []
+        self._lock = threading.Lock()
+
+    def start(self) -> List:
+        """Submit every stage; returns the stages' runs in order"""
+        self.engine.add_listener(self._on_event)
+        try:
+            runs = self.engine.submit_pipeline(self.stages, limits=self.limits,
+                                               stdin=self.stdin, stdout=self.stdout)
+        except Exception:
+            self.engine.remove_listener(self._on_event)
+            raise
+        with self._lock:
+            self.runs = runs
+            self._remaining -= sum(1 for run in self._early if run.pipeline is runs)
+            self._early = []
+        self._check_done()
+        return self.runs
+
+    def _on_event(self, run, event, data):
+        if event != EVENT_FINISHED or run.pipeline is None:
+            return
+        with self._lock:
+            if not self.runs:
+                self._early.append(run)
+                return
+            if run.pipeline is not self.runs:
+                return
+            self._remaining -= 1
+        self._check_done()
+
+    def _check_done(self):
+        with self._lock:
+            if self.done.is_set() or not self.runs or self._remaining > 0:
+                return
+            self.done.set()
+        self.engine.remove_listener(self._on_event)
+
+    def cancel(self):
+        """Stop every stage"""
+        for run in self.runs:
+            if not run.done.is_set():
+                self.engine.cancel(run.id)
+
+    @property
+    def failed_stage(self):
+        """The first stage that did not succeed, if any"""
+        for index, run in enumerate(self.runs):
+            if not stage_succeeded(run, index == len(self.runs) - 1):
+                return run
+        return None
+
+    @property
+    def status(self) -> str:
+        if any(run.status == CANCELLED for run in self.runs):
+            return CANCELLED
+        return FAILED if self.failed_stage is not None else FINISHED
+
+    @property
+    def returncode(self) -> Optional[int]:
+        """Exit code of the first failing stage, else of the last stage"""
+        failed = self.failed_stage
+        run = failed if failed is not None else (self.runs[-1] if self.runs else None)
+        return run.returncode if run is not None else None
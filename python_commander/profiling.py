@@ -0,0 +1,158 @@
+"""
+Profiling for Python Commander
+Stores the cProfile and tracemalloc results of profiled runs and turns them
+into hotspot tables and collapsed stacks for a flame graph
+"""
+
+import json
+import os
+import pstats
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+STATS_SUFFIX = ".pstats"
+MEMORY_SUFFIX = ".memory.json"
+
+# Collapsed stacks deeper than this are cut off
+MAX_STACK_DEPTH = 64
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class Hotspot:
+    """Time spent in one function across a profiled run"""
+
+    __slots__ = ("name", "file", "line", "calls", "primitive_calls", "own_time", "total_time")
+
+    def __init__(self, name: str, file: str, line: int, calls: int, primitive_calls: int,
+                 own_time: float, total_time: float):
+        self.name = name
+        self.file = file
+        self.line = line
+        self.calls = calls
+        self.primitive_calls = primitive_calls
+        self.own_time = own_time
+        self.total_time = total_time
+
+    @property
+    def location(self) -> str:
+        """file:line, or "" for built-in functions"""
+        return f"{self.file}:{self.line}" if self.file != "~" else ""
+
+    @property
+    def per_call(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+def function_label(function: Tuple[str, int, str]) -> str:
+    """Short display name for a pstats function key"""
+    file, line, name = function
+    if file == "~":
+        # Built-ins are recorded as ('~', 0, "<built-in method ...>")
+        return name
+    return f"{name} ({os.path.basename(file)}:{line})"
+
+
+def load_hotspots(stats_path) -> List[Hotspot]:
+    """Every profiled function, slowest own time first"""
+    stats = pstats.Stats(str(stats_path)).stats
+    hotspots = [Hotspot(name, file, line, calls, primitive_calls, own_time, total_time)
+                for (file, line, name), (primitive_calls, calls, own_time, total_time, _)
+                in stats.items()]
+    hotspots.sort(key=lambda hotspot: hotspot.own_time, reverse=True)
+    return hotspots
+
+
+def collapsed_stacks(stats_path, min_fraction: float = 0.001) -> Dict[str, float]:
+    """Approximate call stacks, as "outer;...;inner" -> own seconds
+
+    cProfile only records caller/callee pairs, so a function's time is
+    split between the paths leading to it in proportion to the time each
+    caller spent in it. Paths below min_fraction of the total are dropped.
+    """
+    stats = pstats.Stats(str(stats_path)).stats
+    callees: Dict[Any, Dict[Any, float]] = {}
+    roots = []
+    for function, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            roots.append(function)
+        for caller, (_, _, _, caller_total) in callers.items():
+            callees.setdefault(caller, {})[function] = caller_total
+
+    total = sum(stats[root][3] for root in roots)
+    threshold = total * min_fraction
+    labels = {function: function_label(function).replace(";", ",") for function in stats}
+    stacks: Dict[str, float] = {}
+
+    def walk(function, path: List[Any], time_here: float):
+        function_total = stats[function][3]
+        share = time_here / function_total if function_total else 0.0
+        path.append(function)
+        key = ";".join(labels[item] for item in path)
+        own = stats[function][2] * share
+        if own > 0:
+            stacks[key] = stacks.get(key, 0.0) + own
+        if len(path) < MAX_STACK_DEPTH:
+            for callee, callee_time in callees.get(function, {}).items():
+                # Recursion is folded into the outermost call
+                if callee in path:
+                    continue
+                callee_time *= share
+                if callee_time >= threshold:
+                    walk(callee, path, callee_time)
+        path.pop()
+
+    for root in roots:
+        if stats[root][3] >= threshold:
+            walk(root, [], stats[root][3])
+    return stacks
+
+
+def load_allocations(memory_path) -> Optional[Dict[str, Any]]:
+    """Allocation sites saved by a memory-traced run, or None if there are none"""
+    try:
+        with open(memory_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ProfileStore:
+    """Directory of saved profiles, pruned to the most recent ones"""
+
+    def __init__(self, directory, keep: int = 100):
+        self.directory = Path(directory)
+        self.keep = keep
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config) -> "ProfileStore":
+        return cls(config.profiles_path, keep=config.get("settings.profiles_kept", 100))
+
+    def allocate(self, script_path: str, memory: bool = False) -> Dict[str, str]:
+        """Output paths for a new profiled run, as passed to ExecutionEngine.submit()"""
+        self.prune()
+        stem = _UNSAFE_CHARS.sub("_", os.path.splitext(os.path.basename(script_path))[0])
+        base = str(self.directory / f"{time.time_ns()}-{stem}")
+        profile = {"stats": base + STATS_SUFFIX}
+        if memory:
+            profile["memory"] = base + MEMORY_SUFFIX
+        return profile
+
+    def memory_path(self, stats_path) -> Optional[str]:
+        """The allocation file saved alongside a stats file, if there is one"""
+        path = str(stats_path)[:-len(STATS_SUFFIX)] + MEMORY_SUFFIX
+        return path if os.path.exists(path) else None
+
+    def prune(self):
+        """Delete all but the newest profiles"""
+        profiles = sorted(self.directory.glob("*" + STATS_SUFFIX), key=lambda path: path.name)
+        for stats_path in profiles[:max(0, len(profiles) - self.keep + 1)]:
+            for path in (stats_path, stats_path.with_name(stats_path.name[:-len(STATS_SUFFIX)]
+                                                          + MEMORY_SUFFIX)):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
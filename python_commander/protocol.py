@@ -0,0 +1,84 @@
+"""
+Wire protocol for Python Commander's background daemon
+Length-prefixed JSON frames, plus the plain forms that runs, scripts and
+samples take on the wire
+
+Client -> daemon: {"id": n, "op": "...", ...params}
+Daemon -> client: {"id": n, "result": ...} or {"id": n, "error": "..."},
+                  and for subscribed topics {"event": "run" | "catalog" | "sample", ...}
+"""
+
+import json
+import struct
+from typing import Any, Dict, List, Optional
+
+_HEADER = struct.Struct("!I")
+
+# Frames larger than this are treated as a corrupt stream
+MAX_FRAME = 512 * 1024 * 1024
+
+
+def send_frame(sock, message: Dict[str, Any]):
+    """Send a length-prefixed JSON frame"""
+    data = json.dumps(message, separators=(",", ":"), default=str).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def read_frame(stream) -> Optional[Dict[str, Any]]:
+    """Read one frame from a buffered binary stream, or None at EOF"""
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    size = _HEADER.unpack(header)[0]
+    if size > MAX_FRAME:
+        raise ValueError(f"Frame of {size} bytes is too large")
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return json.loads(data)
+
+
+def run_to_dict(run, engine: str) -> Dict[str, Any]:
+    """The state of a Run, as sent with run events"""
+    return {
+        "id": run.id,
+        "engine": engine,
+        "script": run.script_path,
+        "arguments": run.arguments,
+        "status": run.status,
+        "returncode": run.returncode,
+        "pid": run.pid,
+        "queued_at": run.queued_at,
+        "started_at": run.started_at,
+        "ended_at": run.ended_at,
+        "error": run.error,
+        "cached": run.cached,
+        "rusage": run.rusage,
+        "limits": run.limits,
+        "profile": run.profile,
+        "host": run.host,
+        "pipeline": [stage.id for stage in run.pipeline] if run.pipeline else None,
+    }
+
+
+def record_to_item(record) -> List[Any]:
+    """A ScriptRecord as [path, root, row]"""
+    return [record.path, record.root, record.to_row()]
+
+
+def record_from_item(item: List[Any]):
+    from .records import ScriptRecord
+    path, root, row = item
+    record = ScriptRecord.from_row(path, row)
+    if root is not None:
+        record.set_root(root)
+    return record
+
+
+def sample_to_list(sample) -> List[Any]:
+    return [getattr(sample, name) for name in sample.__slots__]
+
+
+def sample_from_list(values: List[Any]):
+    from .sampler import Sample
+    return Sample(*values)
@@ -0,0 +1,118 @@
+"""
+Script records for Python Commander
+A compact, slotted representation of one catalog script, small enough to
+hold hundreds of thousands of them in a long-running process
+"""
+
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ScriptRecord:
+    """Metadata for one script
+
+    Each path is kept as an interned directory plus the file name, so every
+    script in a directory shares that directory's string, and every script
+    under a root shares the root's. Argument schemas are kept as their compact
+    JSON text and only decoded when asked for.
+    """
+
+    __slots__ = ("_dir", "name", "root", "_title", "description", "has_main", "error", "_arguments",
+                 "cache", "cache_inputs", "limits", "requires", "imports")
+
+    def __init__(self, path: str, title: Optional[str] = None, description: str = "",
+                 has_main: bool = False, error: Optional[str] = None, arguments: str = "",
+                 cache: bool = False, cache_inputs: Tuple[str, ...] = (),
+                 limits: Optional[Dict[str, float]] = None, requires: Tuple[str, ...] = (),
+                 imports: Tuple[str, ...] = ()):
+        # The directory keeps its trailing separator, so joining is exact
+        split = path.rfind(os.sep) + 1
+        self._dir = sys.intern(path[:split])
+        self.name = path[split:]
+        self.root: Optional[str] = None
+        self._title = title or None
+        self.description = description
+        self.has_main = has_main
+        self.error = error
+        # JSON text of the argument schemas, "" for none
+        self._arguments = arguments
+        # Result memoization opt-in and the input files that feed the cache key
+        self.cache = cache
+        self.cache_inputs = tuple(cache_inputs)
+        # Declared resource limits, None when the script sets none
+        self.limits = limits or None
+        # Declared requirement specifiers and the top-level packages the script imports
+        self.requires = tuple(requires)
+        self.imports = tuple(sys.intern(name) for name in imports)
+
+    @classmethod
+    def from_metadata(cls, path: str, metadata: Dict[str, Any]) -> "ScriptRecord":
+        """Build a record from extract_metadata() output
+
+        Argument defaults are literals, some of which (sets, bytes, complex
+        numbers) have no JSON form; such a script keeps no arguments and
+        records the error instead.
+        """
+        error = metadata.get("error")
+        try:
+            arguments = json.dumps(metadata["arguments"], separators=(",", ":")) \
+                if metadata.get("arguments") else ""
+        except (TypeError, ValueError) as e:
+            arguments = ""
+            error = error or f"Unsupported argument schema: {e}"
+        return cls(path,
+                   title=metadata.get("title"),
+                   description=metadata.get("description") or "",
+                   has_main=bool(metadata.get("has_main")),
+                   error=error,
+                   arguments=arguments,
+                   cache=bool(metadata.get("cache")),
+                   cache_inputs=metadata.get("cache_inputs") or (),
+                   limits=metadata.get("limits"),
+                   requires=metadata.get("requires") or (),
+                   imports=metadata.get("imports") or ())
+
+    @classmethod
+    def from_row(cls, path: str, row: List[Any]) -> "ScriptRecord":
+        """Build a record from the list written by to_row()"""
+        (title, description, has_main, error, arguments, cache, cache_inputs, limits,
+         requires, imports) = row
+        return cls(path, title, description, has_main, error, arguments, cache, cache_inputs, limits,
+                   requires, imports)
+
+    def to_row(self) -> List[Any]:
+        """Serializable form, used by the parser's cache file"""
+        return [self._title, self.description, self.has_main, self.error, self._arguments,
+                self.cache, list(self.cache_inputs), self.limits, list(self.requires),
+                list(self.imports)]
+
+    def set_root(self, root: str):
+        self.root = sys.intern(root)
+
+    @property
+    def path(self) -> str:
+        """Full path, joined on each access"""
+        return self._dir + self.name
+
+    @property
+    def dir(self) -> str:
+        return os.path.dirname(self._dir)
+
+    @property
+    def title(self) -> str:
+        """Declared title, or the file name without extension"""
+        return self._title or os.path.splitext(self.name)[0]
+
+    @property
+    def arguments(self) -> List[Dict[str, Any]]:
+        """Argument schemas, decoded fresh on each access"""
+        return json.loads(self._arguments) if self._arguments else []
+
+    @property
+    def has_arguments(self) -> bool:
+        return bool(self._arguments)
+
+    def __repr__(self):
+        return f"ScriptRecord({self.path!r})"
@@ -0,0 +1,335 @@
+"""
+Remote execution for Python Commander
+Connects the execution engine to worker agents (see agent.py) on other
+machines. Runs placed on an agent look to the engine like local processes:
+their output arrives on local pipes written by the connection's reader
+thread, so the engine's I/O thread handles them like any other run.
+"""
+
+import base64
+import os
+import signal
+import socket
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .agent import DEFAULT_PORT, PROTOCOL_VERSION, content_hash, hello_proof
+from .protocol import read_frame, send_frame
+
+# Seconds between attempts to reach agents that are down
+RECONNECT_DELAY = 10.0
+
+CONNECT_TIMEOUT = 5.0
+
+# Agents with less memory available than this get no new runs
+MIN_MEMORY_MB = 256
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Split "host:port" (port optional, IPv6 in brackets)"""
+    host, _, port = address.rpartition(":")
+    if not host or "]" in port:
+        return address.strip("[]"), DEFAULT_PORT
+    return host.strip("[]"), int(port)
+
+
+class RemoteProcess:
+    """Popen-like handle for a run on an agent"""
+
+    def __init__(self, agent: "RemoteAgent", run_id: int, source: bytes):
+        self.agent = agent
+        self.run_id = run_id
+        # Kept until the agent has started the run, in case it asks for the script
+        self.source: Optional[bytes] = source
+        stdout_r, self._stdout_w = os.pipe()
+        stderr_r, self._stderr_w = os.pipe()
+        self.stdout = os.fdopen(stdout_r, "rb", buffering=0)
+        self.stderr = os.fdopen(stderr_r, "rb", buffering=0)
+        # The remote pid means nothing here; the sampler skips runs without one
+        self.pid: Optional[int] = None
+        self.remote_pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.rusage: Optional[Dict[str, float]] = None
+        self.error: Optional[str] = None
+        # Called from the connection's reader thread once the run has exited
+        self.on_exit = None
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def send_signal(self, sig):
+        name = "KILL" if sig == getattr(signal, "SIGKILL", None) else "TERM"
+        try:
+            self.agent.send({"op": "signal", "id": self.run_id, "signal": name})
+        except OSError:
+            pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(getattr(signal, "SIGKILL", signal.SIGTERM))
+
+    def _write(self, stream: str, text: str):
+        fd = self._stdout_w if stream == "stdout" else self._stderr_w
+        if fd is None:
+            return
+        try:
+            os.write(fd, text.encode("utf-8"))
+        except OSError:
+            pass
+
+    def _exit(self, returncode: Optional[int], rusage=None, error: Optional[str] = None):
+        """Record the exit and close the pipes, so the engine reaps the run"""
+        if self._stdout_w is None:
+            return
+        self.returncode = returncode if returncode is not None else -1
+        self.rusage = rusage
+        self.error = error
+        self.source = None
+        for fd in (self._stdout_w, self._stderr_w):
+            os.close(fd)
+        self._stdout_w = self._stderr_w = None
+        if self.on_exit is not None:
+            self.on_exit()
+
+
+class RemoteAgent:
+    """A connection to one agent, with the load it last reported"""
+
+    def __init__(self, address: str, token: str = ""):
+        self.address = address
+        self.token = token
+        self.status: Dict[str, Any] = {}
+        self.connected = False
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # Runs on the agent by run id, including ones placed but not yet sent
+        self._runs: Dict[int, Optional[RemoteProcess]] = {}
+
+    @property
+    def active(self) -> int:
+        return len(self._runs)
+
+    def connect(self):
+        """Connect and complete the hello; raises OSError if the agent is unreachable or refuses"""
+        host, port = parse_address(self.address)
+        sock = socket.create_connection((host, port), timeout=CONNECT_TIMEOUT)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            stream = sock.makefile("rb")
+            hello = read_frame(stream)
+            if not hello or "hello" not in hello:
+                raise ConnectionError("not a Python Commander agent")
+            if hello["hello"].get("version") != PROTOCOL_VERSION:
+                raise ConnectionError(f"agent speaks protocol {hello['hello'].get('version')}")
+            send_frame(sock, {"op": "hello", "proof": hello_proof(self.token, hello["hello"]["nonce"])})
+            reply = read_frame(stream)
+            if not reply or "ready" not in reply:
+                raise ConnectionError((reply or {}).get("error", "agent closed the connection"))
+            sock.settimeout(None)
+        except (OSError, ValueError, KeyError):
+            sock.close()
+            raise
+        self.status = reply["ready"]
+        self._sock = sock
+        self.connected = True
+        threading.Thread(target=self._read_loop, args=(stream,), name=f"Agent-{self.address}",
+                         daemon=True).start()
+
+    def close(self):
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def send(self, message: Dict[str, Any]):
+        sock = self._sock
+        if sock is None or not self.connected:
+            raise ConnectionError(f"Not connected to agent {self.address}")
+        with self._send_lock:
+            send_frame(sock, message)
+
+    def headroom(self) -> float:
+        """Share of this agent's CPU and memory that is free, the scarcer of the two
+
+        Runs sent since the last status report count against the load.
+        """
+        cpus = self.status.get("cpus") or 1
+        busy = max(self.status.get("load") or 0.0, self.active)
+        cpu = max(0.0, cpus - busy) / cpus
+        available = self.status.get("memory_available_mb")
+        total = self.status.get("memory_total_mb")
+        memory = available / total if available is not None and total else 1.0
+        return min(cpu, memory)
+
+    def has_room(self) -> bool:
+        if not self.connected or self.active >= (self.status.get("slots") or 1):
+            return False
+        available = self.status.get("memory_available_mb")
+        return available is None or available >= MIN_MEMORY_MB
+
+    def reserve(self, run_id: int):
+        with self._lock:
+            self._runs[run_id] = None
+
+    def release(self, run_id: int):
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def start(self, run_id: int, script_path: str, arguments: Dict[str, Any],
+              limits: Optional[Dict[str, Any]] = None) -> RemoteProcess:
+        """Send a reserved run; the script itself follows only if the agent asks for it"""
+        try:
+            with open(script_path, 'rb') as f:
+                source = f.read()
+        except OSError:
+            self.release(run_id)
+            raise
+        handle = RemoteProcess(self, run_id, source)
+        with self._lock:
+            self._runs[run_id] = handle
+        try:
+            self.send({"op": "run", "id": run_id, "hash": content_hash(source),
+                       "name": os.path.basename(script_path), "arguments": arguments,
+                       "limits": limits or {}})
+        except OSError:
+            self.release(run_id)
+            handle.stdout.close()
+            handle.stderr.close()
+            handle._exit(None)
+            raise
+        return handle
+
+    def _read_loop(self, stream):
+        while True:
+            try:
+                message = read_frame(stream)
+            except (OSError, ValueError):
+                message = None
+            if message is None:
+                break
+            try:
+                self._handle(message)
+            except (OSError, KeyError) as e:
+                print(f"Error from agent {self.address}: {e}")
+
+        self.connected = False
+        stream.close()
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        with self._lock:
+            handles, self._runs = list(self._runs.values()), {}
+        if handles:
+            print(f"Lost connection to agent {self.address}")
+        for handle in handles:
+            if handle is not None:
+                handle._exit(None, error=f"Lost connection to agent {self.address}")
+
+    def _handle(self, message: Dict[str, Any]):
+        if "status" in message:
+            self.status = message["status"]
+            return
+        if "need" in message:
+            handle = self._runs.get(message["need"])
+            if handle is not None and handle.source is not None:
+                self.send({"op": "file", "hash": message["hash"],
+                           "data": base64.b64encode(handle.source).decode("ascii")})
+            return
+
+        for kind in ("started", "output", "exit"):
+            if kind in message:
+                handle = self._runs.get(message[kind])
+                break
+        else:
+            return
+        if handle is None:
+            return
+        if kind == "started":
+            handle.remote_pid = message.get("pid")
+            handle.source = None
+        elif kind == "output":
+            handle._write(message["stream"], message["text"])
+        else:
+            self.release(handle.run_id)
+            handle._exit(message.get("returncode"), message.get("rusage"), message.get("error"))
+
+
+class AgentPool:
+    """The agents runs may be placed on, reconnected in the background when they drop"""
+
+    def __init__(self, addresses: List[str], token: str = ""):
+        self.agents = [RemoteAgent(address, token) for address in addresses]
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Set once every agent has had its first connection attempt
+        self.ready = threading.Event()
+        # Called when an agent (re)connects, so engines can start queued runs on it
+        self._listeners: List[Callable[[], None]] = []
+
+    @classmethod
+    def from_config(cls, config) -> Optional["AgentPool"]:
+        """Create a pool from the agents setting, or None if there are none"""
+        addresses = [address for address in config.get("settings.agents", []) if address]
+        if not addresses:
+            return None
+        return cls(addresses, config.get("settings.agent_token", ""))
+
+    def add_listener(self, callback: Callable[[], None]):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._connect_loop, name="AgentPool", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        for agent in self.agents:
+            agent.close()
+
+    def _connect_loop(self):
+        while True:
+            connected = False
+            for agent in self.agents:
+                if agent.connected or self._stopped.is_set():
+                    continue
+                try:
+                    agent.connect()
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Could not connect to agent {agent.address}: {e}")
+                    continue
+                print(f"Connected to agent {agent.address}")
+                connected = True
+            self.ready.set()
+            if connected:
+                for callback in list(self._listeners):
+                    callback()
+            if self._stopped.wait(RECONNECT_DELAY):
+                return
+
+    def place(self, run_id: int) -> Optional[RemoteAgent]:
+        """Reserve a slot for a run on the agent with the most headroom, if any has room"""
+        with self._lock:
+            candidates = [agent for agent in self.agents if agent.has_room()]
+            if not candidates:
+                return None
+            agent = max(candidates, key=lambda agent: (agent.headroom(), -agent.active))
+            agent.reserve(run_id)
+            return agent
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Each agent's address, connection state and last reported status"""
+        return [dict(agent.status, address=agent.address, connected=agent.connected,
+                     placed=agent.active) for agent in self.agents]
+
@@ -0,0 +1,203 @@
+"""
+Result cache for Python Commander
+Memoizes the output and exit status of scripts that declare `cache = True`,
+keyed by script content, argument values and declared input files
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .parser import hash_source
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    script TEXT NOT NULL,
+    returncode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used);
+"""
+
+# Bump when the key recipe or stored format changes
+KEY_VERSION = 1
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_inputs(script_path: str, arguments: Dict[str, Any], inputs: Iterable[str]) -> List[str]:
+    """Turn cache_inputs entries into file paths
+
+    An entry naming an argument stands for the file(s) given as that
+    argument's value; anything else is a path relative to the script.
+    """
+    base = os.path.dirname(script_path)
+    paths = []
+    for item in inputs:
+        if item in arguments:
+            value = arguments[item]
+            values = value if isinstance(value, (list, tuple)) else [value]
+            paths.extend(str(v) for v in values if v is not None)
+        else:
+            paths.append(item)
+    return [os.path.join(base, os.path.expanduser(path)) for path in paths]
+
+
+class ResultCache:
+    """Size-bounded LRU of run results on disk
+
+    Results live in one compressed file per key; a small SQLite table tracks
+    sizes and last use for eviction.
+    """
+
+    def __init__(self, directory, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        # A single result may take at most this share of the cache
+        self.max_entry_bytes = max_bytes // 8
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.directory / "results.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config) -> Optional["ResultCache"]:
+        """Create the cache from settings, or None if it is disabled"""
+        size_mb = config.get("settings.result_cache_mb", 256)
+        if not size_mb:
+            return None
+        return cls(config.app_support_path / "results", max_bytes=int(size_mb * 1024 * 1024))
+
+    def key(self, script_path: str, arguments: Dict[str, Any], inputs: Iterable[str] = ()) -> str:
+        """Cache key for a run; raises OSError if the script can't be read"""
+        with open(script_path, 'rb') as f:
+            script_hash = hash_source(f.read())
+
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{KEY_VERSION}\0{script_hash}\0".encode())
+        digest.update(json.dumps(arguments, sort_keys=True, default=str).encode("utf-8"))
+        for path in resolve_inputs(script_path, arguments, inputs):
+            try:
+                input_hash = hash_file(path)
+            except OSError:
+                input_hash = "missing"
+            digest.update(f"\0{os.path.abspath(path)}\0{input_hash}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.zlib"
+
+    def get(self, key: str) -> Optional[Tuple[int, List[Tuple[str, str]]]]:
+        """Return (returncode, [(stream, text), ...]) for a cached run, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT returncode FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                output = json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            self.discard(key)
+            return None
+        return row[0], [(stream, text) for stream, text in output]
+
+    def put(self, key: str, script_path: str, returncode: int, output: List[Tuple[str, str]]):
+        """Store a run's result, evicting least recently used results to make room"""
+        data = zlib.compress(json.dumps(output, separators=(",", ":")).encode("utf-8"), 1)
+        if len(data) > self.max_entry_bytes:
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Error saving cached result: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, script_path, returncode, len(data), now, now))
+            self._db.commit()
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in self._db.execute("SELECT key, size FROM results ORDER BY last_used"):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            self._db.executemany("DELETE FROM results WHERE key = ?", [(key,) for key in victims])
+            self._db.commit()
+
+        for key in victims:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def discard(self, key: str):
+        """Forget one cached result"""
+        with self._lock:
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._db.commit()
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Forget every cached result"""
+        with self._lock:
+            keys = [row[0] for row in self._db.execute("SELECT key FROM results")]
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
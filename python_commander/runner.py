@@ -0,0 +1,282 @@
+"""
+Script runner for Python Commander
+Executed in the child process: loads a script, builds its arguments and
+calls its main(args). Kept free of package imports so it starts quickly.
+
+Usage: python runner.py <script_path> <json_arguments> [<json_options>]
+
+Options may hold "limits" (see apply_limits), "profile" (see call_main),
+"bytecode_dir" (see load_script) and "pipe_stdout", set when stdout feeds
+the next stage of a pipeline.
+"""
+
+import json
+import marshal
+import os
+import sys
+import traceback
+
+# Exit code for failures before main() is reached
+EXIT_LOAD_ERROR = 2
+
+# Frames kept per allocation traceback when tracing memory
+MEMORY_FRAMES = 10
+# Snapshot again once traced memory grows this much past the last snapshot
+PEAK_GROWTH = 1.25
+PEAK_MIN_BYTES = 1024 * 1024
+# Allocation sites saved from a memory trace
+MEMORY_SITES = 200
+
+
+class ScriptArgs(dict):
+    """Arguments passed to main(); supports both args["name"] and args.name"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def source_hash(source):
+    """The 8-byte source hash of hash-based .pyc files (PEP 552)"""
+    # importlib.util.source_hash, without importing importlib.util
+    import _imp
+    from importlib._bootstrap_external import _RAW_MAGIC_NUMBER
+    return _imp.source_hash(_RAW_MAGIC_NUMBER, source)
+
+
+def bytecode_file(bytecode_dir, script_path):
+    """A script's file in the central bytecode cache, one per path and interpreter"""
+    key = source_hash(os.fsencode(script_path)).hex()
+    return os.path.join(bytecode_dir, f"{key}.{sys.implementation.cache_tag}.pyc")
+
+
+def read_cached_code(bytecode_dir, script_path, source):
+    """The cached code object compiled from exactly this source, or None"""
+    try:
+        with open(bytecode_file(bytecode_dir, script_path), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    from importlib._bootstrap_external import MAGIC_NUMBER
+    # Magic number, flags, source hash, then the marshalled code
+    if data[:4] != MAGIC_NUMBER or data[8:16] != source_hash(source):
+        return None
+    try:
+        return marshal.loads(data[16:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def load_script(script_path, bytecode_dir=None):
+    """Compile and execute a script's top level, returning its namespace
+
+    With a bytecode_dir, code precompiled there from the same source is
+    used instead of compiling it again.
+    """
+    with open(script_path, 'rb') as f:
+        source = f.read()
+    code = read_cached_code(bytecode_dir, script_path, source) if bytecode_dir else None
+    if code is None:
+        code = compile(source, script_path, 'exec')
+
+    # Not "__main__": scripts' own command line handling must not run
+    namespace = {
+        "__name__": "__commander_script__",
+        "__file__": script_path,
+        "__builtins__": __builtins__,
+    }
+    exec(code, namespace)
+    return namespace
+
+
+def apply_limits(limits):
+    """Cap this process's memory and CPU time with setrlimit
+
+    limits may hold memory_mb (address space) and cpu_seconds; the wall
+    clock timeout is enforced by the parent.
+    """
+    if not limits:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+
+    caps = []
+    if limits.get("memory_mb"):
+        caps.append((resource.RLIMIT_AS, int(limits["memory_mb"] * 1024 * 1024), "memory"))
+    if limits.get("cpu_seconds"):
+        caps.append((resource.RLIMIT_CPU, int(limits["cpu_seconds"]), "CPU time"))
+
+    for which, value, label in caps:
+        soft, hard = resource.getrlimit(which)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        if which == resource.RLIMIT_CPU and hard == resource.RLIM_INFINITY:
+            # SIGXCPU at the soft limit, SIGKILL shortly after if it is ignored
+            hard = value + 5
+        try:
+            resource.setrlimit(which, (value, hard))
+        except (ValueError, OSError) as e:
+            print(f"Could not apply {label} limit: {e}", file=sys.stderr)
+
+
+class PeakSnapshots:
+    """Keeps a tracemalloc snapshot taken near the traced memory peak
+
+    Memory still allocated when main() returns is often not what made the
+    run big, so a background thread re-snapshots whenever traced memory
+    grows past the last snapshot by PEAK_GROWTH.
+    """
+
+    def __init__(self, tracemalloc, interval=0.1):
+        import threading
+        self.tracemalloc = tracemalloc
+        self.interval = interval
+        self.snapshot = None
+        self.snapshot_size = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            current = self.tracemalloc.get_traced_memory()[0]
+            if current > max(self.snapshot_size * PEAK_GROWTH, PEAK_MIN_BYTES):
+                self.snapshot = self.tracemalloc.take_snapshot()
+                self.snapshot_size = current
+
+    def finish(self):
+        """Stop watching; returns (snapshot, taken at peak rather than exit)"""
+        self._stop.set()
+        self._thread.join()
+        current = self.tracemalloc.get_traced_memory()[0]
+        if self.snapshot is None or current >= self.snapshot_size:
+            return self.tracemalloc.take_snapshot(), False
+        return self.snapshot, True
+
+
+def save_allocations(snapshot, peak, at_peak, path):
+    """Write the largest allocation sites of a tracemalloc snapshot as JSON"""
+    import threading
+    import tracemalloc
+    # Leave out the profiler's own bookkeeping, including the snapshot thread
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, threading.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    statistics = snapshot.statistics("traceback")
+    sites = [{
+        "size": stat.size,
+        "count": stat.count,
+        # Most recent call first
+        "frames": [[frame.filename, frame.lineno] for frame in reversed(stat.traceback)],
+    } for stat in statistics[:MEMORY_SITES]]
+    with open(path, 'w') as f:
+        json.dump({"peak": peak, "total": sum(stat.size for stat in statistics),
+                   "at_peak": at_peak, "sites": sites}, f)
+
+
+def call_main(entry, args, profile=None):
+    """Call main(args), under cProfile (and tracemalloc) when profiling
+
+    profile holds "stats", the path for the pstats file, and optionally
+    "memory", the path for the allocation sites. Results are saved even if
+    main() raises.
+    """
+    if not profile:
+        return entry(args)
+
+    import cProfile
+    snapshots = None
+    if profile.get("memory"):
+        import tracemalloc
+        tracemalloc.start(MEMORY_FRAMES)
+        snapshots = PeakSnapshots(tracemalloc)
+        snapshots.start()
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(entry, args)
+    finally:
+        try:
+            profiler.dump_stats(profile["stats"])
+            if snapshots is not None:
+                snapshot, at_peak = snapshots.finish()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                save_allocations(snapshot, peak, at_peak, profile["memory"])
+        except OSError as e:
+            print(f"Could not save profile: {e}", file=sys.stderr)
+
+
+def run(script_path, arguments, profile=None, bytecode_dir=None):
+    """Run a script's main(args) and return the process exit code"""
+    script_path = os.path.abspath(script_path)
+    sys.argv = [script_path]
+    sys.path.insert(0, os.path.dirname(script_path))
+
+    try:
+        namespace = load_script(script_path, bytecode_dir)
+    except Exception:
+        traceback.print_exc()
+        return EXIT_LOAD_ERROR
+
+    entry = namespace.get("main")
+    if not callable(entry):
+        print(f"{script_path} does not define main(args)", file=sys.stderr)
+        return EXIT_LOAD_ERROR
+
+    try:
+        result = call_main(entry, ScriptArgs(arguments), profile)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except KeyboardInterrupt:
+        return 130
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+    return result if isinstance(result, int) and not isinstance(result, bool) else 0
+
+
+def main():
+    # Running by file path puts this package's directory first on sys.path,
+    # where its modules would shadow the script's own imports
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+
+    if len(sys.argv) not in (3, 4):
+        print(__doc__, file=sys.stderr)
+        sys.exit(EXIT_LOAD_ERROR)
+
+    script_path, arguments = sys.argv[1], json.loads(sys.argv[2])
+    options = json.loads(sys.argv[3]) if len(sys.argv) == 4 else {}
+
+    # Stream whole lines as they are printed, rather than block-buffering
+    # (pipes) or issuing one write per print() item (-u)
+    if options.get("pipe_stdout"):
+        # Another script reads this output: write in blocks for throughput, and
+        # exit quietly like a shell pipeline stage if the reader goes away
+        import signal
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    else:
+        sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+
+    apply_limits(options.get("limits"))
+    exit_code = run(script_path, arguments, options.get("profile"), options.get("bytecode_dir"))
+    sys.stdout.flush()
+    sys.stderr.flush()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
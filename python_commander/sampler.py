@@ -0,0 +1,266 @@
+"""
+Resource sampler for Python Commander
+Periodically samples CPU, memory, open files and I/O of every running
+script's process tree, and enforces memory limits across the whole tree
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .execution import EVENT_FINISHED, EVENT_STARTED
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROC = "/proc"
+
+# Samples kept per run, and finished runs whose samples are kept
+MAX_SAMPLES = 600
+MAX_FINISHED_RUNS = 20
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class Sample:
+    """Resource usage of one run's process tree at one moment"""
+
+    __slots__ = ("time", "cpu_percent", "rss", "fds", "read_bytes", "write_bytes", "processes")
+
+    def __init__(self, time: float, cpu_percent: float, rss: int, fds: int,
+                 read_bytes: int, write_bytes: int, processes: int):
+        self.time = time
+        # Share of one core, so a tree using two busy cores reads 200
+        self.cpu_percent = cpu_percent
+        self.rss = rss
+        self.fds = fds
+        self.read_bytes = read_bytes
+        self.write_bytes = write_bytes
+        self.processes = processes
+
+
+def _proc_groups(pgids: Set[int]) -> Dict[int, List[Tuple[int, bytes]]]:
+    """(pid, stat) of every process in the given groups, from one pass over /proc"""
+    groups: Dict[int, List[Tuple[int, bytes]]] = {}
+    for name in os.listdir(PROC):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"{PROC}/{name}/stat", 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces; fields resume after its ')'
+        fields = stat[stat.rfind(b")") + 2:].split()
+        pgid = int(fields[2])
+        if pgid in pgids:
+            groups.setdefault(pgid, []).append((int(name), stat))
+    return groups
+
+
+def _proc_usage(pid: int, stat: bytes) -> Tuple[int, int, int, int, int]:
+    """(cpu ticks, rss bytes, open fds, read bytes, write bytes) of one process"""
+    fields = stat[stat.rfind(b")") + 2:].split()
+    ticks = int(fields[11]) + int(fields[12])
+    rss = int(fields[21]) * _PAGE_SIZE
+
+    try:
+        fds = len(os.listdir(f"{PROC}/{pid}/fd"))
+    except OSError:
+        fds = 0
+
+    read_bytes = write_bytes = 0
+    try:
+        with open(f"{PROC}/{pid}/io") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "read_bytes":
+                    read_bytes = int(value)
+                elif key == "write_bytes":
+                    write_bytes = int(value)
+    except OSError:
+        pass
+    return ticks, rss, fds, read_bytes, write_bytes
+
+
+def _psutil_usage(pgids: Set[int]) -> Dict[int, List[Tuple[int, int, int, int, int]]]:
+    """Per-process usage of the given process groups via psutil, in /proc units"""
+    usage: Dict[int, List[Tuple[int, int, int, int, int]]] = {}
+    for process in psutil.process_iter():
+        try:
+            pgid = os.getpgid(process.pid)
+            if pgid not in pgids:
+                continue
+            with process.oneshot():
+                times = process.cpu_times()
+                rss = process.memory_info().rss
+                try:
+                    fds = process.num_fds()
+                except (AttributeError, psutil.Error):
+                    fds = 0
+                try:
+                    io = process.io_counters()
+                    read_bytes, write_bytes = io.read_bytes, io.write_bytes
+                except (AttributeError, psutil.Error):
+                    read_bytes = write_bytes = 0
+        except (OSError, psutil.Error):
+            continue
+        ticks = int((times.user + times.system) * _CLOCK_TICKS)
+        usage.setdefault(pgid, []).append((ticks, rss, fds, read_bytes, write_bytes))
+    return usage
+
+
+def groups_usage(pgids: Iterable[int]) -> Dict[int, List[Tuple[int, int, int, int, int]]]:
+    """Usage of every process in each group, listing the system's processes once
+
+    Groups with no measurable processes are missing from the result.
+    """
+    pgids = set(pgids)
+    if not pgids:
+        return {}
+    if os.path.isdir(PROC):
+        return {pgid: [_proc_usage(pid, stat) for pid, stat in processes]
+                for pgid, processes in _proc_groups(pgids).items()}
+    if psutil is not None:
+        return _psutil_usage(pgids)
+    return {}
+
+
+class ResourceSampler:
+    """Samples running scripts on a background thread
+
+    Attach it to one or more ExecutionEngines. Listeners are called from the
+    sampler thread with (run, sample) for each new sample. A run's memory_mb
+    limit is checked against the RSS of its whole process tree, which also
+    catches scripts that spread their memory over child processes.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._lock = threading.Lock()
+        # Keyed by run object, since run ids are only unique within one engine
+        self._tracked: Dict[object, object] = {}
+        self._samples: "OrderedDict[object, deque]" = OrderedDict()
+        self._previous: Dict[object, Tuple[float, int]] = {}
+        self._listeners: List[Callable] = []
+        self._handlers: Dict[int, Callable] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config) -> "ResourceSampler":
+        return cls(interval=config.get("settings.sample_interval_ms", 500) / 1000)
+
+    @property
+    def available(self) -> bool:
+        """Whether process usage can be measured on this system"""
+        return os.path.isdir(PROC) or psutil is not None
+
+    def attach(self, engine):
+        """Sample every run the engine starts"""
+        def handler(run, event, data):
+            self._on_event(engine, run, event)
+        self._handlers[id(engine)] = handler
+        engine.add_listener(handler)
+
+    def detach(self, engine):
+        handler = self._handlers.pop(id(engine), None)
+        if handler is not None:
+            engine.remove_listener(handler)
+
+    def add_listener(self, callback: Callable):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _on_event(self, engine, run, event):
+        if event == EVENT_STARTED and not run.cached:
+            with self._lock:
+                self._tracked[run] = engine
+                self._samples[run] = deque(maxlen=MAX_SAMPLES)
+                while len(self._samples) > MAX_FINISHED_RUNS + len(self._tracked):
+                    oldest = next(iter(self._samples))
+                    if oldest in self._tracked:
+                        break
+                    del self._samples[oldest]
+        elif event == EVENT_FINISHED:
+            with self._lock:
+                self._tracked.pop(run, None)
+                self._previous.pop(run, None)
+
+    def start(self):
+        if self._thread is not None or not self.available:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="ResourceSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def samples(self, run) -> List[Sample]:
+        """Samples taken so far for a run, oldest first"""
+        with self._lock:
+            return list(self._samples.get(run, ()))
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                tracked = list(self._tracked.items())
+            # Each run leads its own process group
+            groups = [(run, engine, getattr(run._process, "pid", None)) for run, engine in tracked]
+            try:
+                usage = groups_usage(pgid for _, _, pgid in groups if pgid is not None)
+            except Exception as e:
+                print(f"Error sampling runs: {e}")
+                continue
+            for run, engine, pgid in groups:
+                if pgid not in usage:
+                    continue
+                try:
+                    self._sample(run, engine, usage[pgid])
+                except Exception as e:
+                    print(f"Error sampling run #{run.id}: {e}")
+
+    def _sample(self, run, engine, usage: List[Tuple[int, int, int, int, int]]):
+        now = time.time()
+        ticks = sum(item[0] for item in usage)
+        previous = self._previous.get(run)
+        self._previous[run] = (now, ticks)
+        cpu_percent = 0.0
+        if previous is not None and now > previous[0]:
+            # Ticks of processes that exited since the last sample are lost
+            cpu_percent = max(0.0, (ticks - previous[1]) / _CLOCK_TICKS / (now - previous[0]) * 100)
+
+        sample = Sample(now, cpu_percent,
+                        rss=sum(item[1] for item in usage),
+                        fds=sum(item[2] for item in usage),
+                        read_bytes=sum(item[3] for item in usage),
+                        write_bytes=sum(item[4] for item in usage),
+                        processes=len(usage))
+        with self._lock:
+            series = self._samples.get(run)
+            if series is None or run not in self._tracked:
+                return
+            series.append(sample)
+
+        memory_mb = run.limits.get("memory_mb")
+        if memory_mb and sample.rss > memory_mb * 1024 * 1024:
+            engine.kill_run(run.id, f"Exceeded memory limit of {memory_mb:g} MB "
+                                    f"({sample.rss / (1024 * 1024):.0f} MB in use)")
+
+        for listener in list(self._listeners):
+            try:
+                listener(run, sample)
+            except Exception as e:
+                print(f"Error in sampler listener: {e}")
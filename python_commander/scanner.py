@@ -0,0 +1,213 @@
+"""
+Directory scanning for Python Commander
+Walks monitored paths in parallel, pruning excluded directories early and
+streaming script paths as they are found
+"""
+
+import fnmatch
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_INCLUDE = ["*.py"]
+DEFAULT_EXCLUDE = ["__pycache__", "*.pyc", ".git", ".venv", "venv"]
+
+
+def _compile(patterns: Iterable[str]) -> Optional["re.Pattern"]:
+    """Combine glob patterns into a single regular expression"""
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+class PatternMatcher:
+    """Precompiled include/exclude matcher for file and directory names"""
+
+    def __init__(self, include: Iterable[str] = DEFAULT_INCLUDE,
+                 exclude: Iterable[str] = DEFAULT_EXCLUDE, show_hidden: bool = False):
+        include, exclude = list(include), list(exclude)
+        self._include = _compile(include)
+        self._exclude = _compile(exclude)
+        self.show_hidden = show_hidden
+        # Identifies the filter, so snapshots built with another one are discarded
+        self.signature = repr((include, exclude, show_hidden))
+
+    @classmethod
+    def from_config(cls, config) -> "PatternMatcher":
+        """Build a matcher from the file_patterns section of the config"""
+        patterns = config.get("file_patterns", {}) or {}
+        return cls(patterns.get("include", DEFAULT_INCLUDE),
+                   patterns.get("exclude", DEFAULT_EXCLUDE),
+                   config.get("settings.show_hidden_files", False))
+
+    def is_excluded(self, name: str) -> bool:
+        """Check whether a file or directory name is excluded"""
+        if not self.show_hidden and name.startswith("."):
+            return True
+        return self._exclude is not None and self._exclude.match(name) is not None
+
+    def is_included(self, name: str) -> bool:
+        """Check whether a file name is a script we want"""
+        if self.is_excluded(name):
+            return False
+        return self._include is None or self._include.match(name) is not None
+
+    def accept(self, path: str, is_dir: bool, root: Optional[str] = None) -> bool:
+        """Check a full path, e.g. from a file system event
+
+        Only the parts below root are checked, as the scanner does, so a
+        monitored path may itself live in e.g. a hidden directory.
+        """
+        if root is not None and (path == root or path.startswith(root + os.sep)):
+            path = path[len(root):].lstrip(os.sep)
+            if not path:
+                return is_dir
+        parts = path.split(os.sep)
+        dirs = parts if is_dir else parts[:-1]
+        if any(part and self.is_excluded(part) for part in dirs):
+            return False
+        return is_dir or self.is_included(parts[-1])
+
+
+class ChangeSet:
+    """An incremental delta of scripts and directories"""
+
+    __slots__ = ("added", "updated", "removed", "added_dirs", "removed_dirs")
+
+    def __init__(self):
+        self.added = set()
+        self.updated = set()
+        self.removed = set()
+        self.added_dirs = set()
+        self.removed_dirs = set()
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.removed
+                    or self.added_dirs or self.removed_dirs)
+
+    def __repr__(self):
+        return (f"ChangeSet(added={len(self.added)}, updated={len(self.updated)}, "
+                f"removed={len(self.removed)}, added_dirs={len(self.added_dirs)}, "
+                f"removed_dirs={len(self.removed_dirs)})")
+
+
+def list_directory(path: str, matcher: PatternMatcher) -> Tuple[List[str], List[str]]:
+    """List one directory, returning (subdirectories, scripts) after filtering"""
+    subdirs = []
+    scripts = []
+
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    # Don't follow directory symlinks; they can form cycles
+                    if entry.is_dir(follow_symlinks=False):
+                        if not matcher.is_excluded(entry.name):
+                            subdirs.append(entry.path)
+                    elif matcher.is_included(entry.name) and entry.is_file():
+                        scripts.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        # Vanished or unreadable directories are simply skipped
+        pass
+
+    return subdirs, scripts
+
+
+def dir_mtime(path: str) -> Optional[int]:
+    """Return a directory's mtime, or None if it is gone"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def walk_directories(starts: Iterable[Tuple[str, str]], matcher: Optional[PatternMatcher] = None,
+                     max_workers: Optional[int] = None
+                     ) -> Iterator[Tuple[str, str, int, List[str]]]:
+    """Walk directory trees concurrently, yielding (root, directory, mtime, scripts)
+
+    starts are (directory, root) pairs; every directory below one is
+    reported with that root. Directories are listed on a thread pool so
+    that I/O overlaps across and within trees, and results stream out
+    while the walk is still running. Each directory is stat'ed before it
+    is listed, so a concurrent change shows up as a newer mtime next time.
+    Closing the generator early stops any further directory listings.
+    """
+    matcher = matcher or PatternMatcher()
+    starts = list(starts)
+    if not starts:
+        return
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+
+    results: "queue.Queue" = queue.Queue()
+    cancelled = threading.Event()
+    # The submitting loop holds one count itself, so the walk can't look
+    # finished while starting directories are still being queued
+    outstanding = [1]
+    lock = threading.Lock()
+
+    def finish():
+        with lock:
+            outstanding[0] -= 1
+            done = outstanding[0] == 0
+        if done:
+            results.put(None)
+
+    def visit(root: str, path: str):
+        try:
+            if cancelled.is_set():
+                return
+            mtime = dir_mtime(path)
+            if mtime is None:
+                return
+            subdirs, scripts = list_directory(path, matcher)
+            results.put((root, path, mtime, scripts))
+            for subdir in subdirs:
+                submit(root, subdir)
+        finally:
+            finish()
+
+    def submit(root: str, path: str):
+        if cancelled.is_set():
+            return
+        with lock:
+            outstanding[0] += 1
+        try:
+            executor.submit(visit, root, path)
+        except RuntimeError:
+            # The consumer closed the generator and the pool is shut down
+            finish()
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scanner")
+    try:
+        for path, root in starts:
+            submit(root, path)
+        finish()
+
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_paths(roots: Iterable[str], matcher: Optional[PatternMatcher] = None,
+               max_workers: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    """Walk all roots concurrently, yielding (root, script_path) as found"""
+    roots = [os.path.abspath(os.path.expanduser(root)) for root in roots]
+    roots = [root for root in dict.fromkeys(roots) if os.path.isdir(root)]
+    for root, _, _, scripts in walk_directories(((root, root) for root in roots),
+                                                matcher, max_workers):
+        for script in scripts:
+            yield root, script
@@ -0,0 +1,474 @@
+"""
+Scheduler for Python Commander
+Runs catalog scripts on cron expressions or fixed intervals from one
+timer-heap thread, with catch-up of missed runs, jitter and a per-schedule
+policy for runs that would overlap
+"""
+
+import heapq
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .execution import EVENT_FINISHED, EVENT_QUEUED, build_arguments, normalize_limits
+
+# What to do when a schedule comes due while its last run is still going
+SKIP = "skip"
+QUEUE = "queue"
+PARALLEL = "parallel"
+OVERLAP_POLICIES = (SKIP, QUEUE, PARALLEL)
+
+# What to do about runs missed while nothing was running, or the machine slept
+CATCH_UP_NONE = "none"
+CATCH_UP_LATEST = "latest"
+CATCH_UP_ALL = "all"
+CATCH_UP_POLICIES = (CATCH_UP_NONE, CATCH_UP_LATEST, CATCH_UP_ALL)
+
+# A run that starts this many seconds after it was due counts as missed
+MISFIRE_GRACE = 60.0
+
+# Most runs caught up, or queued behind a running one, per schedule
+MAX_BACKLOG = 10
+
+# Longest sleep, so wall clock changes are noticed
+MAX_SLEEP = 300.0
+
+# Seconds between a run firing and its schedule's state being saved
+SAVE_DELAY = 5.0
+
+_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+_MONTH_NAMES = {name: number for number, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+_DAY_NAMES = {name: number for number, name in enumerate(
+    ("sun", "mon", "tue", "wed", "thu", "fri", "sat"))}
+
+# Years searched for the next match before an expression is taken to never match
+_SEARCH_YEARS = 5
+
+
+class CronExpression:
+    """Standard five-field cron expression, in local time
+
+    minute hour day-of-month month day-of-week, each *, a value, a range
+    or a comma list, with optional /step; months and weekdays may be
+    given by name. The @hourly style shortcuts are accepted too. As in
+    Vixie cron, when both day fields are restricted either may match.
+    """
+
+    def __init__(self, text: str):
+        self.text = text.strip()
+        spec = _MACROS.get(self.text.lower(), self.text)
+        fields = spec.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{text}' needs 5 fields, got {len(fields)}")
+        self.minutes = self._parse(fields[0], 0, 59)
+        self.hours = self._parse(fields[1], 0, 23)
+        self.days = self._parse(fields[2], 1, 31)
+        self.months = self._parse(fields[3], 1, 12, _MONTH_NAMES)
+        # 7 is also Sunday
+        self.weekdays = frozenset(day % 7 for day in self._parse(fields[4], 0, 7, _DAY_NAMES))
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int, names: Optional[Dict[str, int]] = None) -> frozenset:
+        def value(text: str) -> int:
+            text = text.lower()
+            if names and text in names:
+                return names[text]
+            if not text.isdigit():
+                raise ValueError(f"Invalid cron value '{text}'")
+            return int(text)
+
+        values = set()
+        for item in field.split(","):
+            base, slash, step_text = item.partition("/")
+            step = value(step_text) if slash else 1
+            if step < 1:
+                raise ValueError(f"Invalid cron step in '{item}'")
+            if base == "*":
+                start, end = low, high
+            else:
+                first, dash, last = base.partition("-")
+                start = value(first)
+                # "5/15" means every 15 from 5 on
+                end = value(last) if dash else (high if slash else start)
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field '{item}' is outside {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = moment.isoweekday() % 7 in self.weekdays
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return weekday
+        if self.any_weekday:
+            return day
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """The first matching minute after moment"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        last_year = candidate.year + _SEARCH_YEARS
+        while candidate.year <= last_year:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1,
+                                              hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression '{self.text}' never matches")
+
+    def __str__(self):
+        return self.text
+
+
+class Schedule:
+    """A script run on a cron expression or every so many seconds"""
+
+    def __init__(self, name: str, script: str, arguments: Optional[Dict[str, Any]] = None,
+                 cron: Optional[str] = None, interval: Optional[float] = None, jitter: float = 0,
+                 overlap: str = SKIP, catch_up: str = CATCH_UP_LATEST, enabled: bool = True,
+                 limits: Optional[Dict[str, Any]] = None):
+        if bool(cron) == bool(interval):
+            raise ValueError(f"Schedule '{name}' needs either a cron expression or an interval")
+        if interval is not None and interval <= 0:
+            raise ValueError(f"Schedule '{name}' needs a positive interval")
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown overlap policy '{overlap}'")
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy '{catch_up}'")
+        self.name = name
+        self.script = script
+        self.arguments = dict(arguments or {})
+        self.cron = CronExpression(cron) if cron else None
+        self.interval = float(interval) if interval else None
+        self.jitter = max(0.0, float(jitter or 0))
+        self.overlap = overlap
+        self.catch_up = catch_up
+        self.enabled = enabled
+        self.limits = limits
+
+    @classmethod
+    def from_config(cls, name: str, data: Dict[str, Any]) -> "Schedule":
+        return cls(name, data["script"], data.get("arguments"), cron=data.get("cron"),
+                   interval=data.get("interval"), jitter=data.get("jitter", 0),
+                   overlap=data.get("overlap", SKIP), catch_up=data.get("catch_up", CATCH_UP_LATEST),
+                   enabled=data.get("enabled", True), limits=data.get("limits"))
+
+    def to_config(self) -> Dict[str, Any]:
+        """Serializable form, as kept under "schedules" in the config"""
+        data = {"script": self.script, "arguments": self.arguments}
+        if self.cron is not None:
+            data["cron"] = self.cron.text
+        else:
+            data["interval"] = self.interval
+        data.update(jitter=self.jitter, overlap=self.overlap, catch_up=self.catch_up,
+                    enabled=self.enabled)
+        if self.limits:
+            data["limits"] = self.limits
+        return data
+
+    def next_due(self, after: float) -> float:
+        """The first time after the given one that this schedule is due"""
+        if self.cron is not None:
+            return self.cron.next_after(datetime.fromtimestamp(after)).timestamp()
+        return after + self.interval
+
+    def describe(self) -> str:
+        if self.cron is not None:
+            return f"cron {self.cron.text}"
+        return f"every {self.interval:g}s"
+
+
+def load_schedules(configs: Dict[str, Dict[str, Any]]) -> List[Schedule]:
+    """Schedules from the config, skipping (and reporting) invalid ones"""
+    schedules = []
+    for name, data in sorted(configs.items()):
+        try:
+            schedules.append(Schedule.from_config(name, data))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Ignoring schedule '{name}': {e}")
+    return schedules
+
+
+class Scheduler:
+    """Starts scheduled runs on an ExecutionEngine
+
+    Due times sit in one heap served by a single thread, which sleeps until
+    the earliest one, so any number of idle schedules costs nothing and each
+    due run is one wakeup. The last due time of every schedule is saved, so
+    runs missed while the scheduler was not running are caught up according
+    to the schedule's policy when it starts again.
+    """
+
+    def __init__(self, engine, catalog=None, state_path=None):
+        self.engine = engine
+        # Optional ScriptCatalog, for argument schemas, limits and memoization
+        self.catalog = catalog
+        self.state_path = Path(state_path) if state_path else None
+        self.schedules: Dict[str, Schedule] = {}
+
+        self._heap: List[Tuple[float, int, str, int, float]] = []
+        self._seq = itertools.count()
+        self._generations: Dict[str, int] = {}
+        self._next: Dict[str, float] = {}
+        # Last due time handled per schedule, saved in state_path
+        self._last_due: Dict[str, float] = self._load_state()
+        self._save_at: Optional[float] = None
+        # Runs in progress and runs waiting for them, per schedule
+        self._active: Dict[str, set] = {}
+        self._owners: Dict[int, str] = {}
+        self._queued: Dict[str, int] = {}
+        self._ready: List[str] = []
+        self._submitting: Optional[str] = None
+
+        self._cond = threading.Condition(threading.RLock())
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, engine, config, catalog=None) -> "Scheduler":
+        scheduler = cls(engine, catalog, config.app_support_path / "schedule_state.json")
+        scheduler.set_schedules(config.get_schedules())
+        return scheduler
+
+    def set_schedules(self, configs: Dict[str, Dict[str, Any]]):
+        """Replace every schedule, e.g. after the config changed"""
+        now = time.time()
+        with self._cond:
+            self.schedules = {schedule.name: schedule for schedule in load_schedules(configs)}
+            self._heap = []
+            self._next.clear()
+            for name in list(self._generations):
+                if name not in self.schedules:
+                    del self._generations[name]
+            # A removed schedule added again later starts afresh
+            for name in list(self._last_due):
+                if name not in self.schedules:
+                    del self._last_due[name]
+                    self._save_at = self._save_at or now + SAVE_DELAY
+            for schedule in self.schedules.values():
+                self._generations[schedule.name] = self._generations.get(schedule.name, 0) + 1
+                if not schedule.enabled:
+                    continue
+                last = self._last_due.get(schedule.name)
+                try:
+                    # A due time in the past is picked up at once as missed runs
+                    nominal = schedule.next_due(last if last is not None else now)
+                except ValueError as e:
+                    print(f"Ignoring schedule '{schedule.name}': {e}")
+                    continue
+                self._push(schedule, nominal)
+            self._cond.notify()
+
+    def _push(self, schedule: Schedule, nominal: float):
+        when = nominal + (random.uniform(0, schedule.jitter) if schedule.jitter else 0)
+        self._next[schedule.name] = when
+        heapq.heappush(self._heap, (when, next(self._seq), schedule.name,
+                                    self._generations[schedule.name], nominal))
+
+    def upcoming(self) -> List[Tuple[Schedule, Optional[float]]]:
+        """Every schedule with its next run time (None if disabled), soonest first"""
+        with self._cond:
+            items = [(schedule, self._next.get(name)) for name, schedule in self.schedules.items()]
+        return sorted(items, key=lambda item: (item[1] is None, item[1] or 0, item[0].name))
+
+    def status(self, name: str) -> Dict[str, int]:
+        """Runs in progress and waiting for a schedule"""
+        with self._cond:
+            return {"active": len(self._active.get(name, ())), "queued": self._queued.get(name, 0)}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self.engine.add_listener(self._on_event)
+        self._thread = threading.Thread(target=self._loop, name="Scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.engine.remove_listener(self._on_event)
+        self._save_state()
+
+    def _loop(self):
+        if self.catalog is not None:
+            # Argument schemas come from the catalog
+            while not self.catalog.loaded.wait(1):
+                if self._stopping:
+                    return
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                now = time.time()
+                fire = self._collect_due(now)
+                ready, self._ready = self._ready, []
+                if not fire and not ready:
+                    self._save_if_due(now)
+                    self._cond.wait(self._sleep_time(now))
+                    continue
+            for schedule, count in fire:
+                self._fire(schedule, count)
+            for name in ready:
+                schedule = self.schedules.get(name)
+                if schedule is not None:
+                    self._submit(schedule)
+
+    def _sleep_time(self, now: float) -> float:
+        wake = now + MAX_SLEEP
+        if self._heap:
+            wake = min(wake, self._heap[0][0])
+        if self._save_at is not None:
+            wake = min(wake, self._save_at)
+        return max(0.0, wake - now)
+
+    def _collect_due(self, now: float) -> List[Tuple[Schedule, int]]:
+        """Pop every due entry, queue its next occurrence and decide how many runs to start"""
+        fire = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, name, generation, nominal = heapq.heappop(self._heap)
+            schedule = self.schedules.get(name)
+            if schedule is None or generation != self._generations.get(name):
+                # Left behind by set_schedules()
+                continue
+
+            # Occurrences that also went by, e.g. while the machine slept
+            missed = 0
+            following = schedule.next_due(nominal)
+            while following <= now and missed < MAX_BACKLOG:
+                nominal = following
+                following = schedule.next_due(following)
+                missed += 1
+            capped = following <= now
+            if capped:
+                following = schedule.next_due(now)
+            self._last_due[name] = nominal
+            self._save_at = self._save_at or now + SAVE_DELAY
+            self._push(schedule, following)
+
+            if missed == 0 and now - when <= MISFIRE_GRACE:
+                fire.append((schedule, 1))
+            elif schedule.catch_up == CATCH_UP_LATEST:
+                fire.append((schedule, 1))
+            elif schedule.catch_up == CATCH_UP_ALL:
+                fire.append((schedule, min(missed + 1, MAX_BACKLOG)))
+            else:
+                print(f"Schedule '{name}' missed {missed + 1}{'+' if capped else ''} run(s)")
+        return fire
+
+    def _fire(self, schedule: Schedule, count: int):
+        """Start count runs, subject to the schedule's overlap policy"""
+        with self._cond:
+            busy = bool(self._active.get(schedule.name))
+            if schedule.overlap == PARALLEL:
+                starts = count
+            elif schedule.overlap == QUEUE:
+                waiting = self._queued.get(schedule.name, 0) + count - (0 if busy else 1)
+                self._queued[schedule.name] = min(waiting, MAX_BACKLOG)
+                starts = 0 if busy else 1
+            else:
+                starts = 0 if busy else 1
+        if busy and schedule.overlap == SKIP:
+            print(f"Schedule '{schedule.name}' skipped: its last run is still going")
+        for _ in range(starts):
+            self._submit(schedule)
+
+    def _submit(self, schedule: Schedule):
+        record = self.catalog.get(schedule.script) if self.catalog is not None else None
+        try:
+            if record is not None:
+                arguments = build_arguments(record.arguments, schedule.arguments)
+                limits = normalize_limits(record.limits, schedule.limits)
+            else:
+                arguments, limits = schedule.arguments, schedule.limits
+            # Runs are claimed from their queued event, raised on this thread
+            self._submitting = schedule.name
+            self.engine.submit(schedule.script, arguments,
+                               memoize=bool(record is not None and record.cache),
+                               cache_inputs=record.cache_inputs if record is not None else (),
+                               limits=limits)
+        except Exception as e:
+            print(f"Schedule '{schedule.name}' could not start {schedule.script}: {e}")
+        finally:
+            self._submitting = None
+
+    def _on_event(self, run, event, data):
+        with self._cond:
+            if event == EVENT_QUEUED:
+                if self._submitting is not None and threading.current_thread() is self._thread:
+                    self._owners[run.id] = self._submitting
+                    self._active.setdefault(self._submitting, set()).add(run.id)
+                return
+            if event != EVENT_FINISHED or run.id not in self._owners:
+                return
+            name = self._owners.pop(run.id)
+            active = self._active.get(name, set())
+            active.discard(run.id)
+            if not active and self._queued.get(name):
+                self._queued[name] -= 1
+                self._ready.append(name)
+                self._cond.notify()
+
+    def _load_state(self) -> Dict[str, float]:
+        if self.state_path is None:
+            return {}
+        try:
+            with open(self.state_path) as f:
+                return {name: float(value) for name, value in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save_if_due(self, now: float):
+        if self._save_at is not None and now >= self._save_at:
+            self._save_state()
+
+    def _save_state(self):
+        """Write the last due times atomically"""
+        with self._cond:
+            self._save_at = None
+            data = json.dumps(self._last_due)
+        if self.state_path is None:
+            return
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".schedule-", suffix=".tmp",
+                                            dir=str(self.state_path.parent))
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Error saving schedule state: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,211 @@
+"""
+Script search for Python Commander
+Incrementally maintained inverted and trigram indexes over script titles,
+descriptions and argument names
+"""
+
+import bisect
+import heapq
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Relative weight of a match in each field
+FIELD_WEIGHTS = {
+    "title": 8,
+    "filename": 6,
+    "argument": 4,
+    "description": 2,
+    "argument_description": 1,
+}
+
+# Limits that keep a single keystroke cheap on large catalogs
+MAX_PREFIX_EXPANSION = 256
+MIN_TRIGRAM_SIMILARITY = 0.3
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric words"""
+    return _WORD_RE.findall(text.lower()) if text else []
+
+
+def trigrams(word: str) -> List[str]:
+    """Return the padded trigrams of a word"""
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class SearchIndex:
+    """Inverted word index with trigram fallback for typo-tolerant search"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._next_id = 0
+        self._ids: Dict[str, int] = {}
+        self._paths: Dict[int, str] = {}
+
+        # word -> {doc id: weight}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Sorted vocabulary for prefix lookups
+        self._vocabulary: List[str] = []
+        # trigram -> words containing it
+        self._trigrams: Dict[str, set] = defaultdict(set)
+        # doc id -> words it contributed, for cheap removal
+        self._doc_words: Dict[int, Tuple[str, ...]] = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    @staticmethod
+    def _fields(path: str, record) -> Dict[str, int]:
+        """Collect weighted words for a script"""
+        weights: Dict[str, int] = {}
+
+        def add(text, field):
+            for word in tokenize(text):
+                weights[word] = weights.get(word, 0) + FIELD_WEIGHTS[field]
+
+        add(record.title, "title")
+        add(os.path.splitext(os.path.basename(path))[0], "filename")
+        add(record.description, "description")
+        for argument in record.arguments:
+            add(str(argument.get("name", "")), "argument")
+            add(str(argument.get("description", "")), "argument_description")
+        return weights
+
+    def add(self, path: str, record):
+        """Index a script record, replacing any previous entry for the same path"""
+        weights = self._fields(path, record)
+
+        with self._lock:
+            self._remove(path)
+            doc_id = self._next_id
+            self._next_id += 1
+            self._ids[path] = doc_id
+            self._paths[doc_id] = path
+            self._doc_words[doc_id] = tuple(weights)
+
+            for word, weight in weights.items():
+                postings = self._postings.get(word)
+                if postings is None:
+                    postings = self._postings[word] = {}
+                    bisect.insort(self._vocabulary, word)
+                    for gram in trigrams(word):
+                        self._trigrams[gram].add(word)
+                postings[doc_id] = weight
+
+    def remove(self, path: str):
+        """Remove a script from the index"""
+        with self._lock:
+            self._remove(path)
+
+    def _remove(self, path: str):
+        doc_id = self._ids.pop(path, None)
+        if doc_id is None:
+            return
+
+        del self._paths[doc_id]
+        for word in self._doc_words.pop(doc_id):
+            postings = self._postings[word]
+            postings.pop(doc_id, None)
+            if not postings:
+                # Last document using this word; drop it from the vocabulary
+                del self._postings[word]
+                index = bisect.bisect_left(self._vocabulary, word)
+                del self._vocabulary[index]
+                for gram in trigrams(word):
+                    words = self._trigrams[gram]
+                    words.discard(word)
+                    if not words:
+                        del self._trigrams[gram]
+
+    def _prefix_words(self, prefix: str) -> List[str]:
+        """Return vocabulary words starting with prefix"""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = min(start + MAX_PREFIX_EXPANSION, len(self._vocabulary))
+        words = []
+        for word in self._vocabulary[start:end]:
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        return words
+
+    def _fuzzy_words(self, term: str) -> List[Tuple[str, float]]:
+        """Return vocabulary words similar to term, with their similarity"""
+        grams = set(trigrams(term))
+        counts: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for word in self._trigrams.get(gram, ()):
+                counts[word] += 1
+
+        similar = []
+        for word, shared in counts.items():
+            # Jaccard over distinct padded trigrams, counted as the index stores them
+            similarity = shared / (len(grams) + len(set(trigrams(word))) - shared)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                similar.append((word, similarity))
+        return similar
+
+    def _term_words(self, term: str, fuzzy: bool) -> List[Tuple[Dict[int, int], float]]:
+        """Return (postings, factor) for every vocabulary word a term matches"""
+        matches = []
+        for word in self._prefix_words(term):
+            # Exact words outrank longer words that merely share the prefix
+            matches.append((self._postings[word], 1.0 if word == term else 0.75))
+
+        if fuzzy and not matches and len(term) >= 3:
+            for word, similarity in self._fuzzy_words(term):
+                matches.append((self._postings[word], similarity * 0.5))
+        return matches
+
+    @staticmethod
+    def _score_all(matches: List[Tuple[Dict[int, int], float]]) -> Dict[int, float]:
+        """Score every document matched by one term"""
+        if len(matches) == 1:
+            postings, factor = matches[0]
+            return {doc_id: weight * factor for doc_id, weight in postings.items()}
+
+        scores: Dict[int, float] = {}
+        for postings, factor in matches:
+            for doc_id, weight in postings.items():
+                score = weight * factor
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+        return scores
+
+    def search(self, query: str, limit: int = 50, fuzzy: bool = True) -> List[Tuple[str, float]]:
+        """Return up to limit (path, score) pairs matching every query term"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            per_term = [self._term_words(term, fuzzy) for term in dict.fromkeys(terms)]
+            if not all(per_term):
+                return []
+
+            # Start from the most selective term, then only probe its candidates
+            per_term.sort(key=lambda matches: sum(len(postings) for postings, _ in matches))
+            scores = self._score_all(per_term[0])
+            for matches in per_term[1:]:
+                size = sum(len(postings) for postings, _ in matches)
+                if len(scores) * len(matches) < size:
+                    narrowed = {}
+                    for doc_id, score in scores.items():
+                        best = max(postings.get(doc_id, 0) * factor for postings, factor in matches)
+                        if best:
+                            narrowed[doc_id] = score + best
+                    scores = narrowed
+                else:
+                    term_scores = self._score_all(matches)
+                    scores = {doc_id: score + term_scores[doc_id]
+                              for doc_id, score in scores.items() if doc_id in term_scores}
+                if not scores:
+                    return []
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [(self._paths[doc_id], score) for doc_id, score in best]
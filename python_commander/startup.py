@@ -0,0 +1,81 @@
+"""
+Startup timeline for Python Commander
+Records how long each startup phase takes, relative to process start, and
+reports it when the app is launched with --profile-startup
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+# Taken as early as possible; __main__ imports this module first
+PROCESS_START = time.perf_counter()
+
+PROFILE_FLAG = "--profile-startup"
+
+# Default time-to-first-paint budget, overridable with settings.startup_budget_ms
+DEFAULT_BUDGET_MS = 400
+
+
+class StartupTimeline:
+    """Collects (phase, start, end) timings during startup"""
+
+    def __init__(self, origin: float = PROCESS_START):
+        self.origin = origin
+        self.enabled = False
+        self._phases: List[Tuple[str, float, float, str]] = []
+        self._lock = threading.Lock()
+
+    def _ms(self, value: float) -> float:
+        return (value - self.origin) * 1000
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block of startup work"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def record(self, name: str, start: float, end: float):
+        """Record a phase that ran from start to end (perf_counter values)"""
+        with self._lock:
+            self._phases.append((name, start, end, threading.current_thread().name))
+
+    def mark(self, name: str):
+        """Record an instant, e.g. first paint"""
+        now = time.perf_counter()
+        self.record(name, now, now)
+
+    def elapsed_ms(self, name: str) -> Optional[float]:
+        """Milliseconds from process start to the end of a phase"""
+        with self._lock:
+            for phase, _, end, _ in self._phases:
+                if phase == name:
+                    return self._ms(end)
+        return None
+
+    def report(self, budget_ms: Optional[float] = None, stream=None):
+        """Print the timeline, flagging a first-paint budget overrun"""
+        stream = stream or sys.stderr
+        with self._lock:
+            phases = sorted(self._phases, key=lambda item: item[1])
+
+        print("Startup timeline (ms since process start):", file=stream)
+        print(f"  {'phase':<32} {'start':>8} {'end':>8} {'took':>8}  thread", file=stream)
+        for name, start, end, thread in phases:
+            print(f"  {name:<32} {self._ms(start):8.1f} {self._ms(end):8.1f} "
+                  f"{(end - start) * 1000:8.1f}  {thread}", file=stream)
+
+        first_paint = self.elapsed_ms("first paint")
+        if first_paint is not None and budget_ms is not None:
+            verdict = "within" if first_paint <= budget_ms else "OVER"
+            print(f"  time to first paint: {first_paint:.1f} ms ({verdict} budget of "
+                  f"{budget_ms:.0f} ms)", file=stream)
+
+
+# Shared timeline for the GUI entry point
+timeline = StartupTimeline()
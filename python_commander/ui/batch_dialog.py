@@ -0,0 +1,161 @@
+"""
+Batch dialog for Python Commander
+Sets up a parameter sweep over a script's arguments and shows the
+progress and results of the batch
+"""
+
+import os
+
+from PySide6.QtWidgets import (QCheckBox, QComboBox, QDialog, QDialogButtonBox, QFormLayout,
+                               QHBoxLayout, QHeaderView, QLabel, QLineEdit, QMessageBox,
+                               QProgressBar, QPushButton, QTableWidget, QTableWidgetItem,
+                               QVBoxLayout, QWidget)
+
+from ..batch import PRODUCT, ZIP, BatchRun, build_batch, parse_sweep_value
+from ..execution import EVENT_FINISHED
+from .bridge import EngineBridge
+
+RESULT_COLUMNS = ("Status", "Exit", "Seconds", "Output")
+
+
+class BatchDialog(QDialog):
+    """Sweep form followed by a live result table"""
+
+    def __init__(self, entry, engine, parent=None):
+        super().__init__(parent)
+        self.entry = entry
+        self.engine = engine
+        self.schema = entry.arguments
+        self.batch = None
+        self.swept_names = []
+        self.setWindowTitle(f"Batch Run {entry.title}")
+        self.resize(760, 520)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Tick the arguments to sweep. Swept values are comma-separated, "
+                                "or a glob pattern such as ~/Pictures/*.png."))
+
+        form = QFormLayout()
+        self.fields = {}
+        self.sweep_boxes = {}
+        for spec in self.schema:
+            default = spec.get("default", "")
+            if isinstance(default, (list, tuple)):
+                default = ", ".join(str(item) for item in default)
+            field = QLineEdit("" if default is None else str(default))
+            if spec.get("description"):
+                field.setToolTip(spec["description"])
+            sweep_box = QCheckBox("Sweep")
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            row_layout.addWidget(field)
+            row_layout.addWidget(sweep_box)
+            form.addRow(spec["name"], row)
+            self.fields[spec["name"]] = field
+            self.sweep_boxes[spec["name"]] = sweep_box
+        layout.addLayout(form)
+
+        self.mode_box = QComboBox()
+        self.mode_box.addItem("Every combination", PRODUCT)
+        self.mode_box.addItem("Pair values in order", ZIP)
+        form.addRow("Combine", self.mode_box)
+
+        self.progress = QProgressBar()
+        self.progress.setVisible(False)
+        layout.addWidget(self.progress)
+
+        self.table = QTableWidget(0, len(RESULT_COLUMNS))
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setVisible(False)
+        layout.addWidget(self.table)
+
+        buttons = QDialogButtonBox()
+        self.start_button = QPushButton("Start")
+        self.start_button.clicked.connect(self.start)
+        self.cancel_button = QPushButton("Cancel Batch")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel)
+        buttons.addButton(self.start_button, QDialogButtonBox.AcceptRole)
+        buttons.addButton(self.cancel_button, QDialogButtonBox.ActionRole)
+        buttons.addButton(QDialogButtonBox.Close).clicked.connect(self.close)
+        layout.addWidget(buttons)
+
+        self.bridge = EngineBridge(engine, self)
+        self.bridge.run_event.connect(self.handle_event)
+
+    def start(self):
+        """Validate the sweep and submit the batch"""
+        base_dir = os.path.dirname(self.entry.path)
+        fixed, sweep = {}, {}
+        for name, field in self.fields.items():
+            if self.sweep_boxes[name].isChecked():
+                sweep[name] = parse_sweep_value(field.text(), base_dir)
+            else:
+                fixed[name] = field.text()
+
+        try:
+            items = build_batch(self.schema, fixed, sweep, self.mode_box.currentData())
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Batch", str(e))
+            return
+
+        self.swept_names = list(sweep)
+        self.table.setColumnCount(len(self.swept_names) + len(RESULT_COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.swept_names + list(RESULT_COLUMNS))
+        self.table.horizontalHeader().setSectionResizeMode(self.table.columnCount() - 1,
+                                                           QHeaderView.Stretch)
+        self.table.setRowCount(len(items))
+        for row, (values, _) in enumerate(items):
+            for column, name in enumerate(self.swept_names):
+                self.table.setItem(row, column, QTableWidgetItem(str(values[name])))
+            self.table.setItem(row, len(self.swept_names), QTableWidgetItem("queued"))
+        self.table.setVisible(True)
+
+        self.progress.setRange(0, len(items))
+        self.progress.setValue(0)
+        self.progress.setVisible(True)
+        for widget in list(self.fields.values()) + list(self.sweep_boxes.values()):
+            widget.setEnabled(False)
+        self.mode_box.setEnabled(False)
+        self.start_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+
+        self.batch = BatchRun(self.engine, self.entry.path, items, memoize=self.entry.cache,
+                              cache_inputs=self.entry.cache_inputs, limits=self.entry.limits)
+        self.batch.start()
+        self.update_progress()
+
+    def handle_event(self, run, event, data):
+        """Refresh a result row when one of this batch's runs finishes"""
+        if self.batch is None or event != EVENT_FINISHED:
+            return
+        item = self.batch.item_for(run)
+        if item is None:
+            return
+
+        status = run.status + (" (cached)" if run.cached else "")
+        duration = "" if run.duration is None else f"{run.duration:.2f}"
+        returncode = "" if run.returncode is None else str(run.returncode)
+        column = len(self.swept_names)
+        for offset, text in enumerate((status, returncode, duration, item.summary)):
+            self.table.setItem(item.index, column + offset, QTableWidgetItem(text))
+        self.update_progress()
+
+    def update_progress(self):
+        self.progress.setValue(self.batch.finished)
+        self.progress.setFormat(f"%v of %m done, {self.batch.failed} failed")
+        if self.batch.done.is_set():
+            self.cancel_button.setEnabled(False)
+
+    def cancel(self):
+        """Cancel every run of the batch that has not finished"""
+        if self.batch is not None:
+            self.batch.cancel()
+
+    def closeEvent(self, event):
+        """Closing the dialog stops the batch"""
+        self.cancel()
+        self.bridge.detach()
+        super().closeEvent(event)
@@ -0,0 +1,78 @@
+"""
+Qt bridge for background services
+Re-emits callbacks from worker threads as Qt signals on the GUI thread
+"""
+
+import threading
+from collections import deque
+
+from PySide6.QtCore import QObject, Signal
+
+
+class CatalogBridge(QObject):
+    """Delivers catalog ChangeSets to the GUI thread"""
+
+    changed = Signal(object)
+
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        # Signals emitted from other threads are queued onto this object's thread
+        catalog.add_listener(self.changed.emit)
+
+    def detach(self):
+        """Stop forwarding catalog changes"""
+        self.catalog.remove_listener(self.changed.emit)
+
+
+class EngineBridge(QObject):
+    """Delivers execution engine events to the GUI thread
+
+    Output can arrive far faster than the GUI needs to hear about it, so
+    events are queued and drained in batches with one wakeup per batch.
+    """
+
+    run_event = Signal(object, str, object)
+    _events_ready = Signal()
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self._events = deque()
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self._events_ready.connect(self._drain)
+        engine.add_listener(self._enqueue)
+
+    def _enqueue(self, run, event, data):
+        self._events.append((run, event, data))
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._events_ready.emit()
+
+    def _drain(self):
+        with self._lock:
+            self._scheduled = False
+        while self._events:
+            self.run_event.emit(*self._events.popleft())
+
+    def detach(self):
+        """Stop forwarding engine events"""
+        self.engine.remove_listener(self._enqueue)
+
+
+class SamplerBridge(QObject):
+    """Delivers resource samples to the GUI thread"""
+
+    sampled = Signal(object, object)
+
+    def __init__(self, sampler, parent=None):
+        super().__init__(parent)
+        self.sampler = sampler
+        sampler.add_listener(self.sampled.emit)
+
+    def detach(self):
+        """Stop forwarding samples"""
+        self.sampler.remove_listener(self.sampled.emit)
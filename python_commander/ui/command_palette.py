@@ -0,0 +1,86 @@
+"""
+Command palette for Python Commander
+A keyboard-driven popup for finding scripts in the catalog
+"""
+
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtWidgets import QDialog, QLineEdit, QListWidget, QListWidgetItem, QVBoxLayout
+
+# Only this many results are ever turned into list items
+MAX_RESULTS = 50
+
+
+class CommandPalette(QDialog):
+    """Search box over the script catalog"""
+
+    script_selected = Signal(str)
+
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.setWindowTitle("Find Script")
+        self.setWindowFlags(Qt.Popup | Qt.FramelessWindowHint)
+        self.setMinimumWidth(520)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(8, 8, 8, 8)
+
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search scripts by title, description or argument...")
+        self.search_box.setStyleSheet("font-size: 16px; padding: 6px;")
+        self.search_box.textChanged.connect(self.update_results)
+        self.search_box.returnPressed.connect(self.accept_current)
+        self.search_box.installEventFilter(self)
+        layout.addWidget(self.search_box)
+
+        self.results = QListWidget()
+        self.results.setUniformItemSizes(True)
+        self.results.itemActivated.connect(lambda item: self.accept_current())
+        layout.addWidget(self.results)
+
+    def popup(self):
+        """Show the palette centred near the top of its parent"""
+        self.search_box.clear()
+        self.update_results("")
+        parent = self.parentWidget()
+        if parent is not None:
+            geometry = parent.geometry()
+            self.resize(max(self.minimumWidth(), geometry.width() // 2), 360)
+            self.move(geometry.center().x() - self.width() // 2, geometry.top() + 60)
+        self.show()
+        self.search_box.setFocus()
+
+    def update_results(self, text: str):
+        """Run the query and refill the (bounded) result list"""
+        self.results.clear()
+        if not text.strip():
+            return
+
+        for entry, score in self.catalog.search(text, MAX_RESULTS):
+            item = QListWidgetItem(f"{entry.title}  —  {entry.name}")
+            item.setToolTip(entry.path)
+            item.setData(Qt.UserRole, entry.path)
+            self.results.addItem(item)
+
+        if self.results.count():
+            self.results.setCurrentRow(0)
+
+    def accept_current(self):
+        """Emit the highlighted script and close"""
+        item = self.results.currentItem()
+        if item is not None:
+            self.script_selected.emit(item.data(Qt.UserRole))
+        self.close()
+
+    def eventFilter(self, obj, event):
+        """Let the arrow keys move through results while typing"""
+        if obj is self.search_box and event.type() == event.Type.KeyPress:
+            if event.key() in (Qt.Key_Down, Qt.Key_Up):
+                row = self.results.currentRow() + (1 if event.key() == Qt.Key_Down else -1)
+                if 0 <= row < self.results.count():
+                    self.results.setCurrentRow(row)
+                return True
+            if event.key() == Qt.Key_Escape:
+                self.close()
+                return True
+        return super().eventFilter(obj, event)
@@ -0,0 +1,103 @@
+"""
+Virtualized console view for Python Commander
+A list model over an OutputBuffer, so only visible lines are ever rendered
+"""
+
+from collections import OrderedDict
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, QTimer
+from PySide6.QtGui import QBrush, QColor, QFont
+from PySide6.QtWidgets import QAbstractItemView, QListView
+
+from ..output import STDERR
+
+# Lines are fetched from the buffer in blocks and a few blocks are cached
+BLOCK_SIZE = 256
+CACHED_BLOCKS = 8
+
+# New lines are announced to the view at most this often (ms)
+INSERT_INTERVAL = 50
+
+
+class OutputModel(QAbstractListModel):
+    """Exposes an OutputBuffer's lines as rows, inserting them in batches"""
+
+    def __init__(self, buffer, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self._rows = 0
+        self._blocks = OrderedDict()
+        self._stderr_brush = QBrush(QColor(220, 80, 80))
+
+        self._insert_timer = QTimer(self)
+        self._insert_timer.setSingleShot(True)
+        self._insert_timer.setInterval(INSERT_INTERVAL)
+        self._insert_timer.timeout.connect(self.flush)
+
+    def append(self, stream, text):
+        """Add output; rows appear in the view on the next batch"""
+        if self.buffer.append(stream, text) and not self._insert_timer.isActive():
+            self._insert_timer.start()
+
+    def finish(self):
+        """Flush partial lines once the run has ended"""
+        self.buffer.finish()
+        self.flush()
+
+    def flush(self):
+        """Announce every line added since the last batch"""
+        count = len(self.buffer)
+        if count <= self._rows:
+            return
+        # The last cached block may have been partial
+        self._blocks.pop((self._rows - 1) // BLOCK_SIZE, None)
+        self.beginInsertRows(QModelIndex(), self._rows, count - 1)
+        self._rows = count
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def _line(self, row):
+        block = row // BLOCK_SIZE
+        lines = self._blocks.get(block)
+        if lines is None:
+            lines = self.buffer.lines(block * BLOCK_SIZE, BLOCK_SIZE)
+            self._blocks[block] = lines
+            if len(self._blocks) > CACHED_BLOCKS:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(block)
+        return lines[row - block * BLOCK_SIZE]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._rows:
+            return None
+        if role == Qt.DisplayRole:
+            return self._line(index.row())[1]
+        if role == Qt.ForegroundRole and self._line(index.row())[0] == STDERR:
+            return self._stderr_brush
+        return None
+
+
+class ConsoleView(QListView):
+    """Read-only console that follows new output while scrolled to the bottom"""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        # Uniform rows let the view map scroll offsets to rows without measuring
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setFont(QFont("Menlo", 11))
+        self._follow = True
+        self.verticalScrollBar().valueChanged.connect(self._track_follow)
+        model.rowsInserted.connect(self._on_rows_inserted)
+
+    def _track_follow(self, value):
+        self._follow = value >= self.verticalScrollBar().maximum()
+
+    def _on_rows_inserted(self, parent, first, last):
+        if self._follow:
+            self.scrollToBottom()
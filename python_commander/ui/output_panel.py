@@ -0,0 +1,91 @@
+"""
+Output panel for Python Commander
+Shows the streamed output of script runs, one tab per run or pipeline
+"""
+
+from pathlib import Path
+
+from PySide6.QtWidgets import QTabWidget
+
+from ..execution import EVENT_FINISHED, EVENT_OUTPUT, EVENT_STARTED
+from ..output import OutputBuffer, STDERR
+from .console_view import ConsoleView, OutputModel
+
+
+class OutputPanel(QTabWidget):
+    """Tabbed console views fed by execution engine events"""
+
+    def __init__(self, log_dir, ring_lines=5000, spill_bytes=4 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.log_dir = Path(log_dir)
+        self.ring_lines = ring_lines
+        self.spill_bytes = spill_bytes
+        self.setTabsClosable(True)
+        self.tabCloseRequested.connect(self.close_tab)
+        self.models = {}
+        self.views = {}
+
+    @classmethod
+    def from_config(cls, config, parent=None):
+        """Create a panel using the output settings in the config"""
+        return cls(config.app_support_path / "logs",
+                   ring_lines=config.get("settings.output_ring_lines", 5000),
+                   spill_bytes=int(config.get("settings.output_spill_mb", 4) * 1024 * 1024),
+                   parent=parent)
+
+    def model_for(self, run):
+        """Return (creating if needed) the output model for a run
+
+        All stages of a pipeline share the first stage's tab: the last
+        stage's stdout plus every stage's stderr.
+        """
+        first = run.pipeline[0] if run.pipeline else run
+        model = self.models.get(first.id)
+        if model is None:
+            buffer = OutputBuffer(self.log_dir / f"run-{first.id}-{int(first.queued_at)}.log",
+                                  ring_lines=self.ring_lines, spill_bytes=self.spill_bytes)
+            model = OutputModel(buffer, self)
+            view = ConsoleView(model)
+            self.models[first.id] = model
+            self.views[first.id] = view
+            stages = run.pipeline or [run]
+            title = " | ".join(stage.script_path.rsplit('/', 1)[-1] for stage in stages)
+            if first.host:
+                title += f" @ {first.host}"
+            self.setCurrentIndex(self.addTab(view, f"#{first.id} {title}"))
+        return model
+
+    def handle_event(self, run, event, data):
+        """Update the run's console for an engine event"""
+        if event == EVENT_STARTED:
+            self.model_for(run)
+        elif event == EVENT_OUTPUT:
+            stream, text = data
+            self.model_for(run).append(stream, text)
+        elif event == EVENT_FINISHED:
+            model = self.model_for(run)
+            if run.status == "cancelled":
+                status = "cancelled"
+            else:
+                status = run.error or f"exit code {run.returncode}"
+                if run.cached:
+                    status += ", cached result"
+            if run.pipeline:
+                status = f"{run.script_path.rsplit('/', 1)[-1]}: {status}"
+                if any(stage.ended_at is None for stage in run.pipeline):
+                    # Other stages are still writing to this tab
+                    model.append(STDERR if run.returncode else "stdout", f"[{status}]\n")
+                    return
+            model.finish()
+            model.append(STDERR if run.returncode else "stdout", f"[{status}]\n")
+            model.flush()
+
+    def close_tab(self, index):
+        """Close a run's tab and release its output"""
+        widget = self.widget(index)
+        self.removeTab(index)
+        for run_id, view in list(self.views.items()):
+            if view is widget:
+                del self.views[run_id]
+                self.models.pop(run_id).buffer.close()
+        widget.deleteLater()
@@ -0,0 +1,182 @@
+"""
+Pipeline dialog for Python Commander
+Composes a pipeline from catalog scripts, each stage's output feeding the
+next stage's input, and saves pipelines for reuse
+"""
+
+import os
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (QComboBox, QDialog, QDialogButtonBox, QHBoxLayout, QInputDialog,
+                               QLabel, QListWidget, QListWidgetItem, QMessageBox, QPushButton,
+                               QVBoxLayout)
+
+from ..pipeline import stages_from_config, stages_to_config
+from .command_palette import CommandPalette
+from .run_dialog import RunDialog
+
+
+class PipelineDialog(QDialog):
+    """Ordered list of stages; accepting it leaves them in self.stages"""
+
+    def __init__(self, catalog, config, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.config = config
+        self.stages = []
+        self.setWindowTitle("Pipeline")
+        self.resize(560, 420)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Each script's printed output is fed to the next script's "
+                                "standard input. Output of the last script appears in the "
+                                "Output panel."))
+
+        saved_row = QHBoxLayout()
+        self.saved_box = QComboBox()
+        self.saved_box.setPlaceholderText("Saved pipelines")
+        self.saved_box.activated.connect(self.load_saved)
+        saved_row.addWidget(self.saved_box, 1)
+        save_button = QPushButton("Save...")
+        save_button.clicked.connect(self.save)
+        saved_row.addWidget(save_button)
+        delete_button = QPushButton("Delete")
+        delete_button.clicked.connect(self.delete_saved)
+        saved_row.addWidget(delete_button)
+        layout.addLayout(saved_row)
+
+        self.stage_list = QListWidget()
+        self.stage_list.itemActivated.connect(lambda item: self.edit_stage())
+        layout.addWidget(self.stage_list)
+
+        stage_row = QHBoxLayout()
+        for text, handler in (("Add Stage...", self.add_stage), ("Arguments...", self.edit_stage),
+                              ("Remove", self.remove_stage), ("Move Up", lambda: self.move_stage(-1)),
+                              ("Move Down", lambda: self.move_stage(1))):
+            button = QPushButton(text)
+            button.clicked.connect(handler)
+            stage_row.addWidget(button)
+        layout.addLayout(stage_row)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.button(QDialogButtonBox.Ok).setText("Run")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self.palette = CommandPalette(catalog, self)
+        self.palette.script_selected.connect(self.append_script)
+        self.refresh_saved()
+
+    def refresh_saved(self):
+        self.saved_box.clear()
+        for name in sorted(self.config.get_pipelines()):
+            self.saved_box.addItem(name)
+        self.saved_box.setCurrentIndex(-1)
+
+    def _item_text(self, path, arguments) -> str:
+        entry = self.catalog.get(path)
+        title = entry.title if entry is not None else os.path.basename(path)
+        values = ", ".join(f"{name}={value}" for name, value in arguments.items())
+        return f"{title}  ({values})" if values else title
+
+    def _add_item(self, path, arguments):
+        item = QListWidgetItem(self._item_text(path, arguments))
+        item.setToolTip(path)
+        item.setData(Qt.UserRole, (path, arguments))
+        if self.catalog.get(path) is None:
+            item.setForeground(Qt.red)
+            item.setToolTip(f"{path} is no longer in the catalog")
+        self.stage_list.addItem(item)
+        self.stage_list.setCurrentItem(item)
+
+    def add_stage(self):
+        self.palette.popup()
+
+    def append_script(self, path):
+        """Ask for a picked script's arguments and add it as the last stage"""
+        entry = self.catalog.get(path)
+        if entry is None:
+            return
+        arguments = {}
+        if entry.has_arguments:
+            dialog = RunDialog(entry, self)
+            dialog.setWindowTitle(f"Stage {entry.title}")
+            if not dialog.exec():
+                return
+            arguments = dialog.arguments
+        self._add_item(path, arguments)
+
+    def edit_stage(self):
+        """Change the argument values of the selected stage"""
+        item = self.stage_list.currentItem()
+        if item is None:
+            return
+        path, arguments = item.data(Qt.UserRole)
+        entry = self.catalog.get(path)
+        if entry is None:
+            return
+        dialog = RunDialog(entry, self)
+        dialog.setWindowTitle(f"Stage {entry.title}")
+        dialog.set_values(arguments)
+        if dialog.exec():
+            item.setData(Qt.UserRole, (path, dialog.arguments))
+            item.setText(self._item_text(path, dialog.arguments))
+
+    def remove_stage(self):
+        row = self.stage_list.currentRow()
+        if row >= 0:
+            self.stage_list.takeItem(row)
+
+    def move_stage(self, offset):
+        row = self.stage_list.currentRow()
+        target = row + offset
+        if row < 0 or not 0 <= target < self.stage_list.count():
+            return
+        item = self.stage_list.takeItem(row)
+        self.stage_list.insertItem(target, item)
+        self.stage_list.setCurrentRow(target)
+
+    def current_stages(self):
+        return [self.stage_list.item(row).data(Qt.UserRole)
+                for row in range(self.stage_list.count())]
+
+    def load_saved(self, index):
+        name = self.saved_box.itemText(index)
+        saved = self.config.get_pipelines().get(name)
+        if saved is None:
+            return
+        self.stage_list.clear()
+        for path, arguments in stages_from_config(saved):
+            self._add_item(path, arguments)
+
+    def save(self):
+        stages = self.current_stages()
+        if not stages:
+            return
+        name, ok = QInputDialog.getText(self, "Save Pipeline", "Name:",
+                                        text=self.saved_box.currentText())
+        if ok and name.strip():
+            self.config.save_pipeline(name.strip(), stages_to_config(stages))
+            self.refresh_saved()
+            self.saved_box.setCurrentText(name.strip())
+
+    def delete_saved(self):
+        name = self.saved_box.currentText()
+        if name:
+            self.config.delete_pipeline(name)
+            self.refresh_saved()
+
+    def accept(self):
+        """Check every stage is still in the catalog before closing"""
+        stages = self.current_stages()
+        if not stages:
+            QMessageBox.warning(self, "Empty Pipeline", "Add at least one stage.")
+            return
+        missing = [path for path, _ in stages if self.catalog.get(path) is None]
+        if missing:
+            QMessageBox.warning(self, "Missing Scripts",
+                                "These scripts are no longer in the catalog:\n" + "\n".join(missing))
+            return
+        self.stages = stages
+        super().accept()
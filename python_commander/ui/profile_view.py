@@ -0,0 +1,255 @@
+"""
+Profile view for Python Commander
+Browses a profiled run: a sortable hotspot table, a flame graph built from
+collapsed stacks and, when memory was traced, the largest allocation sites
+"""
+
+import os
+import zlib
+
+from PySide6.QtCore import QRectF, Qt
+from PySide6.QtGui import QColor, QPainter, QPen
+from PySide6.QtWidgets import (QDialog, QHeaderView, QLabel, QLineEdit, QScrollArea,
+                               QTableWidget, QTableWidgetItem, QTabWidget, QToolTip,
+                               QVBoxLayout, QWidget)
+
+from ..profiling import collapsed_stacks, load_allocations, load_hotspots
+
+HOTSPOT_COLUMNS = ("Function", "Location", "Calls", "Own (s)", "Total (s)", "Per call (ms)")
+MEMORY_COLUMNS = ("Size", "Blocks", "Allocated at")
+
+FRAME_HEIGHT = 18
+
+
+class _NumberItem(QTableWidgetItem):
+    """Table item that shows text but sorts by value"""
+
+    def __init__(self, value, text: str):
+        super().__init__(text)
+        self.setData(Qt.UserRole, value)
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+    def __lt__(self, other):
+        return (self.data(Qt.UserRole) or 0) < (other.data(Qt.UserRole) or 0)
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class _Frame:
+    """One box in the flame graph"""
+
+    __slots__ = ("name", "value", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0.0
+        self.children = {}
+
+
+def build_frames(stacks) -> _Frame:
+    """Turn collapsed stacks into a tree; each frame's value includes its children"""
+    root = _Frame("all")
+    for stack, seconds in stacks.items():
+        root.value += seconds
+        node = root
+        for name in stack.split(";"):
+            node = node.children.setdefault(name, _Frame(name))
+            node.value += seconds
+    return root
+
+
+def _depth(frame: _Frame) -> int:
+    return 1 + max((_depth(child) for child in frame.children.values()), default=0)
+
+
+class FlameGraph(QWidget):
+    """Icicle-style flame graph, outermost calls on top
+
+    Click a frame to zoom into it, click a bar above it to zoom back out.
+    """
+
+    def __init__(self, root: _Frame, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.focus = [root]
+        self.boxes = []
+        self.setMouseTracking(True)
+        self.setMinimumHeight((_depth(root) + 1) * FRAME_HEIGHT)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+        self.boxes = []
+        focus = self.focus[-1]
+        if focus.value <= 0:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No samples")
+            return
+        # Ancestors of the zoomed frame stay on top as full-width bars
+        for depth, frame in enumerate(self.focus):
+            self._draw(painter, frame, 0, self.width(), depth, full=True)
+        self._draw_children(painter, focus, 0, self.width(), len(self.focus))
+
+    def _draw_children(self, painter, frame: _Frame, x: float, width: float, depth: int):
+        scale = width / frame.value if frame.value else 0
+        for child in sorted(frame.children.values(), key=lambda child: child.name):
+            child_width = child.value * scale
+            if child_width >= 1:
+                self._draw(painter, child, x, child_width, depth)
+                self._draw_children(painter, child, x, child_width, depth + 1)
+            x += child_width
+
+    def _draw(self, painter, frame: _Frame, x: float, width: float, depth: int, full: bool = False):
+        rect = QRectF(x, depth * FRAME_HEIGHT, width, FRAME_HEIGHT - 1)
+        # Stable warm colour per function name
+        hue = zlib.crc32(frame.name.encode()) % 50
+        color = QColor.fromHsv(hue, 140 if not full else 60, 235)
+        painter.fillRect(rect, color)
+        painter.setPen(QPen(QColor("#333333")))
+        if width > 30:
+            text = painter.fontMetrics().elidedText(frame.name, Qt.ElideRight, int(width) - 6)
+            painter.drawText(rect.adjusted(3, 0, -3, 0), Qt.AlignVCenter | Qt.AlignLeft, text)
+        self.boxes.append((rect, frame, full))
+
+    def _frame_at(self, pos):
+        for rect, frame, full in reversed(self.boxes):
+            if rect.contains(pos):
+                return frame, full
+        return None, False
+
+    def mouseMoveEvent(self, event):
+        frame, _ = self._frame_at(event.position())
+        if frame is None:
+            QToolTip.hideText()
+            return
+        share = frame.value / self.root.value * 100 if self.root.value else 0
+        QToolTip.showText(event.globalPosition().toPoint(),
+                          f"{frame.name}\n{frame.value:.3f}s ({share:.1f}% of run)", self)
+
+    def mousePressEvent(self, event):
+        frame, full = self._frame_at(event.position())
+        if frame is None:
+            return
+        if full:
+            # Zoom back out to the clicked ancestor
+            self.focus = self.focus[:self.focus.index(frame) + 1]
+        else:
+            path = self._path_to(self.focus[-1], frame)
+            if path:
+                self.focus.extend(path)
+        self.update()
+
+    def _path_to(self, start: _Frame, target: _Frame):
+        for child in start.children.values():
+            if child is target:
+                return [child]
+            path = self._path_to(child, target)
+            if path:
+                return [child] + path
+        return None
+
+
+class ProfileView(QDialog):
+    """Hotspots, flame graph and allocations of one profiled run"""
+
+    def __init__(self, stats_path, memory_path=None, title: str = "", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Profile of {title or os.path.basename(str(stats_path))}")
+        self.resize(900, 600)
+
+        layout = QVBoxLayout(self)
+        self.tabs = QTabWidget()
+        layout.addWidget(self.tabs)
+
+        try:
+            hotspots = load_hotspots(stats_path)
+            stacks = collapsed_stacks(stats_path)
+        except (OSError, ValueError, EOFError, TypeError) as e:
+            layout.insertWidget(0, QLabel(f"Could not read profile: {e}"))
+            return
+
+        total = sum(hotspot.own_time for hotspot in hotspots)
+        summary = QLabel(f"{total:.3f}s profiled across {len(hotspots)} functions")
+        layout.insertWidget(0, summary)
+
+        self.tabs.addTab(self._hotspot_tab(hotspots), "Hotspots")
+        self.flame_graph = FlameGraph(build_frames(stacks))
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(self.flame_graph)
+        self.tabs.addTab(scroll, "Flame Graph")
+
+        allocations = load_allocations(memory_path) if memory_path else None
+        if allocations is not None:
+            self.tabs.addTab(self._memory_tab(allocations), "Memory")
+
+    def _hotspot_tab(self, hotspots) -> QWidget:
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        self.filter_box = QLineEdit()
+        self.filter_box.setPlaceholderText("Filter functions and files")
+        self.filter_box.textChanged.connect(self.filter_hotspots)
+        layout.addWidget(self.filter_box)
+
+        self.hotspot_table = table = QTableWidget(len(hotspots), len(HOTSPOT_COLUMNS))
+        table.setHorizontalHeaderLabels(HOTSPOT_COLUMNS)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        for row, hotspot in enumerate(hotspots):
+            calls = str(hotspot.calls) if hotspot.calls == hotspot.primitive_calls \
+                else f"{hotspot.calls}/{hotspot.primitive_calls}"
+            table.setItem(row, 0, QTableWidgetItem(hotspot.name))
+            location = QTableWidgetItem(os.path.basename(hotspot.file) + f":{hotspot.line}"
+                                        if hotspot.location else "built-in")
+            location.setToolTip(hotspot.location)
+            table.setItem(row, 1, location)
+            for column, (value, text) in enumerate((
+                    (hotspot.calls, calls),
+                    (hotspot.own_time, f"{hotspot.own_time:.4f}"),
+                    (hotspot.total_time, f"{hotspot.total_time:.4f}"),
+                    (hotspot.per_call, f"{hotspot.per_call * 1000:.3f}")), start=2):
+                table.setItem(row, column, _NumberItem(value, text))
+        table.setSortingEnabled(True)
+        table.sortItems(3, Qt.DescendingOrder)
+        layout.addWidget(table)
+        return tab
+
+    def filter_hotspots(self, text: str):
+        text = text.lower()
+        table = self.hotspot_table
+        for row in range(table.rowCount()):
+            haystack = f"{table.item(row, 0).text()} {table.item(row, 1).toolTip()}".lower()
+            table.setRowHidden(row, text not in haystack)
+
+    def _memory_tab(self, allocations) -> QWidget:
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        when = "near the peak" if allocations.get("at_peak") else "when main() returned"
+        layout.addWidget(QLabel(f"Peak traced memory {_format_size(allocations.get('peak', 0))}; "
+                                f"{_format_size(allocations.get('total', 0))} allocated {when}"))
+        sites = allocations.get("sites", [])
+        table = QTableWidget(len(sites), len(MEMORY_COLUMNS))
+        table.setHorizontalHeaderLabels(MEMORY_COLUMNS)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        for row, site in enumerate(sites):
+            frames = site.get("frames") or [["?", 0]]
+            # tracemalloc lists the most recent frame first
+            file, line = frames[0]
+            for column, (value, text) in enumerate(((site["size"], _format_size(site["size"])),
+                                                    (site["count"], str(site["count"])))):
+                table.setItem(row, column, _NumberItem(value, text))
+            location = QTableWidgetItem(f"{os.path.basename(file)}:{line}")
+            location.setToolTip("\n".join(f"{path}:{number}" for path, number in frames))
+            table.setItem(row, 2, location)
+        table.setSortingEnabled(True)
+        table.sortItems(0, Qt.DescendingOrder)
+        layout.addWidget(table)
+        return tab
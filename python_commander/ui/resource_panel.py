@@ -0,0 +1,134 @@
+"""
+Resource panel for Python Commander
+Live CPU and memory sparklines for running scripts, fed by the
+resource sampler
+"""
+
+from collections import deque
+
+from PySide6.QtCore import QPointF, Qt
+from PySide6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PySide6.QtWidgets import QHeaderView, QTableWidget, QTableWidgetItem, QWidget
+
+from ..execution import EVENT_FINISHED, EVENT_STARTED
+
+COLUMNS = ("Run", "CPU", "Memory", "Files", "Read", "Written")
+
+# Points drawn per sparkline
+SPARK_POINTS = 120
+
+
+def format_bytes(value: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+class Sparkline(QWidget):
+    """A small line chart of recent values next to the latest one as text"""
+
+    def __init__(self, color: str, formatter, limit: float = 0, parent=None):
+        super().__init__(parent)
+        self.values = deque(maxlen=SPARK_POINTS)
+        self.color = QColor(color)
+        self.formatter = formatter
+        # Drawn as a dashed line when set, and the scale always includes it
+        self.limit = limit
+        self.setMinimumSize(140, 22)
+
+    def add(self, value: float):
+        self.values.append(value)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = self.rect().adjusted(2, 3, -2, -3)
+        text = self.formatter(self.values[-1]) if self.values else ""
+        text_width = painter.fontMetrics().horizontalAdvance("0000.0 MB ")
+        chart = rect.adjusted(0, 0, -text_width, 0)
+
+        top = max(max(self.values, default=0), self.limit) or 1
+        if len(self.values) > 1:
+            step = chart.width() / (SPARK_POINTS - 1)
+            offset = chart.right() - step * (len(self.values) - 1)
+            line = QPolygonF([QPointF(offset + i * step, chart.bottom() - value / top * chart.height())
+                              for i, value in enumerate(self.values)])
+            painter.setPen(QPen(self.color, 1.5))
+            painter.drawPolyline(line)
+        if self.limit:
+            y = chart.bottom() - self.limit / top * chart.height()
+            painter.setPen(QPen(QColor("#d9534f"), 1, Qt.DashLine))
+            painter.drawLine(QPointF(chart.left(), y), QPointF(chart.right(), y))
+
+        painter.setPen(self.palette().text().color())
+        painter.drawText(rect.adjusted(chart.width() + 4, 0, 0, 0),
+                         Qt.AlignVCenter | Qt.AlignLeft, text)
+
+
+class ResourcePanel(QTableWidget):
+    """One row per running script, updated as samples arrive
+
+    Rows of finished runs stay until the next run starts, so the last
+    readings before a run ended (or was stopped) remain visible.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(0, len(COLUMNS), parent)
+        self.setHorizontalHeaderLabels(COLUMNS)
+        self.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.verticalHeader().setVisible(False)
+        self.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.rows = {}
+
+    def handle_event(self, run, event, data):
+        """Add a row when a run starts and mark it when it ends"""
+        # Runs on agents can't be sampled from here
+        if event == EVENT_STARTED and not run.cached and run.host is None:
+            self.remove_finished()
+            self.row_for(run)
+        elif event == EVENT_FINISHED and run in self.rows:
+            row = self.rows[run]["row"]
+            label = f"#{run.id} {run.script_path.rsplit('/', 1)[-1]} ({run.error or run.status})"
+            self.item(row, 0).setText(label)
+
+    def row_for(self, run):
+        entry = self.rows.get(run)
+        if entry is None:
+            row = self.rowCount()
+            self.insertRow(row)
+            self.setItem(row, 0, QTableWidgetItem(f"#{run.id} {run.script_path.rsplit('/', 1)[-1]}"))
+            memory_limit = run.limits.get("memory_mb", 0) * 1024 * 1024
+            cpu = Sparkline("#5cb85c", lambda value: f"{value:.0f}%")
+            memory = Sparkline("#428bca", format_bytes, limit=memory_limit)
+            self.setCellWidget(row, 1, cpu)
+            self.setCellWidget(row, 2, memory)
+            for column in range(3, len(COLUMNS)):
+                self.setItem(row, column, QTableWidgetItem(""))
+            entry = {"row": row, "cpu": cpu, "memory": memory}
+            self.rows[run] = entry
+        return entry
+
+    def handle_sample(self, run, sample):
+        """Append a sample to its run's sparklines"""
+        entry = self.rows.get(run)
+        if entry is None or run.done.is_set():
+            return
+        entry["cpu"].add(sample.cpu_percent)
+        entry["memory"].add(sample.rss)
+        row = entry["row"]
+        self.item(row, 3).setText(str(sample.fds))
+        self.item(row, 4).setText(format_bytes(sample.read_bytes))
+        self.item(row, 5).setText(format_bytes(sample.write_bytes))
+
+    def remove_finished(self):
+        """Drop the rows of runs that have ended"""
+        finished = [run for run in self.rows if run.done.is_set()]
+        for row in sorted((self.rows.pop(run)["row"] for run in finished), reverse=True):
+            self.removeRow(row)
+        # Remaining rows keep their order but shift up
+        for index, entry in enumerate(sorted(self.rows.values(), key=lambda entry: entry["row"])):
+            entry["row"] = index
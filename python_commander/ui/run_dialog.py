@@ -0,0 +1,90 @@
+"""
+Run dialog for Python Commander
+Collects argument values for a script from its arguments schema
+"""
+
+from PySide6.QtWidgets import (QCheckBox, QDialog, QDialogButtonBox, QFormLayout, QLabel,
+                               QLineEdit, QMessageBox, QVBoxLayout)
+
+from ..execution import build_arguments
+
+
+class RunDialog(QDialog):
+    """Form with one field per declared script argument"""
+
+    def __init__(self, entry, parent=None, profile: bool = False, trace_memory: bool = False):
+        super().__init__(parent)
+        self.entry = entry
+        # Decoded once, now that the script is being opened
+        self.schema = entry.arguments
+        self.arguments = {}
+        self.setWindowTitle(f"{'Profile' if profile else 'Run'} {entry.title}")
+        self.setMinimumWidth(460)
+
+        layout = QVBoxLayout(self)
+
+        if entry.description:
+            description = QLabel(entry.description)
+            description.setWordWrap(True)
+            layout.addWidget(description)
+
+        form = QFormLayout()
+        self.fields = {}
+        for spec in self.schema:
+            if spec.get("type") == "bool":
+                field = QCheckBox()
+                field.setChecked(bool(spec.get("default", False)))
+            else:
+                default = spec.get("default", "")
+                if isinstance(default, (list, tuple)):
+                    default = ", ".join(str(item) for item in default)
+                field = QLineEdit("" if default is None else str(default))
+            if spec.get("description"):
+                field.setToolTip(spec["description"])
+            form.addRow(spec["name"], field)
+            self.fields[spec["name"]] = field
+        layout.addLayout(form)
+
+        # Only shown when profiling
+        self.trace_memory_box = None
+        if profile:
+            self.trace_memory_box = QCheckBox("Also trace memory allocations (slower)")
+            self.trace_memory_box.setChecked(trace_memory)
+            layout.addWidget(self.trace_memory_box)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.button(QDialogButtonBox.Ok).setText("Profile" if profile else "Run")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def set_values(self, values):
+        """Fill the form, e.g. with previously chosen argument values"""
+        for name, value in values.items():
+            field = self.fields.get(name)
+            if isinstance(field, QCheckBox):
+                field.setChecked(bool(value))
+            elif field is not None:
+                if isinstance(value, (list, tuple)):
+                    value = ", ".join(str(item) for item in value)
+                field.setText("" if value is None else str(value))
+
+    def values(self):
+        """Raw values entered in the form"""
+        values = {}
+        for name, field in self.fields.items():
+            values[name] = field.isChecked() if isinstance(field, QCheckBox) else field.text()
+        return values
+
+    def accept(self):
+        """Validate the values against the schema before closing"""
+        try:
+            self.arguments = build_arguments(self.schema, self.values())
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Arguments", str(e))
+            return
+        super().accept()
+
+    @property
+    def trace_memory(self) -> bool:
+        return self.trace_memory_box is not None and self.trace_memory_box.isChecked()
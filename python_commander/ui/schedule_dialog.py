@@ -0,0 +1,235 @@
+"""
+Schedule dialogs for Python Commander
+Lists the scripts run on a cron expression or an interval, and edits one
+schedule with its stored argument values
+"""
+
+import os
+import time
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (QCheckBox, QComboBox, QDialog, QDialogButtonBox, QFormLayout,
+                               QHBoxLayout, QLabel, QLineEdit, QListWidget, QListWidgetItem,
+                               QMessageBox, QPushButton, QSpinBox, QStackedWidget, QVBoxLayout)
+
+from ..scheduler import (CATCH_UP_LATEST, CATCH_UP_POLICIES, OVERLAP_POLICIES, SKIP, Schedule,
+                         load_schedules)
+from .command_palette import CommandPalette
+from .run_dialog import RunDialog
+
+_OVERLAP_LABELS = {"skip": "Skip the run", "queue": "Run once the last one ends",
+                   "parallel": "Run alongside it"}
+_CATCH_UP_LABELS = {"none": "Skip them", "latest": "Run once", "all": "Run each one"}
+
+
+def _format_time(timestamp) -> str:
+    return time.strftime("%a %d %b %H:%M:%S", time.localtime(timestamp))
+
+
+class ScheduleEditor(QDialog):
+    """One schedule; accepting it leaves the result in self.schedule"""
+
+    def __init__(self, entry, name: str = "", data=None, parent=None):
+        super().__init__(parent)
+        self.entry = entry
+        self.schedule = None
+        data = data or {}
+        self.arguments = dict(data.get("arguments") or {})
+        self.setWindowTitle(f"Schedule {entry.title}")
+        self.setMinimumWidth(460)
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.name_edit = QLineEdit(name or os.path.splitext(entry.name)[0])
+        form.addRow("Name", self.name_edit)
+
+        self.kind_box = QComboBox()
+        self.kind_box.addItems(["Cron expression", "Fixed interval"])
+        form.addRow("Run on", self.kind_box)
+        self.when_stack = QStackedWidget()
+        self.cron_edit = QLineEdit(data.get("cron") or "0 * * * *")
+        self.cron_edit.setToolTip("minute hour day-of-month month day-of-week, or @hourly, @daily...")
+        self.when_stack.addWidget(self.cron_edit)
+        self.interval_box = QSpinBox()
+        self.interval_box.setRange(1, 7 * 24 * 3600)
+        self.interval_box.setSuffix(" s")
+        self.interval_box.setValue(int(data.get("interval") or 300))
+        self.when_stack.addWidget(self.interval_box)
+        form.addRow("", self.when_stack)
+        self.kind_box.currentIndexChanged.connect(self.when_stack.setCurrentIndex)
+        self.kind_box.setCurrentIndex(1 if data.get("interval") else 0)
+
+        self.jitter_box = QSpinBox()
+        self.jitter_box.setRange(0, 24 * 3600)
+        self.jitter_box.setSuffix(" s")
+        self.jitter_box.setValue(int(data.get("jitter") or 0))
+        self.jitter_box.setToolTip("Start each run up to this much later, at random")
+        form.addRow("Jitter", self.jitter_box)
+
+        self.overlap_box = QComboBox()
+        for policy in OVERLAP_POLICIES:
+            self.overlap_box.addItem(_OVERLAP_LABELS[policy], policy)
+        self.overlap_box.setCurrentIndex(OVERLAP_POLICIES.index(data.get("overlap", SKIP)))
+        form.addRow("If still running", self.overlap_box)
+
+        self.catch_up_box = QComboBox()
+        for policy in CATCH_UP_POLICIES:
+            self.catch_up_box.addItem(_CATCH_UP_LABELS[policy], policy)
+        self.catch_up_box.setCurrentIndex(
+            CATCH_UP_POLICIES.index(data.get("catch_up", CATCH_UP_LATEST)))
+        form.addRow("Missed runs", self.catch_up_box)
+
+        self.enabled_box = QCheckBox("Enabled")
+        self.enabled_box.setChecked(data.get("enabled", True))
+        form.addRow("", self.enabled_box)
+        layout.addLayout(form)
+
+        arguments_row = QHBoxLayout()
+        self.arguments_label = QLabel()
+        self.arguments_label.setWordWrap(True)
+        arguments_row.addWidget(self.arguments_label, 1)
+        arguments_button = QPushButton("Arguments...")
+        arguments_button.clicked.connect(self.edit_arguments)
+        arguments_button.setEnabled(entry.has_arguments)
+        arguments_row.addWidget(arguments_button)
+        layout.addLayout(arguments_row)
+
+        self.next_label = QLabel()
+        layout.addWidget(self.next_label)
+        for signal in (self.kind_box.currentIndexChanged, self.cron_edit.textChanged,
+                       self.interval_box.valueChanged, self.enabled_box.toggled):
+            signal.connect(self.update_preview)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.update_arguments_label()
+        self.update_preview()
+
+    def update_arguments_label(self):
+        values = ", ".join(f"{name}={value}" for name, value in self.arguments.items())
+        self.arguments_label.setText(f"Arguments: {values}" if values else "No arguments")
+
+    def edit_arguments(self):
+        dialog = RunDialog(self.entry, self)
+        dialog.setWindowTitle(f"Schedule {self.entry.title}")
+        dialog.set_values(self.arguments)
+        if dialog.exec():
+            self.arguments = dialog.arguments
+            self.update_arguments_label()
+
+    def build(self) -> Schedule:
+        cron = self.cron_edit.text() if self.kind_box.currentIndex() == 0 else None
+        interval = self.interval_box.value() if self.kind_box.currentIndex() == 1 else None
+        return Schedule(self.name_edit.text().strip(), self.entry.path, self.arguments,
+                        cron=cron, interval=interval, jitter=self.jitter_box.value(),
+                        overlap=self.overlap_box.currentData(),
+                        catch_up=self.catch_up_box.currentData(),
+                        enabled=self.enabled_box.isChecked())
+
+    def update_preview(self):
+        """Show when the schedule would next run, or why it is invalid"""
+        try:
+            schedule = self.build()
+            text = f"Next run: {_format_time(schedule.next_due(time.time()))}" \
+                if schedule.enabled else "Disabled"
+        except ValueError as e:
+            text = str(e)
+        self.next_label.setText(text)
+
+    def accept(self):
+        if not self.name_edit.text().strip():
+            QMessageBox.warning(self, "Schedule", "Give the schedule a name.")
+            return
+        try:
+            self.schedule = self.build()
+        except ValueError as e:
+            QMessageBox.warning(self, "Schedule", str(e))
+            return
+        super().accept()
+
+
+class SchedulesDialog(QDialog):
+    """Every saved schedule, with buttons to add, edit and delete them
+
+    on_change is called after the schedules in the config change.
+    """
+
+    def __init__(self, catalog, config, on_change, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.config = config
+        self.on_change = on_change
+        self.setWindowTitle("Schedules")
+        self.resize(620, 380)
+
+        layout = QVBoxLayout(self)
+        self.schedule_list = QListWidget()
+        self.schedule_list.itemActivated.connect(lambda item: self.edit_schedule())
+        layout.addWidget(self.schedule_list)
+
+        button_row = QHBoxLayout()
+        for text, handler in (("Add...", self.add_schedule), ("Edit...", self.edit_schedule),
+                              ("Delete", self.delete_schedule)):
+            button = QPushButton(text)
+            button.clicked.connect(handler)
+            button_row.addWidget(button)
+        button_row.addStretch(1)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        button_row.addWidget(close_button)
+        layout.addLayout(button_row)
+
+        self.palette = CommandPalette(catalog, self)
+        self.palette.script_selected.connect(self.schedule_script)
+        self.refresh()
+
+    def refresh(self):
+        self.schedule_list.clear()
+        now = time.time()
+        for schedule in load_schedules(self.config.get_schedules()):
+            entry = self.catalog.get(schedule.script)
+            title = entry.title if entry is not None else os.path.basename(schedule.script)
+            when = f"next {_format_time(schedule.next_due(now))}" if schedule.enabled else "disabled"
+            item = QListWidgetItem(f"{schedule.name}  —  {title}, {schedule.describe()}, {when}")
+            item.setData(Qt.UserRole, schedule.name)
+            item.setToolTip(schedule.script)
+            if entry is None:
+                item.setForeground(Qt.red)
+                item.setToolTip(f"{schedule.script} is no longer in the catalog")
+            self.schedule_list.addItem(item)
+
+    def add_schedule(self):
+        self.palette.popup()
+
+    def schedule_script(self, path, name: str = "", data=None):
+        """Open the editor for a script and save what it returns"""
+        entry = self.catalog.get(path)
+        if entry is None:
+            return
+        editor = ScheduleEditor(entry, name, data, self)
+        if not editor.exec():
+            return
+        if name and editor.schedule.name != name:
+            self.config.delete_schedule(name)
+        self.config.save_schedule(editor.schedule.name, editor.schedule.to_config())
+        self.on_change()
+        self.refresh()
+
+    def edit_schedule(self):
+        item = self.schedule_list.currentItem()
+        if item is None:
+            return
+        name = item.data(Qt.UserRole)
+        data = self.config.get_schedules().get(name)
+        if data is not None:
+            self.schedule_script(data["script"], name, data)
+
+    def delete_schedule(self):
+        item = self.schedule_list.currentItem()
+        if item is None:
+            return
+        self.config.delete_schedule(item.data(Qt.UserRole))
+        self.on_change()
+        self.refresh()
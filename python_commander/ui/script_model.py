@@ -0,0 +1,313 @@
+"""
+Script browser model for Python Commander
+A two-level tree (monitored path -> scripts) over the catalog that exposes
+rows lazily and applies catalog changes in batches
+"""
+
+import os
+from bisect import bisect_left, insort
+from typing import Dict, List
+
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, Qt, QTimer
+
+from ..scanner import ChangeSet
+
+# Rows handed to the view per fetchMore() call
+FETCH_BATCH = 500
+
+# Catalog changes are applied to the model at most this often (ms)
+APPLY_INTERVAL = 100
+
+# Above this many changes under one root, its rows are replaced wholesale
+# instead of being inserted and removed one by one
+RESET_THRESHOLD = 200
+
+# Role carrying a script's absolute path
+PathRole = Qt.UserRole
+
+COLUMNS = ("Script", "Location")
+
+
+class _RootNode:
+    """One monitored path and the sorted scripts beneath it"""
+
+    __slots__ = ("id", "path", "label", "paths", "fetched")
+
+    def __init__(self, node_id: int, path: str):
+        self.id = node_id
+        self.path = path
+        home = os.path.expanduser("~")
+        self.label = "~" + path[len(home):] if path.startswith(home + os.sep) else path
+        self.paths: List[str] = []
+        # Only the first `fetched` scripts have been shown to the view
+        self.fetched = 0
+
+
+class ScriptTreeModel(QAbstractItemModel):
+    """Scripts grouped by monitored path, with lazily fetched children
+
+    Top-level rows have internal id 0; a script row's internal id is the
+    id of its root, which stays stable as other roots come and go.
+    """
+
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self._roots: List[_RootNode] = []
+        self._nodes: Dict[int, _RootNode] = {}
+        self._next_id = 1
+        self._owner: Dict[str, _RootNode] = {}
+        self._pending = ChangeSet()
+        # Set while rows are being inserted or removed
+        self._changing = False
+
+        self._apply_timer = QTimer(self)
+        self._apply_timer.setSingleShot(True)
+        self._apply_timer.setInterval(APPLY_INTERVAL)
+        self._apply_timer.timeout.connect(self.flush)
+
+        # Seed with whatever the catalog already holds
+        for entry in catalog.scripts():
+            self._pending.added.add(entry.path)
+        self.flush()
+
+    # Change handling
+
+    def queue_changes(self, changes: ChangeSet):
+        """Collect a catalog ChangeSet; it reaches the view on the next batch"""
+        pending = self._pending
+        for path in changes.removed:
+            pending.added.discard(path)
+            pending.updated.discard(path)
+            pending.removed.add(path)
+        for path in changes.added | changes.updated:
+            pending.removed.discard(path)
+            if path in self._owner:
+                pending.updated.add(path)
+            else:
+                pending.added.add(path)
+        if not self._apply_timer.isActive():
+            self._apply_timer.start()
+
+    def flush(self):
+        """Apply every queued change"""
+        pending, self._pending = self._pending, ChangeSet()
+        self._changing = True
+        try:
+            self._apply(pending)
+        finally:
+            self._changing = False
+
+    def _apply(self, pending: ChangeSet):
+        self._sync_roots()
+
+        added: Dict[_RootNode, List[str]] = {}
+        removed: Dict[_RootNode, List[str]] = {}
+        for path in pending.removed:
+            node = self._owner.get(path)
+            if node is not None:
+                removed.setdefault(node, []).append(path)
+        by_path = {node.path: node for node in self._roots}
+        for path in pending.added:
+            entry = self.catalog.get(path)
+            node = by_path.get(entry.root) if entry is not None else None
+            if node is None:
+                continue
+            owner = self._owner.get(path)
+            if owner is node:
+                pending.updated.add(path)
+                continue
+            if owner is not None:
+                removed.setdefault(owner, []).append(path)
+            added.setdefault(node, []).append(path)
+
+        for node in set(added) | set(removed):
+            self._apply_to_root(node, added.get(node, []), removed.get(node, []))
+
+        for path in pending.updated:
+            node = self._owner.get(path)
+            if node is None:
+                continue
+            row = bisect_left(node.paths, path)
+            if row < node.fetched:
+                parent = self._root_index(node)
+                self.dataChanged.emit(self.index(row, 0, parent),
+                                      self.index(row, len(COLUMNS) - 1, parent))
+
+    def _sync_roots(self):
+        """Match the top-level rows to the catalog's monitored paths"""
+        wanted = self.catalog.roots()
+        for row in reversed(range(len(self._roots))):
+            node = self._roots[row]
+            if node.path not in wanted:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._roots[row]
+                del self._nodes[node.id]
+                for path in node.paths:
+                    self._owner.pop(path, None)
+                self.endRemoveRows()
+
+        current = {node.path for node in self._roots}
+        new = [path for path in dict.fromkeys(wanted) if path not in current]
+        if new:
+            first = len(self._roots)
+            self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+            for path in new:
+                node = _RootNode(self._next_id, path)
+                self._next_id += 1
+                self._nodes[node.id] = node
+                self._roots.append(node)
+            self.endInsertRows()
+
+    def _apply_to_root(self, node: _RootNode, added: List[str], removed: List[str]):
+        parent = self._root_index(node)
+
+        if len(added) + len(removed) > RESET_THRESHOLD:
+            # One removal and one insertion for the visible rows, however large the delta
+            shown = node.fetched
+            if shown:
+                self.beginRemoveRows(parent, 0, shown - 1)
+                node.fetched = 0
+                self.endRemoveRows()
+            for path in removed:
+                if self._owner.get(path) is node:
+                    del self._owner[path]
+            gone = set(removed)
+            node.paths = sorted([path for path in node.paths if path not in gone] + added)
+            for path in added:
+                self._owner[path] = node
+            shown = min(shown, len(node.paths))
+            if shown:
+                self.beginInsertRows(parent, 0, shown - 1)
+                node.fetched = shown
+                self.endInsertRows()
+        else:
+            for path in removed:
+                row = bisect_left(node.paths, path)
+                if row < node.fetched:
+                    self.beginRemoveRows(parent, row, row)
+                    del node.paths[row]
+                    node.fetched -= 1
+                    self.endRemoveRows()
+                else:
+                    del node.paths[row]
+                if self._owner.get(path) is node:
+                    del self._owner[path]
+            for path in sorted(added):
+                row = bisect_left(node.paths, path)
+                self._owner[path] = node
+                # Rows past the fetched ones stay hidden until fetchMore(),
+                # unless everything was already shown
+                if row < node.fetched or (node.fetched and node.fetched == len(node.paths)):
+                    self.beginInsertRows(parent, row, row)
+                    node.paths.insert(row, path)
+                    node.fetched += 1
+                    self.endInsertRows()
+                else:
+                    insort(node.paths, path)
+
+        # The expander and script count live on the root row
+        self.dataChanged.emit(parent, self.index(parent.row(), len(COLUMNS) - 1))
+
+    # Model interface
+
+    def _root_index(self, node: _RootNode) -> QModelIndex:
+        return self.createIndex(self._roots.index(node), 0, 0)
+
+    def _node(self, index: QModelIndex) -> _RootNode:
+        return self._nodes[index.internalId()]
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, 0)
+        if parent.internalId() == 0:
+            return self.createIndex(row, column, self._roots[parent.row()].id)
+        return QModelIndex()
+
+    def parent(self, index=QModelIndex()):
+        if not index.isValid() or index.internalId() == 0:
+            return QModelIndex()
+        return self._root_index(self._node(index))
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._roots)
+        if parent.internalId() == 0 and parent.column() == 0:
+            return self._roots[parent.row()].fetched
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(COLUMNS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._roots)
+        if parent.internalId() == 0 and parent.column() == 0:
+            return bool(self._roots[parent.row()].paths)
+        return False
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or parent.internalId() != 0:
+            return False
+        node = self._roots[parent.row()]
+        return node.fetched < len(node.paths)
+
+    def fetchMore(self, parent):
+        # Views may ask for more from inside a rowsInserted/rowsRemoved handler
+        if self._changing or not self.canFetchMore(parent):
+            return
+        node = self._roots[parent.row()]
+        count = min(FETCH_BATCH, len(node.paths) - node.fetched)
+        self._changing = True
+        try:
+            self.beginInsertRows(parent, node.fetched, node.fetched + count - 1)
+            node.fetched += count
+            self.endInsertRows()
+        finally:
+            self._changing = False
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if index.internalId() == 0:
+            node = self._roots[index.row()]
+            if role == Qt.DisplayRole:
+                return node.label if index.column() == 0 else f"{len(node.paths)} scripts"
+            if role == Qt.ToolTipRole or role == PathRole:
+                return node.path
+            return None
+
+        node = self._node(index)
+        path = node.paths[index.row()]
+        if role == PathRole:
+            return path
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+
+        entry = self.catalog.get(path)
+        if entry is None:
+            return None
+        if role == Qt.ToolTipRole:
+            return entry.description or path
+        if index.column() == 0:
+            return entry.title
+        return os.path.relpath(os.path.dirname(path), node.path)
+
+    def path_for_index(self, index: QModelIndex):
+        """Return the script path for a script row, or None for a root row"""
+        if not index.isValid() or index.internalId() == 0:
+            return None
+        return self.data(index, PathRole)
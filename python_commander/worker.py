@@ -0,0 +1,159 @@
+"""
+Warm worker process for Python Commander
+Preloads heavy modules once, then forks a child per script run so each run
+starts from an already-initialized interpreter.
+
+Usage: python worker.py <socket_fd> <json_preload_modules>
+
+Protocol over the Unix socket (all JSON frames are 4-byte length prefixed):
+  worker -> pool: {"ready": true, "pid": ..., "preloaded": [...], "failed": [...]}
+  pool -> worker: one byte carrying [stdout_fd, stderr_fd] as SCM_RIGHTS,
+                  then a frame {"script": ..., "arguments": {...}, "cwd": ..., "limits": {...},
+                                "profile": {...}, "bytecode_dir": ...}
+  worker -> pool: {"started": pid}, then {"exit": code, "rusage": {...}, "rss": ...}
+"""
+
+import importlib
+import json
+import os
+import resource
+import socket
+import struct
+import sys
+
+# Import the runner while this file's directory is still on sys.path
+import runner
+
+if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+    sys.path.pop(0)
+
+_HEADER = struct.Struct("!I")
+
+
+def send_frame(sock, message):
+    """Send a length-prefixed JSON frame"""
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_exact(sock, size):
+    """Read exactly size bytes, or return None at EOF"""
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            return None
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def recv_frame(sock):
+    """Read one length-prefixed JSON frame, or None at EOF"""
+    header = recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = recv_exact(sock, _HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data)
+
+
+def rusage_dict(usage):
+    """Convert a struct_rusage to plain values"""
+    return {
+        "utime": usage.ru_utime,
+        "stime": usage.ru_stime,
+        "maxrss": usage.ru_maxrss,
+    }
+
+
+def run_child(sock, stdout_fd, stderr_fd, job):
+    """Body of the forked child: become the script's process"""
+    sock.close()
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    os.close(stdout_fd)
+    os.close(stderr_fd)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+
+    code = 1
+    try:
+        # Own process group, so cancelling also reaches the script's children
+        os.setpgid(0, 0)
+        runner.apply_limits(job.get("limits"))
+        os.chdir(job.get("cwd") or os.path.dirname(job["script"]))
+        sys.stdout.reconfigure(line_buffering=True)
+        sys.stderr.reconfigure(line_buffering=True)
+        code = runner.run(job["script"], job.get("arguments", {}), job.get("profile"),
+                          job.get("bytecode_dir"))
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code & 0xFF if isinstance(code, int) else 1)
+
+
+def serve(sock, preload):
+    """Preload modules, then run jobs until the pool closes the socket"""
+    preloaded, failed = [], []
+    for name in preload:
+        try:
+            importlib.import_module(name)
+            preloaded.append(name)
+        except Exception:
+            failed.append(name)
+
+    send_frame(sock, {"ready": True, "pid": os.getpid(), "preloaded": preloaded, "failed": failed})
+
+    while True:
+        try:
+            marker, fds, _, _ = socket.recv_fds(sock, 1, 2)
+        except OSError:
+            return
+        if not marker:
+            return
+        job = recv_frame(sock)
+        if job is None or len(fds) != 2:
+            return
+
+        stdout_fd, stderr_fd = fds
+        pid = os.fork()
+        if pid == 0:
+            run_child(sock, stdout_fd, stderr_fd, job)
+
+        # The child holds the only copies the script's output should go through
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        send_frame(sock, {"started": pid})
+
+        _, status, usage = os.wait4(pid, 0)
+        send_frame(sock, {
+            "exit": os.waitstatus_to_exitcode(status),
+            "rusage": rusage_dict(usage),
+            # The worker itself never runs scripts, so its own peak stays flat;
+            # the largest child so far is what tells the pool it has grown
+            "rss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        })
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__, file=sys.stderr)
+        sys.exit(2)
+
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    try:
+        serve(sock, json.loads(sys.argv[2]))
+    except (BrokenPipeError, ConnectionError):
+        # The pool went away; nothing is left to report to
+        pass
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Warm worker pool for Python Commander
+Keeps pre-started interpreters with heavy modules already imported, so a
+script run only costs a fork instead of an interpreter start plus imports
+"""
+
+import json
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+from typing import Dict, List, Optional
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+
+_HEADER = struct.Struct("!I")
+
+
+def _send_frame(sock, message):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            return None
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def _recv_frame(sock):
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data)
+
+
+class WorkerRun:
+    """Popen-like handle for a script running in a warm worker's child"""
+
+    def __init__(self, worker: "Worker", stdout, stderr):
+        self.worker = worker
+        self.stdout = stdout
+        self.stderr = stderr
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.rusage: Optional[Dict[str, float]] = None
+        self._started = threading.Event()
+        self._cancelled = False
+        # Called from the worker's reader thread once the run has exited
+        self.on_exit = None
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def send_signal(self, sig):
+        self._started.wait(5)
+        if self.pid is None:
+            self._cancelled = True
+            return
+        try:
+            # The child leads its own process group, which may outlive it while
+            # its own children keep the output pipes open
+            os.killpg(self.pid, sig)
+        except OSError:
+            pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class Worker:
+    """One pre-started worker process"""
+
+    def __init__(self, pool: "WorkerPool"):
+        self.pool = pool
+        self.runs = 0
+        self.rss = 0
+        self.current: Optional[WorkerRun] = None
+
+        env = dict(os.environ)
+        env.setdefault("PYTHONIOENCODING", "utf-8")
+        # Scripts' output is line-buffered by the worker itself
+        env.pop("PYTHONUNBUFFERED", None)
+
+        self.sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.process = subprocess.Popen(
+                [pool.python, WORKER_PATH, str(child_sock.fileno()), json.dumps(pool.preload)],
+                stdin=subprocess.DEVNULL,
+                env=env,
+                pass_fds=(child_sock.fileno(),),
+                close_fds=True,
+            )
+        finally:
+            child_sock.close()
+
+        hello = _recv_frame(self.sock)
+        if not hello or not hello.get("ready"):
+            self.close()
+            raise RuntimeError("Worker failed to start")
+        if hello.get("failed"):
+            print(f"Worker could not preload: {', '.join(hello['failed'])}")
+
+        self._thread = threading.Thread(target=self._read_loop, name=f"Worker-{self.process.pid}",
+                                        daemon=True)
+        self._thread.start()
+
+    def start(self, script_path: str, arguments: dict, cwd: Optional[str] = None,
+              limits: Optional[dict] = None, profile: Optional[dict] = None,
+              bytecode_dir: Optional[str] = None) -> WorkerRun:
+        """Start a script run in a forked child of this worker"""
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        handle = WorkerRun(self, os.fdopen(stdout_r, "rb", buffering=0),
+                           os.fdopen(stderr_r, "rb", buffering=0))
+        self.current = handle
+        try:
+            socket.send_fds(self.sock, [b"\0"], [stdout_w, stderr_w])
+            _send_frame(self.sock, {"script": script_path, "arguments": arguments, "cwd": cwd,
+                                    "limits": limits, "profile": profile,
+                                    "bytecode_dir": bytecode_dir})
+        except OSError:
+            handle.stdout.close()
+            handle.stderr.close()
+            self.current = None
+            raise
+        finally:
+            # Only the worker's child should keep the write ends open
+            os.close(stdout_w)
+            os.close(stderr_w)
+        return handle
+
+    def _read_loop(self):
+        """Track started/exit messages for the current run"""
+        while True:
+            try:
+                message = _recv_frame(self.sock)
+            except OSError:
+                message = None
+
+            handle = self.current
+            if message is None:
+                # Worker died; fail whatever it was running
+                if handle is not None:
+                    handle.returncode = handle.returncode if handle.returncode is not None else -1
+                    handle._started.set()
+                self.pool._discard(self)
+                return
+
+            if "started" in message and handle is not None:
+                handle.pid = message["started"]
+                handle._started.set()
+                if handle._cancelled:
+                    handle.terminate()
+            elif "exit" in message and handle is not None:
+                self.runs += 1
+                self.rss = message.get("rss", 0)
+                handle.rusage = message.get("rusage")
+                self.current = None
+                handle.returncode = message["exit"]
+                handle._started.set()
+                self.pool._release(self)
+                if handle.on_exit is not None:
+                    handle.on_exit()
+
+    def close(self):
+        """Shut the worker down"""
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class WorkerPool:
+    """Pool of warm workers that the execution engine can hand runs to"""
+
+    def __init__(self, size: int = 2, preload: Optional[List[str]] = None, max_runs: int = 50,
+                 max_rss_mb: int = 512, python: str = sys.executable):
+        self.size = size
+        self.preload = list(preload or [])
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.python = python
+
+        self._idle: List[Worker] = []
+        self._busy: List[Worker] = []
+        self._starting = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, config) -> Optional["WorkerPool"]:
+        """Create a pool from the worker settings, or None if disabled/unsupported"""
+        size = config.get("settings.worker_pool_size", 2)
+        if not size or not hasattr(os, "fork") or not hasattr(socket, "send_fds"):
+            return None
+        return cls(size=size,
+                   preload=config.get("settings.worker_preload", []),
+                   max_runs=config.get("settings.worker_max_runs", 50),
+                   max_rss_mb=config.get("settings.worker_max_rss_mb", 512))
+
+    def start(self):
+        """Start filling the pool in the background"""
+        self._replenish()
+
+    def _replenish(self):
+        with self._lock:
+            if self._closed:
+                return
+            missing = self.size - len(self._idle) - len(self._busy) - self._starting
+            self._starting += max(0, missing)
+        for _ in range(max(0, missing)):
+            threading.Thread(target=self._spawn, name="WorkerSpawn", daemon=True).start()
+
+    def _spawn(self):
+        worker = None
+        try:
+            worker = Worker(self)
+        except Exception as e:
+            print(f"Could not start worker: {e}")
+        with self._lock:
+            self._starting -= 1
+            if worker is not None and not self._closed:
+                self._idle.append(worker)
+                worker = None
+        if worker is not None:
+            worker.close()
+
+    def acquire(self) -> Optional[Worker]:
+        """Take an idle worker, or None if none is ready"""
+        with self._lock:
+            if self._closed or not self._idle:
+                return None
+            worker = self._idle.pop()
+            self._busy.append(worker)
+            return worker
+
+    def _release(self, worker: Worker):
+        """Return a worker after a run, recycling it if it is worn out
+
+        worker.rss is the peak of its largest forked run so far, which
+        includes the pages each child inherited from the worker.
+        """
+        recycle = (worker.runs >= self.max_runs
+                   or (self.max_rss_mb and self._rss_mb(worker.rss) > self.max_rss_mb))
+        with self._lock:
+            if worker in self._busy:
+                self._busy.remove(worker)
+            if recycle or self._closed:
+                worker_to_close = worker
+            else:
+                self._idle.append(worker)
+                worker_to_close = None
+        if worker_to_close is not None:
+            worker_to_close.close()
+            self._replenish()
+
+    def _discard(self, worker: Worker):
+        """Forget a worker that exited"""
+        with self._lock:
+            for workers in (self._idle, self._busy):
+                if worker in workers:
+                    workers.remove(worker)
+        self._replenish()
+
+    @staticmethod
+    def _rss_mb(maxrss: int) -> float:
+        # ru_maxrss is bytes on macOS, kilobytes on Linux
+        return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+    def shutdown(self):
+        """Stop all idle workers; busy ones stop after their current run"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
@@ -12,6 +12,27 @@ arguments = [
     },
 ]
 
+# Set cache = True to reuse the last result when the script is run again
+# with the same arguments and unchanged source. cache_inputs lists files
+# (or names of arguments holding file paths) whose contents also count.
+cache = False
+cache_inputs = []
+
+# Optional resource limits; a run that exceeds one is stopped.
+# memory_mb covers the script and any processes it starts.
+limits = {
+    # "memory_mb": 1024,
+    # "cpu_seconds": 60,
+    # "timeout": 300,
+}
+
+# Optional packages this script needs, as pip requirement specifiers.
+# Imports missing from Python Commander's own environment are detected
+# automatically; list them here to pin versions.
+requires = [
+    # "requests>=2.28",
+]
+
 def main(args):
     # script logic here
     pass
\ No newline at end of file
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from python_commander.scanner import PatternMatcher, scan_paths
+
+
+class PatternMatcherAcceptTest(unittest.TestCase):
+    def test_root_under_hidden_directory(self):
+        matcher = PatternMatcher()
+        root = os.path.join(os.sep, "home", "u", ".scripts")
+        self.assertTrue(matcher.accept(os.path.join(root, "tool.py"), False, root))
+        self.assertTrue(matcher.accept(os.path.join(root, "sub"), True, root))
+        self.assertTrue(matcher.accept(root, True, root))
+
+    def test_root_under_excluded_name(self):
+        matcher = PatternMatcher()
+        root = os.path.join(os.sep, "work", "venv", "scripts")
+        self.assertTrue(matcher.accept(os.path.join(root, "tool.py"), False, root))
+
+    def test_excluded_below_root(self):
+        matcher = PatternMatcher()
+        root = os.path.join(os.sep, "home", "u", ".scripts")
+        self.assertFalse(matcher.accept(os.path.join(root, ".git", "hook.py"), False, root))
+        self.assertFalse(matcher.accept(os.path.join(root, "__pycache__"), True, root))
+        self.assertFalse(matcher.accept(os.path.join(root, "notes.txt"), False, root))
+
+    def test_monitor_agrees_with_scanner(self):
+        with tempfile.TemporaryDirectory() as home:
+            root = os.path.join(home, ".scripts")
+            os.makedirs(root)
+            script = os.path.join(root, "tool.py")
+            open(script, "w").close()
+
+            scanned = [path for _, path in scan_paths([root])]
+            self.assertEqual(scanned, [script])
+            self.assertTrue(PatternMatcher().accept(script, False, root))
+
+
+if __name__ == "__main__":
+    unittest.main()